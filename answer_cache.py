@@ -0,0 +1,235 @@
+"""
+Answer Cache for MedInSight
+Caches full /query responses keyed on (query, top_k, model, index version)
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from embedding_cache import normalize_query
+
+FRESH = "fresh"
+STALE = "stale"
+MISS = "miss"
+
+
+class MemoryAnswerBackend:
+    """In-process LRU backend bounded by entry count"""
+
+    name = "memory"
+    # Cheap enough to call on the event loop
+    blocking = False
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[Dict, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Tuple[Dict, float]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, value: Dict, created: float):
+        with self._lock:
+            self._entries[key] = (value, created)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteAnswerBackend:
+    """SQLite backend, shared across restarts and worker processes"""
+
+    name = "sqlite"
+    # Disk I/O: the async path calls it from an executor
+    blocking = True
+
+    def __init__(self, path: str = "./vectorstore/answers.sqlite", max_entries: int = 100000):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # Access times of hits, written with the next set() rather than on every read
+        self._touched: Dict[str, float] = {}
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS answers "
+            "(key TEXT PRIMARY KEY, value TEXT, created REAL, accessed REAL)"
+        )
+        self._db.commit()
+
+    def get(self, key: str) -> Optional[Tuple[Dict, float]]:
+        with self._lock:
+            row = self._db.execute("SELECT value, created FROM answers WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._touched[key] = time.time()
+            return json.loads(row[0]), row[1]
+
+    def set(self, key: str, value: Dict, created: float):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), created, time.time())
+            )
+            # Eviction goes by access time, so pending hits are recorded first
+            if self._touched:
+                self._db.executemany("UPDATE answers SET accessed = ? WHERE key = ?",
+                                     [(accessed, touched) for touched, accessed in self._touched.items()])
+                self._touched.clear()
+            overflow = self._db.execute("SELECT COUNT(*) FROM answers").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                self._db.execute(
+                    "DELETE FROM answers WHERE key IN "
+                    "(SELECT key FROM answers ORDER BY accessed LIMIT ?)", (overflow,)
+                )
+                self.evictions += overflow
+            self._db.commit()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._touched.pop(key, None)
+            self._db.execute("DELETE FROM answers WHERE key = ?", (key,))
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._touched.clear()
+            self._db.execute("DELETE FROM answers")
+            self._db.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+
+
+class AnswerCache:
+    """
+    TTL cache of pipeline results with stale-while-revalidate.
+
+    An entry younger than `ttl` is fresh. Between `ttl` and `ttl + stale_ttl`
+    it is still served, but the caller is told to refresh it in the background.
+    """
+
+    def __init__(self, backend, ttl: float = 3600, stale_ttl: float = 300):
+        self.backend = backend
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["AnswerCache"]:
+        """Build the cache from ANSWER_CACHE_* environment variables (None if disabled)"""
+        backend_name = os.getenv("ANSWER_CACHE_BACKEND", "memory").lower()
+        max_entries = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 1024))
+        if backend_name == "sqlite":
+            backend = SQLiteAnswerBackend(
+                os.getenv("ANSWER_CACHE_PATH", "./vectorstore/answers.sqlite"), max_entries
+            )
+        elif backend_name == "memory":
+            backend = MemoryAnswerBackend(max_entries)
+        else:
+            return None
+        return cls(
+            backend,
+            ttl=float(os.getenv("ANSWER_CACHE_TTL", 3600)),
+            stale_ttl=float(os.getenv("ANSWER_CACHE_STALE_TTL", 300))
+        )
+
+    @staticmethod
+    def make_key(query: str, top_k: int, model: str, index_version: str) -> str:
+        raw = json.dumps([normalize_query(query), top_k, model, index_version])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def lookup(self, key: str) -> Tuple[Optional[Dict], str]:
+        """Return (value, FRESH | STALE | MISS)"""
+        entry = self.backend.get(key)
+        if entry is not None:
+            value, created = entry
+            age = time.time() - created
+            if age <= self.ttl:
+                self.hits += 1
+                return value, FRESH
+            if age <= self.ttl + self.stale_ttl:
+                self.stale_hits += 1
+                return value, STALE
+            self.backend.delete(key)
+        self.misses += 1
+        return None, MISS
+
+    def store(self, key: str, value: Dict):
+        self.backend.set(key, value, time.time())
+
+    async def alookup(self, key: str, executor=None) -> Tuple[Optional[Dict], str]:
+        """lookup() that runs a blocking (disk) backend in executor, off the event loop"""
+        if not self.backend.blocking:
+            return self.lookup(key)
+        return await asyncio.get_running_loop().run_in_executor(executor, self.lookup, key)
+
+    async def astore(self, key: str, value: Dict, executor=None):
+        """store() that runs a blocking (disk) backend in executor, off the event loop"""
+        if not self.backend.blocking:
+            return self.store(key, value)
+        await asyncio.get_running_loop().run_in_executor(executor, self.store, key, value)
+
+    def begin_refresh(self, key: str) -> bool:
+        """Claim the background refresh for a stale key; False if one is running"""
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            self.refreshes += 1
+            return True
+
+    def end_refresh(self, key: str):
+        with self._lock:
+            self._refreshing.discard(key)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "backend": self.backend.name,
+            "entries": len(self.backend),
+            "ttl": self.ttl,
+            "stale_ttl": self.stale_ttl,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "evictions": self.backend.evictions,
+            "hit_rate": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0
+        }
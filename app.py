@@ -3,14 +3,22 @@ FastAPI Application for MedInSight - AI Textbook Medical Reasoning using RAG
 Hack-A-Cure Submission
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, Field
-from typing import List
+from typing import List, Optional
+import asyncio
 import uvicorn
+import json
 import os
+import signal
 import sys
+import time
+
+import metrics
+import resilience
+import resources
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -31,6 +39,23 @@ app.add_middleware(
 # Global RAG pipeline instance
 rag_pipeline = None
 
+# Loaded by the multi-worker launcher (serve.py) before forking; workers reuse it
+preloaded_vector_store = None
+
+# Set once start-up warm-up has finished; /health reports 503 until then
+ready = False
+warm_up_timings = {}
+_warm_up_task = None
+
+# Serializes vector store reloads; _watch_task polls for newly published versions
+_reload_lock = asyncio.Lock()
+_watch_task = None
+
+NO_ANSWER = "Information not available in dataset."
+
+# Time budget of one /query; X-Request-Deadline-Ms can only shorten it
+QUERY_DEADLINE_S = float(os.getenv("QUERY_DEADLINE_S", 50))
+
 
 # ============ Request/Response Models ============
 
@@ -65,17 +90,163 @@ class QueryResponse(BaseModel):
         }
 
 
+class BatchQueryRequest(BaseModel):
+    """Request model for /query/batch endpoint"""
+    queries: List[str] = Field(..., description="Medical questions to answer", min_length=1,
+                               max_length=int(os.getenv("BATCH_MAX_QUERIES", 256)))
+    top_k: int = Field(default=5, description="Number of contexts to retrieve per question", ge=1, le=20)
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "queries": ["What is diabetes?", "What causes hypertension?"],
+                "top_k": 5
+            }
+        }
+
+
 class HealthResponse(BaseModel):
     """Response model for /health endpoint"""
     status: str
 
 
+class ReloadResponse(BaseModel):
+    """Response model for /admin/reload endpoint"""
+    status: str
+    version: Optional[str] = None
+
+
+# ============ Shared Connections ============
+
+class SharedOpenAISession:
+    """ASGI middleware: each request's OpenAI calls use the process-wide keep-alive session"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        session = await resources.open_aiohttp_session()
+        with resources.use_aiohttp_session(session):
+            await self.app(scope, receive, send)
+
+
+app.add_middleware(SharedOpenAISession)
+
+
+# ============ Metrics ============
+
+class RequestMetrics:
+    """
+    ASGI middleware: request latency per endpoint and status for /metrics.
+    With METRICS_TIMING_HEADER=true, responses also carry a Server-Timing
+    header with the stages that finished before the headers were sent.
+    """
+    
+    def __init__(self, app, timing_header: bool = False):
+        self.app = app
+        self.timing_header = timing_header
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        
+        start = time.perf_counter()
+        timings, token = metrics.begin_request()
+        status = 500
+        
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.timing_header:
+                    header = metrics.server_timing({**timings, "total": time.perf_counter() - start})
+                    message = {**message, "headers": [*message.get("headers", []),
+                                                      (b"server-timing", header.encode("latin-1"))]}
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            metrics.end_request(token)
+            # Route template, not the raw path, so unknown URLs share one label
+            endpoint = getattr(scope.get("route"), "path", "other")
+            metrics.REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint, status=status)
+
+
+app.add_middleware(RequestMetrics, timing_header=os.getenv("METRICS_TIMING_HEADER", "false").lower() == "true")
+
+# cache.stats() key -> medinsight_cache_lookups_total "result" label
+_LOOKUP_RESULTS = {"hits": "hit", "stale_hits": "stale_hit", "disk_hits": "disk_hit", "misses": "miss"}
+
+
+def _pipeline_metrics():
+    """Cache and index figures of the current pipeline, read at scrape time"""
+    if rag_pipeline is None:
+        return []
+    lookups, entries, evictions = [], [], []
+    caches = (("answer", rag_pipeline.answer_cache),
+              ("semantic", rag_pipeline.semantic_cache),
+              ("embedding", getattr(rag_pipeline.vector_store, "embedding_cache", None)))
+    for name, cache in caches:
+        if cache is None:
+            continue
+        stats = cache.stats()
+        for key, result in _LOOKUP_RESULTS.items():
+            if key in stats:
+                lookups.append(({"cache": name, "result": result}, stats[key]))
+        entries.append(({"cache": name}, stats["entries"]))
+        evictions.append(({"cache": name}, stats["evictions"]))
+    
+    vector_store = rag_pipeline.vector_store
+    vectors = vector_store.index.ntotal if vector_store.index is not None else 0
+    families = [
+        ("medinsight_cache_lookups_total", "counter", "Cache lookups by result", lookups),
+        ("medinsight_cache_entries", "gauge", "Entries currently cached", entries),
+        ("medinsight_cache_evictions_total", "counter", "Entries evicted to stay within capacity", evictions),
+        ("medinsight_index_vectors", "gauge", "Vectors in the served index",
+         [({"version": vector_store.version or ""}, vectors)]),
+    ]
+    if rag_pipeline.coalescer is not None:
+        stats = rag_pipeline.coalescer.stats()
+        families += [
+            ("medinsight_coalesced_queries_total", "counter",
+             "Pipeline runs started (leader) and duplicate queries that joined one (follower)",
+             [({"role": "leader"}, stats["leaders"]), ({"role": "follower"}, stats["coalesced"])]),
+            ("medinsight_coalesced_runs_total", "counter", "Shared runs that raised or were abandoned by every caller",
+             [({"outcome": "error"}, stats["errors"]), ({"outcome": "abandoned"}, stats["abandoned"])]),
+            ("medinsight_queries_in_flight", "gauge", "Distinct pipeline runs in flight",
+             [({}, stats["in_flight"])]),
+        ]
+    breakers = _breakers()
+    if breakers:
+        families += [
+            ("medinsight_circuit_open", "gauge", "1 while a provider's circuit breaker rejects calls",
+             [({"provider": name}, int(stats["state"] == resilience.OPEN)) for name, stats in breakers.items()]),
+            ("medinsight_circuit_calls_total", "counter", "Provider calls by circuit breaker verdict",
+             [({"provider": name, "outcome": outcome}, stats[outcome])
+              for name, stats in breakers.items()
+              for outcome in ("successes", "failures", "slow_calls", "rejected")]),
+        ]
+    return families
+
+
+def _breakers() -> dict:
+    """Stats of the enabled provider circuit breakers"""
+    breakers = {"llm": rag_pipeline.llm_breaker, "embedding": resources.get_breaker("embedding", slow_call_s=5)}
+    return {name: breaker.stats() for name, breaker in breakers.items() if breaker is not None}
+
+
+metrics.REGISTRY.register_collector(_pipeline_metrics)
+
+
 # ============ Startup Event ============
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize RAG pipeline on startup"""
-    global rag_pipeline
+    global rag_pipeline, _warm_up_task
     
     print("=" * 60)
     print("🚀 MedInSight - Hack-A-Cure RAG System Starting...")
@@ -86,22 +257,28 @@ async def startup_event():
         from ingest import VectorStore
         from rag_pipeline import RAGPipeline
         
-        # Load vector store
-        print("📚 Loading vector store...")
-        vector_store = VectorStore()
-        
-        if not vector_store.load():
-            print("⚠️  WARNING: Vector store not found!")
-            print("   Please run: python ingest.py")
-            print("   The API will start but /query will fail until vector store is built.")
-            return
+        # Load vector store (already loaded when forked by serve.py)
+        vector_store = preloaded_vector_store
+        if vector_store is None:
+            print("📚 Loading vector store...")
+            vector_store = VectorStore()
+            if not vector_store.load():
+                print("⚠️  WARNING: Vector store not found!")
+                print("   Please run: python ingest.py")
+                print("   The API will start but /query will fail until vector store is built.")
+                _set_ready()
+                _start_index_watch()
+                return
         
         # Initialize RAG pipeline
         print("🤖 Initializing RAG pipeline...")
         rag_pipeline = RAGPipeline(vector_store)
         
-        print("✅ RAG system initialized successfully!")
-        print("=" * 60)
+        # Load models and touch the index before the first real query
+        # Ready (and the success banner printed) once warm-up finishes
+        _warm_up_task = asyncio.create_task(_warm_up(rag_pipeline))
+        _start_index_watch()
+        return
         
     except Exception as e:
         print(f"❌ Error during startup: {e}")
@@ -109,16 +286,127 @@ async def startup_event():
         print("   Please check your configuration and run ingest.py")
         import traceback
         traceback.print_exc()
+    
+    # Nothing to warm up without a pipeline
+    _set_ready()
+
+
+def preload_vector_store(vector_store=None):
+    """
+    Load the vector store in the launcher process so forked workers share it
+    (called by serve.py before every worker generation). Pass a store to use
+    it instead of ./vectorstore/.
+    """
+    global preloaded_vector_store
+    if vector_store is None:
+        from ingest import VectorStore
+        
+        print("📚 Preloading vector store for the workers...")
+        vector_store = VectorStore()
+        if not vector_store.load():
+            vector_store = None
+    preloaded_vector_store = vector_store
+
+
+def _set_ready(timings: dict = None):
+    global ready, warm_up_timings
+    warm_up_timings = timings or {}
+    ready = True
+
+
+async def _warm_up(pipeline):
+    print("🔥 Warming up models and index...")
+    try:
+        timings = await resources.awarm_up(pipeline)
+        print(f"✅ Warm-up finished: {timings}")
+    except Exception as e:
+        print(f"⚠️  Warm-up failed: {e}")
+        timings = {}
+    print("✅ RAG system initialized successfully!")
+    print("=" * 60)
+    _set_ready(timings)
+
+
+async def reload_vector_store() -> ReloadResponse:
+    """
+    Load the published CURRENT vector store in the background and swap it
+    into the pipeline. Queries keep being answered from the old store
+    until the new one is loaded and warmed up; queries already running
+    finish on the old store.
+    """
+    global rag_pipeline
+    from ingest import VectorStore
+    from rag_pipeline import RAGPipeline
+    
+    async with _reload_lock:
+        loop = asyncio.get_running_loop()
+        vector_store = VectorStore()
+        if not await loop.run_in_executor(None, vector_store.load):
+            return ReloadResponse(status="not_found")
+        current = rag_pipeline.vector_store.version if rag_pipeline is not None else None
+        if vector_store.version == current:
+            return ReloadResponse(status="unchanged", version=current)
+        
+        timings = await loop.run_in_executor(None, resources.warm_up_vector_store, vector_store)
+        if rag_pipeline is None:
+            rag_pipeline = RAGPipeline(vector_store)
+        else:
+            rag_pipeline.swap_vector_store(vector_store)
+        print(f"🔄 Swapped in vector store {vector_store.version} (was {current}), warm-up {timings}")
+        return ReloadResponse(status="swapped", version=vector_store.version)
+
+
+def _start_index_watch():
+    """Poll ./vectorstore/CURRENT every INDEX_WATCH_INTERVAL seconds (0 = off)"""
+    global _watch_task
+    interval = float(os.getenv("INDEX_WATCH_INTERVAL", 0))
+    # Preforked workers are replaced by serve.py instead, which watches the same file
+    if interval > 0 and preloaded_vector_store is None:
+        _watch_task = asyncio.create_task(_watch_index(interval))
+
+
+async def _watch_index(interval: float):
+    from ingest import CURRENT_FILE, VECTORSTORE_DIR
+    
+    def stamp():
+        try:
+            stat = os.stat(os.path.join(VECTORSTORE_DIR, CURRENT_FILE))
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+    
+    last = stamp()
+    while True:
+        await asyncio.sleep(interval)
+        current = stamp()
+        if current != last and current is not None:
+            print("🔄 New vector store version published")
+            try:
+                await reload_vector_store()
+            except Exception as e:
+                print(f"⚠️  Vector store reload failed: {e}")
+        last = current
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Close pooled connections"""
+    if _watch_task is not None:
+        _watch_task.cancel()
+    await resources.close_aiohttp_session()
 
 
 # ============ API Endpoints ============
 
-@app.get("/health", response_model=HealthResponse)
+@app.get("/health", response_model=HealthResponse, responses={503: {"model": HealthResponse}})
 async def health_check():
     """
-    Health check endpoint - returns 200 OK if service is running.
+    Health check endpoint - returns 200 OK once the service is ready to
+    answer queries (start-up warm-up finished), 503 while warming up.
     Required for Hack-A-Cure submission.
     """
+    if not ready:
+        return JSONResponse(status_code=503, content={"status": "warming_up"})
     return {"status": "ok"}
 
 
@@ -133,7 +421,8 @@ async def favicon():
 
 
 @app.post("/query", response_model=QueryResponse)
-async def query_endpoint(request: QueryRequest):
+async def query_endpoint(request: QueryRequest,
+                         x_request_deadline_ms: Optional[int] = Header(default=None, ge=1)):
     """
     Main RAG query endpoint.
     
@@ -146,10 +435,13 @@ async def query_endpoint(request: QueryRequest):
     - contexts must be array of plain strings
     - Answer must be concise and based only on retrieved text
     - If retrieval fails: answer = "Information not available in dataset."
+    - Past the deadline (QUERY_DEADLINE_S, or X-Request-Deadline-Ms if shorter)
+      or with the LLM unavailable, the answer is quoted from the contexts
     """
     
     # Check if RAG pipeline is initialized
     if rag_pipeline is None:
+        metrics.FALLBACKS.inc(reason="no_pipeline")
         return QueryResponse(
             answer="Information not available in dataset.",
             contexts=[]
@@ -159,11 +451,17 @@ async def query_endpoint(request: QueryRequest):
     if not request.query or not request.query.strip():
         raise HTTPException(status_code=400, detail="Query cannot be empty")
     
+    budget = QUERY_DEADLINE_S
+    if x_request_deadline_ms is not None:
+        budget = min(budget, x_request_deadline_ms / 1000)
+    deadline = resilience.start_deadline(budget)
     try:
-        # Execute RAG pipeline
-        result = rag_pipeline.query(
+        # Execute RAG pipeline (async path keeps the event loop free)
+        result = await rag_pipeline.aquery(
             question=request.query,
-            top_k=request.top_k
+            top_k=request.top_k,
+            # A shared run would impose a shortened budget on every other caller
+            coalesce=budget >= QUERY_DEADLINE_S
         )
         
         # Ensure result has required fields
@@ -188,6 +486,7 @@ async def query_endpoint(request: QueryRequest):
         
     except Exception as e:
         print(f"Error processing query: {e}")
+        metrics.ERRORS.inc(stage="endpoint")
         import traceback
         traceback.print_exc()
         
@@ -196,6 +495,146 @@ async def query_endpoint(request: QueryRequest):
             answer="Information not available in dataset.",
             contexts=[]
         )
+    finally:
+        resilience.end_deadline(deadline)
+
+
+def _sse(event: str, data: dict) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/query/stream")
+async def query_stream_endpoint(request: QueryRequest):
+    """
+    Streaming variant of /query (server-sent events).
+    
+    Events, in order:
+    - contexts: {"contexts": ["snippet1", ...]} right after retrieval
+    - token: {"text": "..."} for each piece of the answer as it is generated
+    - done: {"answer": "..."} with the complete answer
+    """
+    if not request.query or not request.query.strip():
+        raise HTTPException(status_code=400, detail="Query cannot be empty")
+    
+    async def events():
+        sent = set()
+        try:
+            if rag_pipeline is not None:
+                async for event, data in rag_pipeline.astream_query(request.query, top_k=request.top_k):
+                    if event == "contexts":
+                        data = {"contexts": [str(ctx) for ctx in data["contexts"]]}
+                    sent.add(event)
+                    yield _sse(event, data)
+        except Exception as e:
+            print(f"Error processing streamed query: {e}")
+            import traceback
+            traceback.print_exc()
+        
+        # Fail-safe: the stream always carries contexts and a final answer
+        if "contexts" not in sent:
+            yield _sse("contexts", {"contexts": []})
+        if "done" not in sent:
+            if "token" not in sent:
+                yield _sse("token", {"text": NO_ANSWER})
+            yield _sse("done", {"answer": NO_ANSWER})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.post("/query/batch")
+async def query_batch_endpoint(request: BatchQueryRequest):
+    """
+    Answer many questions in one request.
+    
+    Retrieval for the whole batch uses one embedding call and one FAISS
+    search. Results stream back as NDJSON in completion order, one line
+    per question: {"index": <position in queries>, "answer": ..., "contexts": [...]}
+    """
+    if any(not query or not query.strip() for query in request.queries):
+        raise HTTPException(status_code=400, detail="Queries cannot be empty")
+    
+    async def lines():
+        answered = set()
+        try:
+            if rag_pipeline is not None:
+                async for i, result in rag_pipeline.aquery_batch(request.queries, top_k=request.top_k):
+                    answered.add(i)
+                    contexts = [str(ctx) for ctx in result.get("contexts", [])]
+                    yield json.dumps({"index": i, "answer": result.get("answer", NO_ANSWER),
+                                      "contexts": contexts}) + "\n"
+        except Exception as e:
+            print(f"Error processing batch query: {e}")
+            import traceback
+            traceback.print_exc()
+        
+        # Fail-safe: every question gets a line, even if the pipeline failed
+        for i in range(len(request.queries)):
+            if i not in answered:
+                yield json.dumps({"index": i, "answer": NO_ANSWER, "contexts": []}) + "\n"
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """
+    Hit/miss statistics for the answer, semantic answer and query-embedding
+    caches, plus query coalescing and the provider circuit breakers
+    """
+    if rag_pipeline is None:
+        return {"answer_cache": None, "semantic_cache": None, "embedding_cache": None, "coalescing": None,
+                "circuit_breakers": {}}
+    
+    answer_cache = rag_pipeline.answer_cache
+    semantic_cache = rag_pipeline.semantic_cache
+    embedding_cache = getattr(rag_pipeline.vector_store, "embedding_cache", None)
+    return {
+        "index_version": rag_pipeline.vector_store.version,
+        "answer_cache": answer_cache.stats() if answer_cache else None,
+        "semantic_cache": semantic_cache.stats() if semantic_cache else None,
+        "coalescing": rag_pipeline.coalescer.stats() if rag_pipeline.coalescer else None,
+        "embedding_cache": embedding_cache.stats() if embedding_cache else None,
+        "circuit_breakers": _breakers()
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """
+    Prometheus text format: per-stage and per-endpoint latency histograms,
+    LLM token counts, error / fallback counters and cache statistics.
+    Each worker process reports its own figures.
+    """
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.post("/admin/reload", response_model=ReloadResponse)
+async def admin_reload(x_admin_token: Optional[str] = Header(default=None)):
+    """
+    Pick up the vector store version most recently published by ingest.py
+    without a restart. Requires the X-Admin-Token header when ADMIN_TOKEN is set.
+    
+    Under the multi-worker launcher the launcher is signalled instead, and
+    it replaces the workers with ones serving the new version.
+    """
+    admin_token = os.getenv("ADMIN_TOKEN")
+    if admin_token and x_admin_token != admin_token:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    
+    if preloaded_vector_store is not None:
+        os.kill(os.getppid(), signal.SIGHUP)
+        return ReloadResponse(status="reloading_workers")
+    
+    try:
+        return await reload_vector_store()
+    except Exception as e:
+        print(f"⚠️  Vector store reload failed: {e}")
+        raise HTTPException(status_code=500, detail="Vector store reload failed")
 
 
 @app.get("/")
@@ -208,9 +647,16 @@ async def root():
         "submission": "Hack-A-Cure",
         "endpoints": {
             "health": "/health - Health check",
-            "query": "/query - Main RAG query endpoint"
+            "query": "/query - Main RAG query endpoint",
+            "query_stream": "/query/stream - Contexts, then answer tokens as server-sent events",
+            "query_batch": "/query/batch - Many questions per request, NDJSON results",
+            "cache_stats": "/cache/stats - Cache, query coalescing and circuit breaker statistics",
+            "metrics": "/metrics - Latency histograms and counters (Prometheus format)",
+            "admin_reload": "/admin/reload - Swap in the latest published vector store"
         },
-        "status": "ready" if rag_pipeline else "vector_store_not_loaded"
+        "status": ("ready" if ready else "warming_up") if rag_pipeline else "vector_store_not_loaded",
+        "index_version": rag_pipeline.vector_store.version if rag_pipeline else None,
+        "warm_up_s": warm_up_timings
     }
 
 
@@ -223,6 +669,25 @@ if __name__ == "__main__":
     print(f"\n🌐 Starting server on http://0.0.0.0:{port}")
     print(f"📖 API docs available at http://localhost:{port}/docs\n")
     
+    workers = int(os.getenv("WORKERS", 1))
+    if workers > 1:
+        # Preforked workers sharing one read-only (memory-mapped) vector store
+        import app as app_module
+        from ingest import CURRENT_FILE, VECTORSTORE_DIR
+        from serve import PreforkServer
+        
+        PreforkServer(
+            app_module.app,
+            preload=app_module.preload_vector_store,
+            workers=workers,
+            port=port,
+            limit_concurrency=int(os.getenv("WORKER_CONCURRENCY", 0)) or None,
+            graceful_timeout=float(os.getenv("WORKER_GRACEFUL_TIMEOUT", 30)),
+            watch_paths=[os.path.join(VECTORSTORE_DIR, CURRENT_FILE)],
+            watch_interval=float(os.getenv("INDEX_WATCH_INTERVAL", 0))
+        ).run()
+        sys.exit(0)
+    
     uvicorn.run(
         "app:app",
         host="0.0.0.0",
@@ -0,0 +1,112 @@
+"""
+Recall-vs-latency benchmark for the FAISS index types supported by VectorStore.
+
+Every index type is built over the same corpus and compared against exact
+IndexFlatL2 results. By default the corpus is a synthetic clustered one;
+--from-store reuses the vectors in ./vectorstore/faiss.index instead.
+
+Usage:
+    python benchmarks/bench_ann_index.py --n 50000 --dim 384 --queries 200 --k 5
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import faiss
+import numpy as np
+
+from ingest import VectorStore
+
+SWEEPS = {
+    "flat": [{}],
+    "ivf_flat": [{"nprobe": p} for p in (1, 4, 16, 64)],
+    "ivf_pq": [{"nprobe": p} for p in (1, 4, 16, 64)],
+    "hnsw": [{"ef_search": ef} for ef in (16, 64, 256)],
+}
+
+
+def synthetic_corpus(n: int, dim: int, n_queries: int, seed: int = 0):
+    """Clustered unit vectors, roughly like topic-grouped text embeddings"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(1, n // 200), dim)).astype("float32")
+    labels = rng.integers(0, len(centers), size=n + n_queries)
+    data = centers[labels] + 0.5 * rng.standard_normal((n + n_queries, dim)).astype("float32")
+    data /= np.linalg.norm(data, axis=1, keepdims=True)
+    return data[:n], data[n:]
+
+
+def store_corpus(n_queries: int, seed: int = 0):
+    store = VectorStore()
+    if not store.load():
+        sys.exit("No vector store found; run ingest.py or drop --from-store")
+    data = store.index.reconstruct_n(0, store.index.ntotal)
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(data), size=n_queries)
+    queries = data[picks] + 0.05 * rng.standard_normal((n_queries, data.shape[1])).astype("float32")
+    return data, queries
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def main(args):
+    if args.from_store:
+        corpus, queries = store_corpus(args.queries)
+    else:
+        corpus, queries = synthetic_corpus(args.n, args.dim, args.queries)
+    metadata = [{"source": "bench", "chunk_id": i, "text": ""} for i in range(len(corpus))]
+
+    exact = faiss.IndexFlatL2(corpus.shape[1])
+    exact.add(corpus)
+    _, truth = exact.search(queries, args.k)
+
+    results = []
+    for index_type in args.types:
+        store = VectorStore(embedding_dim=corpus.shape[1])
+        start = time.perf_counter()
+        store.build_index(corpus, metadata, index_type=index_type)
+        build_s = time.perf_counter() - start
+        index_mb = faiss.serialize_index(store.index).nbytes / (1024 * 1024)
+
+        for params in SWEEPS[index_type]:
+            search_params = store._search_params(**params)
+            found = np.empty_like(truth)
+            start = time.perf_counter()
+            # One query at a time, the way /query calls the index
+            for i in range(len(queries)):
+                _, found[i:i + 1] = store.index.search(queries[i:i + 1], args.k, params=search_params)
+            latency_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+            results.append({
+                "index_type": index_type,
+                **params,
+                "recall_at_k": round(recall_at_k(found, truth), 4),
+                "latency_ms": round(latency_ms, 4),
+                "build_s": round(build_s, 3),
+                "index_mb": round(index_mb, 2),
+            })
+
+    report = {"n": len(corpus), "dim": corpus.shape[1], "queries": len(queries), "k": args.k, "results": results}
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=50000, help="Synthetic corpus size")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--types", nargs="+", default=list(VectorStore.INDEX_TYPES), choices=VectorStore.INDEX_TYPES)
+    parser.add_argument("--from-store", action="store_true", help="Benchmark the vectors in ./vectorstore/")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    main(parser.parse_args())
@@ -0,0 +1,102 @@
+"""
+Load benchmark for /query: blocking pipeline call vs. the async pipeline path.
+
+Both routes are served by the same FastAPI app in one process (one "worker"),
+driven through an in-process ASGI client with a stubbed, latency-injected LLM.
+
+Usage:
+    python benchmarks/bench_async_query.py --requests 64 --concurrency 32 --llm-latency 0.2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import httpx
+
+from benchmarks.stubs import StubOpenAI, make_vector_store
+
+# Both routes must do the full work on every request
+os.environ["ANSWER_CACHE_BACKEND"] = "none"
+os.environ["EMBEDDING_CACHE_MB"] = "0"
+
+
+async def _run_load(client: httpx.AsyncClient, path: str, total: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    health_latencies = []
+
+    async def one(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post(path, json={"query": f"What is condition {i}?", "top_k": 5})
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    async def probe_health():
+        # /health should stay responsive while queries are in flight; the
+        # clock starts when the probe is due, so loop stalls count against it
+        due = time.perf_counter() + 0.05
+        await asyncio.sleep(0.05)
+        await client.get("/health")
+        health_latencies.append(time.perf_counter() - due)
+
+    start = time.perf_counter()
+    await asyncio.gather(probe_health(), *(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "wall_time_s": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 2),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 1),
+        "max_ms": round(latencies[-1] * 1000, 1),
+        "health_under_load_ms": round(health_latencies[0] * 1000, 1),
+    }
+
+
+async def main(args):
+    import app as app_module
+    from app import QueryRequest, QueryResponse
+    from rag_pipeline import RAGPipeline
+
+    stub = StubOpenAI(dim=args.dim, llm_latency=args.llm_latency).install()
+    app_module.rag_pipeline = RAGPipeline(make_vector_store(args.chunks, args.dim))
+
+    async def blocking_query(request: QueryRequest):
+        # Previous behaviour: synchronous pipeline called inside an async route
+        result = app_module.rag_pipeline.query(question=request.query, top_k=request.top_k)
+        return QueryResponse(answer=result["answer"], contexts=result["contexts"])
+
+    app_module.app.add_api_route("/bench/blocking-query", blocking_query, methods=["POST"],
+                                 response_model=QueryResponse)
+
+    transport = httpx.ASGITransport(app=app_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        results = {
+            "before_blocking": await _run_load(client, "/bench/blocking-query", args.requests, args.concurrency),
+            "after_async": await _run_load(client, "/query", args.requests, args.concurrency),
+        }
+
+    stub.uninstall()
+    results["speedup"] = round(
+        results["after_async"]["throughput_rps"] / results["before_blocking"]["throughput_rps"], 2
+    )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Stub LLM latency in seconds")
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--dim", type=int, default=384)
+    asyncio.run(main(parser.parse_args()))
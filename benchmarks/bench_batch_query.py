@@ -0,0 +1,110 @@
+"""
+Batch benchmark: N questions through /query one by one vs. one /query/batch call.
+
+Both runs use the same in-process app, stubbed (latency-injected) OpenAI
+providers and the same generation concurrency, with caches disabled. The
+report counts provider calls and measures time to the first and last answer.
+
+Usage:
+    python benchmarks/bench_batch_query.py --questions 200 --concurrency 8 --llm-latency 0.2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import httpx
+
+from benchmarks.stubs import StubOpenAI, make_vector_store, serve_app
+
+# Every question must do the full work
+os.environ["ANSWER_CACHE_BACKEND"] = "none"
+os.environ["EMBEDDING_CACHE_MB"] = "0"
+
+
+def _questions(n: int):
+    return [f"What is the treatment for condition {i}?" for i in range(n)]
+
+
+async def run_single(client: httpx.AsyncClient, stub: StubOpenAI, questions, concurrency: int) -> dict:
+    stub.calls = dict.fromkeys(stub.calls, 0)
+    semaphore = asyncio.Semaphore(concurrency)
+    first = None
+    start = time.perf_counter()
+
+    async def one(question: str):
+        nonlocal first
+        async with semaphore:
+            response = await client.post("/query", json={"query": question, "top_k": 5})
+            response.raise_for_status()
+        first = first or time.perf_counter() - start
+
+    await asyncio.gather(*(one(question) for question in questions))
+    return {
+        "first_answer_s": round(first, 3),
+        "wall_time_s": round(time.perf_counter() - start, 3),
+        "provider_calls": dict(stub.calls),
+    }
+
+
+async def run_batch(client: httpx.AsyncClient, stub: StubOpenAI, questions) -> dict:
+    stub.calls = dict.fromkeys(stub.calls, 0)
+    seen = set()
+    first = None
+    start = time.perf_counter()
+    async with client.stream("POST", "/query/batch", json={"queries": questions, "top_k": 5}) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if line:
+                seen.add(json.loads(line)["index"])
+                first = first or time.perf_counter() - start
+    assert seen == set(range(len(questions))), "every question must be answered exactly once"
+    return {
+        "first_answer_s": round(first, 3),
+        "wall_time_s": round(time.perf_counter() - start, 3),
+        "provider_calls": dict(stub.calls),
+    }
+
+
+async def main(args):
+    os.environ["RAG_BATCH_CONCURRENCY"] = str(args.concurrency)
+    os.environ["BATCH_MAX_QUERIES"] = str(max(args.questions, 256))
+    import app as app_module
+    import resources
+    from rag_pipeline import RAGPipeline
+
+    stub = StubOpenAI(dim=args.dim, llm_latency=args.llm_latency, embed_latency=args.embed_latency).install()
+    questions = _questions(args.questions)
+    try:
+        app_module.rag_pipeline = RAGPipeline(make_vector_store(args.chunks, args.dim))
+        # Real HTTP: the in-process ASGI transport would buffer the NDJSON stream
+        async with serve_app(app_module.app) as base_url, \
+                httpx.AsyncClient(base_url=base_url, timeout=None,
+                                  limits=httpx.Limits(max_connections=args.concurrency)) as client:
+            results = {
+                "questions": args.questions,
+                "generation_concurrency": args.concurrency,
+                "single_query": await run_single(client, stub, questions, args.concurrency),
+                "batch": await run_batch(client, stub, questions),
+            }
+    finally:
+        stub.uninstall()
+        await resources.close_aiohttp_session()
+    results["speedup"] = round(results["single_query"]["wall_time_s"] / results["batch"]["wall_time_s"], 2)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8, help="Completions / requests in flight")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Stub LLM latency in seconds")
+    parser.add_argument("--embed-latency", type=float, default=0.05, help="Stub embedding latency in seconds")
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=384)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,148 @@
+"""
+Request coalescing: upstream calls saved during a spike of identical
+queries, and the cancellation / error semantics of shared runs.
+
+spike      --trending questions are each asked --copies times (in varying
+           case and punctuation) alongside --unique one-off questions, all
+           arriving within --spread seconds, through RAGPipeline.aquery with
+           stubbed OpenAI providers. Runs with the answer cache off and on
+           (a cold cache misses every duplicate that arrives before the first
+           answer is stored), each with coalescing off and on. Reports
+           completed LLM and embedding calls and latency.
+semantics  Checks that cancelled callers do not cancel a run others still
+           wait for, that a run every caller abandoned is cancelled (and the
+           next caller starts over), and that an exception reaches every
+           waiter without being remembered.
+
+Usage:
+    python benchmarks/bench_coalescing.py --trending 5 --copies 40 --unique 50 --spread 0.5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from benchmarks.stubs import StubOpenAI, make_vector_store
+
+os.environ["EMBEDDING_CACHE_MB"] = "0"
+os.environ["RERANK_ENABLED"] = "false"
+
+from coalescer import RequestCoalescer
+
+VARIANTS = ("{q}", "{q}?", "{Q}", "  {q} ?")
+
+
+async def run_spike(args, store, cache: str, coalesce: bool) -> dict:
+    from rag_pipeline import RAGPipeline
+
+    os.environ["ANSWER_CACHE_BACKEND"] = cache
+    os.environ["COALESCE_QUERIES"] = str(coalesce).lower()
+    stub = StubOpenAI(dim=args.dim, llm_latency=args.llm_latency).install()
+    pipeline = RAGPipeline(store)
+
+    rng = random.Random(0)
+    questions = [VARIANTS[c % len(VARIANTS)].format(q=f"what treats condition {t}", Q=f"WHAT TREATS CONDITION {t}")
+                 for t in range(args.trending) for c in range(args.copies)]
+    questions += [f"what is the dose for case {u}" for u in range(args.unique)]
+    rng.shuffle(questions)
+    latencies = []
+
+    async def one(question: str):
+        await asyncio.sleep(rng.uniform(0, args.spread))
+        start = time.perf_counter()
+        await pipeline.aquery(question, top_k=5)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(question) for question in questions))
+    elapsed = time.perf_counter() - start
+    stub.uninstall()
+    pipeline.executor.shutdown()
+    latencies.sort()
+    return {
+        "answer_cache": cache,
+        "coalescing": coalesce,
+        "requests": len(questions),
+        "llm_calls": stub.calls["chat"],
+        "embedding_calls": stub.calls["embedding"],
+        "latency_ms_p50": round(statistics.median(latencies) * 1000, 1),
+        "latency_ms_p99": round(latencies[int(0.99 * (len(latencies) - 1))] * 1000, 1),
+        "elapsed_s": round(elapsed, 2),
+        "coalescer": pipeline.coalescer.stats() if pipeline.coalescer else None,
+    }
+
+
+async def check_semantics(args, store) -> dict:
+    from rag_pipeline import RAGPipeline
+
+    os.environ["ANSWER_CACHE_BACKEND"] = "none"
+    os.environ["COALESCE_QUERIES"] = "true"
+    stub = StubOpenAI(dim=args.dim, llm_latency=0.2).install()
+    pipeline = RAGPipeline(store)
+    checks = {}
+
+    # 9 of 10 callers disconnect; the last one still gets the shared answer
+    tasks = [asyncio.create_task(pipeline.aquery("What treats condition 1?")) for _ in range(10)]
+    await asyncio.sleep(0.05)
+    for task in tasks[:9]:
+        task.cancel()
+    result = await tasks[9]
+    checks["survivor_answered"] = result["answer"].startswith("Stub answer")
+    checks["partial_cancel_llm_calls"] = stub.calls["chat"]
+
+    # Everyone disconnects: the run is cancelled, the next caller starts over
+    tasks = [asyncio.create_task(pipeline.aquery("What treats condition 2?")) for _ in range(5)]
+    await asyncio.sleep(0.05)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await asyncio.sleep(0.3)
+    checks["abandoned_llm_calls_completed"] = stub.calls["chat"] - checks["partial_cancel_llm_calls"]
+    result = await pipeline.aquery("What treats condition 2?")
+    checks["after_abandon_answered"] = result["answer"].startswith("Stub answer")
+    checks["pipeline_stats"] = pipeline.coalescer.stats()
+    stub.uninstall()
+    pipeline.executor.shutdown()
+
+    # Exceptions reach every waiter and are not cached
+    coalescer, attempts = RequestCoalescer(), []
+
+    async def failing():
+        attempts.append(1)
+        await asyncio.sleep(0.05)
+        raise RuntimeError("upstream down")
+
+    outcomes = await asyncio.gather(*(coalescer.run("k", failing) for _ in range(5)), return_exceptions=True)
+    checks["waiters_got_error"] = sum(isinstance(outcome, RuntimeError) for outcome in outcomes)
+    await asyncio.gather(coalescer.run("k", failing), return_exceptions=True)
+    checks["error_runs"] = len(attempts)
+    checks["error_stats"] = coalescer.stats()
+    return checks
+
+
+async def main(args):
+    store = make_vector_store(args.chunks, args.dim)
+    spikes = []
+    for cache in ("none", "memory"):
+        for coalesce in (False, True):
+            spikes.append(await run_spike(args, store, cache, coalesce))
+    print(json.dumps({"spike": spikes, "semantics": await check_semantics(args, store)}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trending", type=int, default=5)
+    parser.add_argument("--copies", type=int, default=40, help="Requests per trending question")
+    parser.add_argument("--unique", type=int, default=50)
+    parser.add_argument("--spread", type=float, default=0.5, help="Seconds over which requests arrive")
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--llm-latency", type=float, default=1.0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,109 @@
+"""
+Prompt-size benchmark for token-budgeted context packing.
+
+Synthetic textbooks are chunked with DocumentProcessor.chunk_text_semantic
+(CHUNK_SIZE / CHUNK_OVERLAP), so neighbouring chunks repeat their 200-character
+overlap exactly as in the real index. Each simulated retrieval returns top_k
+chunks drawn from a few contiguous passages (neighbours of each other), in
+shuffled relevance order, plus duplicates of the same passage from a second
+edition of the book.
+
+For each budget the report gives prompt tokens for the full generation
+prompt (RAGPipeline._build_messages), the number of context blocks, the
+share of distinct sentences from the retrieved chunks that still reach the
+prompt, and packing time.
+
+Usage:
+    python benchmarks/bench_context_packing.py --top-k 20 --budgets 0 6000 3000 1500
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+
+import benchmarks.stubs  # noqa: F401  (sets a placeholder OPENAI_API_KEY)
+
+
+def make_book(rng, n_sentences: int) -> str:
+    words = ["insulin", "glucose", "renal", "cardiac", "therapy", "dose", "patients", "risk",
+             "chronic", "acute", "monitoring", "symptoms", "treatment", "diagnosis", "levels"]
+    return " ".join(
+        f"Sentence {i}: " + " ".join(rng.choice(words, size=rng.integers(8, 20))) + "."
+        for i in range(n_sentences)
+    )
+
+
+def retrievals(rng, books, chunks, top_k: int, n: int, passages: int):
+    """n ranked result lists of top_k {'source', 'text'} dicts"""
+    for _ in range(n):
+        results = []
+        while len(results) < top_k:
+            book = int(rng.integers(len(books)))
+            start = int(rng.integers(len(chunks[book]) - 8))
+            for chunk in chunks[book][start:start + top_k // passages + 1]:
+                # Second edition: same text under another file name
+                source = f"{books[book]}_2e.pdf" if rng.random() < 0.2 else f"{books[book]}.pdf"
+                results.append({"source": source, "text": chunk})
+        results = results[:top_k]
+        rng.shuffle(results)
+        yield results
+
+
+def sentences(texts) -> set:
+    return set(re.findall(r"Sentence \d+:[^.]*\.", " ".join(texts)))
+
+
+def main(args):
+    from context_packer import ContextPacker
+    from ingest import DocumentProcessor
+    from rag_pipeline import RAGPipeline
+
+    rng = np.random.default_rng(0)
+    processor = DocumentProcessor(init_embeddings=False)
+    books = [f"book_{i}" for i in range(args.books)]
+    texts = [make_book(rng, 2000) for _ in books]
+    chunks = [processor.chunk_text_semantic(text) for text in texts]
+    cases = list(retrievals(rng, books, chunks, args.top_k, args.cases, args.passages))
+
+    pipeline = RAGPipeline(vector_store=None)
+    results = {"top_k": args.top_k, "chunk_size": processor.chunk_size, "chunk_overlap": processor.chunk_overlap}
+    for budget in args.budgets:
+        pipeline.context_packer = ContextPacker(budget=budget, max_overlap=2 * processor.chunk_overlap + 64) \
+            if budget else None
+        tokens, blocks, coverage, pack_ms = [], [], [], []
+        for case in cases:
+            contexts = [result["text"] for result in case]
+            start = time.perf_counter()
+            packed = pipeline.context_packer.pack(case) if pipeline.context_packer else case
+            pack_ms.append((time.perf_counter() - start) * 1000)
+            messages = pipeline._build_messages("What is the recommended therapy?", contexts)
+            tokens.append(sum(len(message["content"]) for message in messages) // 4)
+            blocks.append(len(packed))
+            coverage.append(len(sentences(r["text"] for r in packed)) / len(sentences(contexts)))
+        results[f"budget_{budget}" if budget else "no_packing"] = {
+            "prompt_tokens_mean": round(statistics.mean(tokens)),
+            "prompt_tokens_max": max(tokens),
+            "context_blocks_mean": round(statistics.mean(blocks), 1),
+            "sentence_coverage": round(statistics.mean(coverage), 3),
+            "pack_ms_p50": round(statistics.median(pack_ms), 2),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top-k", type=int, default=20)
+    parser.add_argument("--passages", type=int, default=3, help="Contiguous passages per retrieval")
+    parser.add_argument("--cases", type=int, default=200)
+    parser.add_argument("--books", type=int, default=5)
+    parser.add_argument("--budgets", type=int, nargs="+", default=[0, 6000, 3000, 1500],
+                        help="Context token budgets to compare (0 = no packing)")
+    main(parser.parse_args())
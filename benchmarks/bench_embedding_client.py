@@ -0,0 +1,173 @@
+"""
+EmbeddingClient against a local stub embedding server that injects rate limits.
+
+The server speaks the OpenAI /v1/embeddings protocol, admits a fixed number of
+requests per second (429 + Retry-After beyond that) and fails a fraction of
+requests with 500/503. Three runs are compared:
+
+  sequential   one 100-item batch at a time (the previous ingest.py loop, but
+               with retries so it can finish at all)
+  concurrent   token-budgeted batches, EMBEDDING_CONCURRENCY in flight
+  resume       the server rejects some batches permanently; the completed ones
+               land in an EmbeddingStore and a second run only sends the rest
+
+Every returned vector is checked against the deterministic stub embedding.
+
+Usage:
+    python benchmarks/bench_embedding_client.py --chunks 3000 --rps 5 --error-rate 0.05
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import deque
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+import openai
+from aiohttp import web
+
+from benchmarks.stubs import stub_embedding
+from embedding_client import EmbeddingClient, EmbeddingError
+from embedding_store import EmbeddingStore
+
+MODEL = "text-embedding-3-large"
+
+
+class StubEmbeddingServer:
+    """Local /v1/embeddings endpoint with a sliding-window rate limit and injected 5xx"""
+
+    def __init__(self, dim: int, rps: int, error_rate: float, latency: float, seed: int = 0):
+        self.dim = dim
+        self.rps = rps
+        self.error_rate = error_rate
+        self.latency = latency
+        self.rng = np.random.default_rng(seed)
+        self.poison = set()
+        self._window = deque()
+        self.counts = {"ok": 0, "429": 0, "5xx": 0, "rejected": 0}
+
+    async def embeddings(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        texts = body["input"]
+        now = time.monotonic()
+        while self._window and now - self._window[0] > 1.0:
+            self._window.popleft()
+        if len(self._window) >= self.rps:
+            self.counts["429"] += 1
+            retry_after = max(0.05, 1.0 - (now - self._window[0]))
+            return web.json_response(
+                {"error": {"message": "Rate limit reached", "type": "requests"}},
+                status=429, headers={"Retry-After": f"{retry_after:.2f}"}
+            )
+        self._window.append(now)
+
+        if any(text in self.poison for text in texts):
+            self.counts["rejected"] += 1
+            return web.json_response({"error": {"message": "Stub outage", "type": "server_error"}}, status=500)
+        if self.rng.random() < self.error_rate:
+            self.counts["5xx"] += 1
+            status = int(self.rng.choice([500, 503]))
+            return web.json_response({"error": {"message": "Injected failure", "type": "server_error"}},
+                                     status=status)
+
+        # Latency grows with the request size, like the real endpoint
+        await asyncio.sleep(self.latency * (1 + len(texts) / 100))
+        self.counts["ok"] += 1
+        return web.json_response({
+            "object": "list",
+            "model": body["model"],
+            "data": [
+                {"object": "embedding", "index": i, "embedding": stub_embedding(text, self.dim).tolist()}
+                for i, text in enumerate(texts)
+            ]
+        })
+
+    async def start(self) -> web.AppRunner:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post("/v1/embeddings", self.embeddings)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = runner.addresses[0][1]
+        openai.api_base = f"http://127.0.0.1:{port}/v1"
+        openai.api_key = "sk-benchmark-stub"
+        return runner
+
+
+def _check(texts, embeddings, dim: int) -> bool:
+    expected = np.stack([stub_embedding(text, dim) for text in texts])
+    return embeddings.shape == expected.shape and np.allclose(embeddings, expected, atol=1e-6)
+
+
+async def _timed(server: StubEmbeddingServer, client: EmbeddingClient, texts, dim: int, **kwargs) -> dict:
+    server.counts = dict.fromkeys(server.counts, 0)
+    start = time.perf_counter()
+    embeddings = await client.aembed(texts, **kwargs)
+    return {
+        "wall_time_s": round(time.perf_counter() - start, 3),
+        "batches": len(client.make_batches(texts)),
+        "correct": _check(texts, embeddings, dim),
+        "client": client.stats(),
+        "server": dict(server.counts),
+    }
+
+
+async def main(args):
+    texts = [f"Synthetic medical chunk {i}. " + "Clinical detail. " * (20 + i % 40) for i in range(args.chunks)]
+    server = StubEmbeddingServer(args.dim, args.rps, args.error_rate, args.latency)
+    runner = await server.start()
+    backoff = {"backoff": 0.05, "max_backoff": 2.0, "max_retries": 10}
+    results = {}
+    try:
+        results["sequential"] = await _timed(
+            server, EmbeddingClient(MODEL, concurrency=1, batch_tokens=10 ** 9, batch_size=100, **backoff),
+            texts, args.dim
+        )
+        results["concurrent"] = await _timed(
+            server, EmbeddingClient(MODEL, concurrency=args.concurrency, batch_tokens=args.batch_tokens, **backoff),
+            texts, args.dim
+        )
+
+        # Resume: one batch fails permanently, the rest are persisted as they complete
+        with tempfile.TemporaryDirectory() as tmp:
+            store = EmbeddingStore(tmp)
+            client = EmbeddingClient(MODEL, concurrency=args.concurrency, batch_tokens=args.batch_tokens,
+                                     **{**backoff, "max_retries": 2})
+            server.poison = {texts[len(texts) // 2]}
+            try:
+                await client.aembed(texts, on_batch=lambda t, e: store.add(MODEL, t, e))
+                failed = None
+            except EmbeddingError as e:
+                failed = {"completed": e.completed, "total": e.total}
+            server.poison = set()
+
+            _, missing = store.lookup(MODEL, texts)
+            resumed = await _timed(
+                server, EmbeddingClient(MODEL, concurrency=args.concurrency, batch_tokens=args.batch_tokens, **backoff),
+                [texts[i] for i in missing], args.dim
+            )
+            results["resume"] = {"first_run": failed, "resent_chunks": len(missing), "second_run": resumed}
+    finally:
+        await runner.cleanup()
+
+    results["speedup"] = round(results["sequential"]["wall_time_s"] / results["concurrent"]["wall_time_s"], 2)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=3000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--rps", type=int, default=5, help="Requests per second the stub admits")
+    parser.add_argument("--error-rate", type=float, default=0.05, help="Fraction of requests failed with 5xx")
+    parser.add_argument("--latency", type=float, default=0.1, help="Stub latency per 100 inputs, seconds")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--batch-tokens", type=int, default=20000)
+    asyncio.run(main(parser.parse_args()))
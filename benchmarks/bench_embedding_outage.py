@@ -0,0 +1,101 @@
+"""
+Retrieval while the OpenAI embedding endpoint is down.
+
+Queries run through RAGPipeline.aquery against a synthetic store built with
+stubbed --dim embeddings (1536 by default, so the 384-dim local fallback
+model does not fit the index). Every embedding call fails:
+
+error    the call raises openai.error.APIError
+timeout  the call hangs past QUERY_EMBEDDING_TIMEOUT_S (--embed-timeout)
+
+Each mode runs with RETRIEVAL_MODE=hybrid and dense. Hybrid queries get no
+query vector and are ranked by BM25 alone, so they still return contexts
+(and a generated answer, since the fake LLM is up); dense queries have no
+ranking left and come back empty. Reports queries with contexts, answers
+generated / empty, embedding fallbacks by reason and latency.
+
+Usage:
+    python benchmarks/bench_embedding_outage.py --queries 50
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import openai
+
+from benchmarks.stubs import StubOpenAI, make_vector_store
+
+os.environ["ANSWER_CACHE_BACKEND"] = "none"
+os.environ["EMBEDDING_CACHE_MB"] = "0"
+os.environ["RERANK_ENABLED"] = "false"
+os.environ["COALESCE_QUERIES"] = "false"
+os.environ["EMBEDDING_BREAKER_FAILURES"] = "0"
+
+from metrics import FALLBACKS
+
+REASONS = ("local_embedding", "no_query_vector")
+
+
+def failing_embedding(mode: str, hang: float):
+    async def acreate(**kwargs):
+        if mode == "timeout":
+            await asyncio.sleep(hang)
+        raise openai.error.APIError("injected embedding outage")
+    return acreate
+
+
+async def run_mode(args, store, mode: str, retrieval: str) -> dict:
+    from rag_pipeline import NO_ANSWER, RAGPipeline
+
+    stub = StubOpenAI(dim=args.dim, llm_latency=args.llm_latency).install()
+    openai.Embedding.acreate = failing_embedding(mode, args.embed_timeout * 2)
+    store.retrieval_mode = retrieval
+    store.embedding_timeout = args.embed_timeout
+    pipeline = RAGPipeline(store)
+    fallbacks_before = {reason: FALLBACKS.value(reason=reason) for reason in REASONS}
+
+    latencies, with_contexts, empty = [], 0, 0
+    for i in range(args.queries):
+        began = time.perf_counter()
+        result = await pipeline.aquery(f"what is known about condition {i % 97}", top_k=5)
+        latencies.append(time.perf_counter() - began)
+        with_contexts += bool(result["contexts"])
+        empty += result["answer"] == NO_ANSWER
+    stub.uninstall()
+    pipeline.executor.shutdown()
+
+    latencies.sort()
+    return {
+        "mode": mode,
+        "retrieval": retrieval,
+        "queries": args.queries,
+        "with_contexts": with_contexts,
+        "generated": args.queries - empty,
+        "no_answer": empty,
+        "fallbacks": {reason: int(FALLBACKS.value(reason=reason) - fallbacks_before[reason]) for reason in REASONS},
+        "latency_ms_p50": round(latencies[len(latencies) // 2] * 1000, 1),
+    }
+
+
+async def main(args):
+    store = make_vector_store(args.chunks, args.dim)
+    results = [await run_mode(args, store, mode, retrieval)
+               for mode in args.modes for retrieval in ("hybrid", "dense")]
+    print(json.dumps({"settings": vars(args), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--dim", type=int, default=1536, help="Index width (384 matches the local model)")
+    parser.add_argument("--llm-latency", type=float, default=0.02)
+    parser.add_argument("--embed-timeout", type=float, default=0.05)
+    parser.add_argument("--modes", nargs="+", default=["error", "timeout"], choices=["error", "timeout"])
+    asyncio.run(main(parser.parse_args()))
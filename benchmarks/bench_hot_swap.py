@@ -0,0 +1,173 @@
+"""
+Zero-downtime vector store updates: atomic publish and in-process hot-swap.
+
+torn_reads   A reader thread loads ./vectorstore/ in a loop (memory-mapped,
+             like the server) while the store is rewritten --rewrites times,
+             once with the in-place save() and once with publish(). Counts
+             loads that failed or saw a half-written store.
+swap         The real app is served over HTTP (startup events included,
+             stubbed OpenAI providers) while a closed-loop client keeps
+             --concurrency /query requests in flight. Halfway through, a new
+             version is published and swapped in via POST /admin/reload.
+             Reports errors / fallback answers and latency before, during and
+             after the swap.
+
+Everything runs in a temporary directory; ./vectorstore/ is not touched.
+
+Usage:
+    python benchmarks/bench_hot_swap.py --chunks 100000 --concurrency 16 --duration 10
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import httpx
+
+from benchmarks.stubs import StubOpenAI, make_vector_store, serve_app
+
+os.environ["ANSWER_CACHE_BACKEND"] = "none"
+os.environ["EMBEDDING_CACHE_MB"] = "0"
+os.environ["VECTORSTORE_MMAP"] = "true"
+
+NO_ANSWER = "Information not available in dataset."
+
+
+def bench_torn_reads(args, stores) -> dict:
+    from ingest import VectorStore
+
+    def run(write) -> dict:
+        write(stores[0])
+        stop, loads, failures = threading.Event(), [0], [0]
+
+        def reader():
+            while not stop.is_set():
+                store = VectorStore()
+                try:
+                    ok = store.load() and store.index.ntotal == len(store.metadata)
+                except Exception:
+                    ok = False
+                loads[0] += 1
+                failures[0] += not ok
+
+        thread = threading.Thread(target=reader)
+        thread.start()
+        start = time.perf_counter()
+        for i in range(args.rewrites):
+            write(stores[(i + 1) % 2])
+        elapsed = time.perf_counter() - start
+        stop.set()
+        thread.join()
+        return {"loads": loads[0], "failed_loads": failures[0], "write_s": round(elapsed / args.rewrites, 3)}
+
+    # Both threads print on every load / save
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        return {
+            "in_place_save": run(lambda store: store.save()),
+            "publish": run(lambda store: store.publish()),
+        }
+
+
+async def bench_swap(args, stores) -> dict:
+    import app as app_module
+
+    stores[0].publish()
+    stub = StubOpenAI(dim=args.dim, llm_latency=args.llm_latency).install()
+    samples, failures = [], []
+    swap = {}
+
+    async with serve_app(app_module.app, lifespan="on") as base_url, \
+            httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        while (await client.get("/health")).status_code != 200:
+            await asyncio.sleep(0.05)
+        old_version = (await client.get("/")).json()["index_version"]
+        deadline = time.perf_counter() + args.duration
+
+        async def user(u: int):
+            i = 0
+            while time.perf_counter() < deadline:
+                i += 1
+                start = time.perf_counter()
+                try:
+                    response = await client.post("/query", json={"query": f"What treats condition {u}-{i}?",
+                                                                  "top_k": 5})
+                    ok = response.status_code == 200 and response.json()["answer"] != NO_ANSWER
+                except httpx.TransportError:
+                    ok = False
+                (samples if ok else failures).append((start, time.perf_counter() - start))
+
+        async def swapper():
+            await asyncio.sleep(args.duration / 2)
+            loop = asyncio.get_running_loop()
+            swap["publish_s"] = await loop.run_in_executor(None, lambda: _timed(stores[1].publish))
+            swap["start"] = time.perf_counter()
+            response = await client.post("/admin/reload")
+            swap["end"] = time.perf_counter()
+            swap["response"] = response.json()
+
+        await asyncio.gather(swapper(), *(user(u) for u in range(args.concurrency)))
+        new_version = (await client.get("/")).json()["index_version"]
+    stub.uninstall()
+
+    def window(lo, hi) -> dict:
+        latencies = sorted(latency for start, latency in samples if lo <= start < hi)
+        if not latencies:
+            return {"queries": 0}
+        return {
+            "queries": len(latencies),
+            "latency_ms_p50": round(statistics.median(latencies) * 1000, 1),
+            "latency_ms_p99": round(latencies[int(0.99 * (len(latencies) - 1))] * 1000, 1),
+        }
+
+    return {
+        "chunks": args.chunks,
+        "concurrency": args.concurrency,
+        "old_version": old_version,
+        "new_version": new_version,
+        "reload_response": swap["response"],
+        "publish_s": swap["publish_s"],
+        "reload_s": round(swap["end"] - swap["start"], 3),
+        "failed_or_fallback_queries": len(failures),
+        "before_swap": window(0, swap["start"]),
+        "during_swap": window(swap["start"], swap["end"]),
+        "after_swap": window(swap["end"], float("inf")),
+    }
+
+
+def _timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return round(time.perf_counter() - start, 3)
+
+
+def main(args):
+    # Two corpora of different size, so each publish is a new version
+    stores = [make_vector_store(args.chunks, args.dim), make_vector_store(args.chunks + 1000, args.dim)]
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        os.makedirs("vectorstore")
+        results = {"torn_reads": bench_torn_reads(args, stores)}
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        results["swap"] = asyncio.run(bench_swap(args, stores))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--rewrites", type=int, default=10, help="Store rewrites per torn-read run")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10, help="Seconds of /query load")
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    main(parser.parse_args())
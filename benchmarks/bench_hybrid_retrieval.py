@@ -0,0 +1,119 @@
+"""
+Retrieval benchmark: vector-only vs. hybrid (BM25 + vectors, reciprocal rank fusion).
+
+Synthetic corpus modelled on the failure case of dense retrieval on medical
+text: chunks fall into topics and each one names its own exact identifier
+(an ICD-style code and a drug/gene symbol). Chunk embeddings are the topic
+centroid plus noise, and so are the query embeddings, so vector search finds
+the right topic but cannot tell apart chunks that only differ by their code.
+Each query asks about one code; a hit means that chunk was retrieved.
+
+The report gives hit@1 / hit@k per mode, BM25 latency per query and the size
+and build time of the sparse index. No network access is needed.
+
+Usage:
+    python benchmarks/bench_hybrid_retrieval.py --chunks 50000 --topics 200 --queries 500
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+
+os.environ["EMBEDDING_CACHE_MB"] = "0"
+
+FILLER = ("Patients present with fatigue and weight change; management combines lifestyle measures, "
+          "first-line pharmacotherapy and follow-up of laboratory markers. ")
+
+
+def make_corpus(n_chunks: int, n_topics: int, dim: int, noise: float, rng):
+    centroids = rng.standard_normal((n_topics, dim)).astype("float32")
+    topics = np.arange(n_chunks) % n_topics
+    texts = [
+        f"Topic {topic}. Code Z{i // 10:04d}.{i % 10} (agent RX{i}) is documented as follows. {FILLER}"
+        for i, topic in enumerate(topics)
+    ]
+    embeddings = centroids[topics] + noise * rng.standard_normal((n_chunks, dim)).astype("float32")
+    return texts, embeddings, centroids, topics
+
+
+def hit_rates(results, targets, k: int) -> dict:
+    first = [bool(r) and r[0]["chunk_id"] == t for r, t in zip(results, targets)]
+    top_k = [any(hit["chunk_id"] == t for hit in r[:k]) for r, t in zip(results, targets)]
+    return {"hit@1": round(float(np.mean(first)), 3), f"hit@{k}": round(float(np.mean(top_k)), 3)}
+
+
+def main(args):
+    from ingest import SPARSE_INDEX_FILE, VectorStore
+
+    rng = np.random.default_rng(0)
+    texts, embeddings, centroids, topics = make_corpus(args.chunks, args.topics, args.dim, args.noise, rng)
+    metadata = [{"source": f"book_{i % 20}.pdf", "chunk_id": i, "text": text} for i, text in enumerate(texts)]
+
+    store = VectorStore(embedding_dim=args.dim)
+    store.build_index(embeddings, metadata, index_type="flat")
+    start = time.perf_counter()
+    store.build_sparse_index()
+    sparse_build_s = time.perf_counter() - start
+
+    targets = rng.choice(args.chunks, size=args.queries, replace=False)
+    queries = [f"What is code Z{t // 10:04d}.{t % 10} used for?" for t in targets]
+    query_embeddings = (centroids[topics[targets]]
+                        + args.noise * rng.standard_normal((args.queries, args.dim))).astype("float32")
+
+    with tempfile.TemporaryDirectory() as store_dir:
+        store.save(os.path.join(store_dir, "faiss.index"), os.path.join(store_dir, "metadata.bin"))
+        sparse_mb = os.path.getsize(os.path.join(store_dir, SPARSE_INDEX_FILE)) / 2 ** 20
+        store = VectorStore()
+        store.load(os.path.join(store_dir, "faiss.index"), os.path.join(store_dir, "metadata.bin"), mmap=True)
+
+        sparse_ms = []
+        for query in queries:
+            start = time.perf_counter()
+            store.sparse_index.search(query, store.hybrid_candidates)
+            sparse_ms.append((time.perf_counter() - start) * 1000)
+
+        modes = {}
+        for mode in ("dense", "hybrid"):
+            store.retrieval_mode = mode
+            start = time.perf_counter()
+            results = [store.search_hybrid([query], embedding[None, :], args.k)[0]
+                       for query, embedding in zip(queries, query_embeddings)]
+            modes[mode] = {
+                **hit_rates(results, targets, args.k),
+                "search_ms_mean": round((time.perf_counter() - start) / args.queries * 1000, 2),
+            }
+
+    sparse_ms.sort()
+    print(json.dumps({
+        "chunks": args.chunks,
+        "topics": args.topics,
+        "queries": args.queries,
+        "sparse_index": {
+            "terms": len(store.sparse_index.terms),
+            "postings": len(store.sparse_index.doc_ids),
+            "file_mb": round(sparse_mb, 1),
+            "build_s": round(sparse_build_s, 2),
+            "query_ms_p50": round(statistics.median(sparse_ms), 2),
+            "query_ms_p99": round(sparse_ms[int(0.99 * (len(sparse_ms) - 1))], 2),
+        },
+        **modes,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=50000)
+    parser.add_argument("--topics", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--noise", type=float, default=0.3, help="Embedding noise around the topic centroid")
+    main(parser.parse_args())
@@ -0,0 +1,145 @@
+"""
+QPS scaling of the preforking launcher (serve.py) across worker counts.
+
+For each worker count a launcher process installs the stub OpenAI providers
+(benchmarks.stubs), builds one in-memory synthetic store, and forks the
+workers, which inherit both. A closed-loop client then keeps --concurrency
+/query requests in flight for --duration seconds. The report gives QPS,
+latency percentiles, 503s (per-worker limit_concurrency) and memory: the
+summed PSS of the workers, which counts the copy-on-write-shared store once
+instead of once per worker.
+
+Usage:
+    python benchmarks/bench_multiworker.py --workers 1 2 4 8 --chunks 100000 --llm-latency 0.2
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import httpx
+
+os.environ["ANSWER_CACHE_BACKEND"] = "none"
+os.environ["EMBEDDING_CACHE_MB"] = "0"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _launcher(args, workers: int, port: int):
+    from benchmarks.stubs import StubOpenAI, make_vector_store
+    import app as app_module
+    from serve import PreforkServer
+
+    StubOpenAI(dim=args.dim, llm_latency=args.llm_latency).install()
+    store = make_vector_store(args.chunks, args.dim)
+    PreforkServer(
+        app_module.app, preload=lambda: app_module.preload_vector_store(store), workers=workers,
+        host="127.0.0.1", port=port, limit_concurrency=args.limit_concurrency or None, log_level="warning"
+    ).run()
+
+
+def _worker_pss_mb(master_pid: int) -> float:
+    total = 0
+    with open(f"/proc/{master_pid}/task/{master_pid}/children") as f:
+        pids = f.read().split()
+    for pid in pids:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            total += sum(int(line.split()[1]) for line in f if line.startswith("Pss:"))
+    return round(total / 1024, 1)
+
+
+async def load(base_url: str, concurrency: int, duration: float) -> dict:
+    latencies, rejected, errors = [], 0, 0
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        async def user(u: int):
+            nonlocal rejected, errors
+            i = 0
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                i += 1
+                try:
+                    response = await client.post("/query", json={"query": f"What treats condition {u}-{i}?",
+                                                                  "top_k": 5})
+                except httpx.TransportError:
+                    errors += 1
+                    continue
+                if response.status_code == 503:
+                    rejected += 1
+                elif response.status_code != 200:
+                    errors += 1
+                else:
+                    latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(user(u) for u in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "qps": round(len(latencies) / elapsed, 1),
+        "latency_ms_p50": round(statistics.median(latencies) * 1000, 1),
+        "latency_ms_p99": round(latencies[int(0.99 * (len(latencies) - 1))] * 1000, 1),
+        "rejected_503": rejected,
+        "errors": errors,
+    }
+
+
+async def wait_ready(base_url: str, timeout: float = 300):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get("/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise TimeoutError("server did not become ready")
+
+
+def main(args):
+    ctx = multiprocessing.get_context("fork")
+    results = {"cpus": os.cpu_count(), "chunks": args.chunks, "concurrency": args.concurrency,
+               "llm_latency_s": args.llm_latency}
+    for workers in args.workers:
+        port = _free_port()
+        launcher = ctx.Process(target=_launcher, args=(args, workers, port))
+        launcher.start()
+        base_url = f"http://127.0.0.1:{port}"
+        try:
+            asyncio.run(wait_ready(base_url))
+            # All workers must be up, not just the first one
+            time.sleep(1 + workers * 0.5)
+            report = asyncio.run(load(base_url, args.concurrency, args.duration))
+            report["workers_pss_mb"] = _worker_pss_mb(launcher.pid)
+            results[f"workers_{workers}"] = report
+        finally:
+            os.kill(launcher.pid, signal.SIGTERM)
+            launcher.join(60)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--concurrency", type=int, default=64, help="Requests in flight")
+    parser.add_argument("--duration", type=float, default=15, help="Seconds of load per worker count")
+    parser.add_argument("--limit-concurrency", type=int, default=0, help="Per-worker limit (0 = none)")
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--chunks", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    main(parser.parse_args())
@@ -0,0 +1,131 @@
+"""
+Rerank benchmark: top-k retrieval straight into the prompt vs. over-fetch +
+cross-encoder rerank + score cut-off.
+
+Synthetic corpus of ~1000-character chunks: each condition has a few
+chunks that describe its complications and more that only mention it. Both
+runs go through RAGPipeline.aquery with caches off and a stub LLM whose
+latency grows with prompt size (--prefill-latency seconds per 1k prompt
+tokens). The report gives latency, prompt tokens and contexts per question,
+and the share of contexts that are on-topic (the chunk that matches both
+the condition and "complications").
+
+By default the cross-encoder is a CPU-burning stub (benchmarks.stubs);
+pass --model cross-encoder/ms-marco-MiniLM-L-6-v2 to time the real model
+(needs sentence-transformers and the model download).
+
+Usage:
+    python benchmarks/bench_rerank.py --questions 50 --top-k 10 --candidates 50
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+
+from benchmarks.stubs import StubCrossEncoder, StubOpenAI, stub_embedding
+
+# Every question must do the full work
+os.environ["ANSWER_CACHE_BACKEND"] = "none"
+os.environ["EMBEDDING_CACHE_MB"] = "0"
+
+FILLER = ("Clinical assessment includes history, examination and targeted laboratory tests; "
+          "management is individualised and reviewed at follow-up visits. ")
+
+
+def make_corpus(n_conditions: int, per_condition: int, text_len: int):
+    rows = []
+    for c in range(n_conditions):
+        for j in range(per_condition):
+            if j < 2:
+                lead = f"Complications of condition {c} include organ damage in stage {j + 1}."
+            else:
+                lead = f"Condition {c}: epidemiology and presentation, section {j}."
+            rows.append({"source": f"book_{c % 20}.pdf", "chunk_id": len(rows),
+                         "text": (lead + " " + FILLER * (text_len // len(FILLER) + 1))[:text_len]})
+    return rows
+
+
+async def run(pipeline, stub: StubOpenAI, questions, top_k: int) -> dict:
+    stub.prompt_tokens = 0
+    latencies, n_contexts, on_topic = [], [], []
+    for c, question in questions:
+        start = time.perf_counter()
+        result = await pipeline.aquery(question, top_k=top_k)
+        latencies.append(time.perf_counter() - start)
+        contexts = result["contexts"]
+        n_contexts.append(len(contexts))
+        on_topic.append(sum(f"Complications of condition {c} " in text for text in contexts) / max(1, len(contexts)))
+    return {
+        "latency_ms_p50": round(statistics.median(latencies) * 1000, 1),
+        "latency_ms_mean": round(statistics.mean(latencies) * 1000, 1),
+        "prompt_tokens_per_question": round(stub.prompt_tokens / len(questions)),
+        "contexts_per_question": round(statistics.mean(n_contexts), 2),
+        "on_topic_share": round(statistics.mean(on_topic), 3),
+    }
+
+
+async def main(args):
+    from ingest import VectorStore
+    from rag_pipeline import RAGPipeline
+    from reranker import CrossEncoderReranker
+
+    rows = make_corpus(args.conditions, args.per_condition, args.text_len)
+    embeddings = np.stack([stub_embedding(row["text"], args.dim) for row in rows])
+    store = VectorStore(embedding_dim=args.dim)
+    store.build_index(embeddings, rows, index_type="flat")
+
+    stub = StubOpenAI(dim=args.dim, llm_latency=args.llm_latency, prefill_latency=args.prefill_latency).install()
+    pipeline = RAGPipeline(store)
+    rng = np.random.default_rng(0)
+    questions = [(int(c), f"What are the complications of condition {c}?")
+                 for c in rng.choice(args.conditions, size=args.questions, replace=False)]
+
+    baseline = await run(pipeline, stub, questions, args.top_k)
+
+    model = None if args.model else StubCrossEncoder(pair_latency=args.pair_latency)
+    pipeline.reranker = CrossEncoderReranker(
+        model_name=args.model or "stub", candidates=args.candidates, batch_size=args.batch_size,
+        min_score=args.min_score, model=model
+    )
+    pipeline.reranker.rerank("warm-up", [{"text": "warm-up"}], 1)
+    reranked = await run(pipeline, stub, questions, args.top_k)
+    stub.uninstall()
+
+    print(json.dumps({
+        "questions": args.questions,
+        "top_k": args.top_k,
+        "candidates": args.candidates,
+        "min_score": args.min_score,
+        "cross_encoder": args.model or f"stub ({args.pair_latency * 1000:g} ms/pair)",
+        "llm": f"{args.llm_latency:g} s + {args.prefill_latency:g} s per 1k prompt tokens",
+        "top_k_only": baseline,
+        "rerank": reranked,
+        "prompt_token_savings": round(1 - reranked["prompt_tokens_per_question"]
+                                      / baseline["prompt_tokens_per_question"], 3),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--candidates", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--min-score", type=float, default=0.0)
+    parser.add_argument("--model", default=None, help="Real CrossEncoder model name (default: stub)")
+    parser.add_argument("--pair-latency", type=float, default=0.004, help="Stub cross-encoder cost per pair, s")
+    parser.add_argument("--llm-latency", type=float, default=1.0, help="Stub LLM base latency, s")
+    parser.add_argument("--prefill-latency", type=float, default=0.3, help="Stub LLM s per 1k prompt tokens")
+    parser.add_argument("--conditions", type=int, default=500)
+    parser.add_argument("--per-condition", type=int, default=8)
+    parser.add_argument("--text-len", type=int, default=1000)
+    parser.add_argument("--dim", type=int, default=384)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,171 @@
+"""
+Deadlines, circuit breaker and extractive degradation during an LLM brownout.
+
+Requests arrive at --rate per second for --duration seconds through
+RAGPipeline.aquery with stubbed OpenAI providers. Between --brownout START
+END seconds the fake LLM misbehaves: --error-rate of its calls fail after
+--error-latency seconds, the rest hang for --hang seconds. Outside the
+brownout it answers in --llm-latency seconds.
+
+Times are scaled down so a run takes seconds: --llm-timeout stands in for
+the fixed 50 s completion timeout, --deadline for the /query budget.
+
+Each mode runs the same arrivals:
+
+baseline   no deadline, no breaker (requests wait for the LLM timeout)
+deadline   every request carries --deadline
+breaker    LLM circuit breaker on (--failures, --slow-call, --reset)
+both       deadline and breaker
+
+Reports latency inside and outside the brownout, answers that were
+generated / extractive / empty, how long after the brownout answers were
+generated again, LLM calls started and fallbacks by reason.
+
+Usage:
+    python benchmarks/bench_resilience.py --rate 40 --duration 6 --brownout 1 4
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import openai
+
+from benchmarks.stubs import StubOpenAI, make_vector_store
+
+os.environ["ANSWER_CACHE_BACKEND"] = "none"
+os.environ["EMBEDDING_CACHE_MB"] = "0"
+os.environ["RERANK_ENABLED"] = "false"
+os.environ["COALESCE_QUERIES"] = "false"
+
+import resilience
+import resources
+from metrics import FALLBACKS
+
+REASONS = ("deadline", "llm_circuit_open", "generation_timeout", "generation_error")
+
+
+class Brownout:
+    """Wraps the stub's async chat call with injected errors and hangs"""
+
+    def __init__(self, args, clock_start: float):
+        self.args = args
+        self.start = clock_start
+        self.rng = random.Random(0)
+        self.calls = 0
+        self.inner = openai.ChatCompletion.acreate
+
+    def install(self):
+        openai.ChatCompletion.acreate = self.acreate
+
+    async def acreate(self, **kwargs):
+        self.calls += 1
+        now = time.perf_counter() - self.start
+        if self.args.brownout[0] <= now < self.args.brownout[1]:
+            if self.rng.random() < self.args.error_rate:
+                await asyncio.sleep(self.args.error_latency)
+                raise openai.error.APIError("injected brownout error")
+            await asyncio.sleep(self.args.hang)
+        return await self.inner(**kwargs)
+
+
+def percentile(values, q: float) -> float:
+    values = sorted(values)
+    return round(values[int(q * (len(values) - 1))] * 1000, 1) if values else 0.0
+
+
+async def run_mode(args, store, mode: str) -> dict:
+    from rag_pipeline import EXTRACTIVE_NOTE, NO_ANSWER, RAGPipeline
+
+    use_deadline = mode in ("deadline", "both")
+    os.environ["LLM_BREAKER_FAILURES"] = str(args.failures if mode in ("breaker", "both") else 0)
+    os.environ["LLM_BREAKER_SLOW_CALL_S"] = str(args.slow_call)
+    os.environ["LLM_BREAKER_RESET_S"] = str(args.reset)
+    os.environ["GENERATION_MIN_S"] = str(args.generation_min)
+    # A fresh breaker per mode (the registry keeps one per process)
+    resources._resources.pop(("breaker", "llm"), None)
+
+    stub = StubOpenAI(dim=args.dim, llm_latency=args.llm_latency).install()
+    pipeline = RAGPipeline(store)
+    pipeline.completion_params = {**pipeline.completion_params, "timeout": args.llm_timeout}
+    fallbacks_before = {reason: FALLBACKS.value(reason=reason) for reason in REASONS}
+
+    start = time.perf_counter()
+    brownout = Brownout(args, start)
+    brownout.install()
+    n = int(args.rate * args.duration)
+    rows = []
+
+    async def one(i: int):
+        arrival = i / args.rate
+        await asyncio.sleep(max(0.0, arrival - (time.perf_counter() - start)))
+        token = resilience.start_deadline(args.deadline) if use_deadline else None
+        began = time.perf_counter()
+        try:
+            result = await pipeline.aquery(f"what is the treatment for condition {i}", top_k=5)
+        finally:
+            if token is not None:
+                resilience.end_deadline(token)
+        rows.append((arrival, time.perf_counter() - began, result["answer"]))
+
+    await asyncio.gather(*(one(i) for i in range(n)))
+    stub.uninstall()
+    pipeline.executor.shutdown()
+
+    in_brownout = [latency for arrival, latency, _ in rows if args.brownout[0] <= arrival < args.brownout[1]]
+    healthy = [latency for arrival, latency, _ in rows if not args.brownout[0] <= arrival < args.brownout[1]]
+    recovered = [arrival for arrival, _, answer in rows
+                 if arrival >= args.brownout[1] and not answer.endswith(EXTRACTIVE_NOTE)]
+    after = [answer for arrival, _, answer in rows if arrival >= args.brownout[1] + args.slow_call + args.reset]
+    extractive = sum(answer.endswith(EXTRACTIVE_NOTE) for _, _, answer in rows)
+    empty = sum(answer == NO_ANSWER for _, _, answer in rows)
+    return {
+        "mode": mode,
+        "requests": len(rows),
+        "brownout_latency_ms_p50": percentile(in_brownout, 0.5),
+        "brownout_latency_ms_p99": percentile(in_brownout, 0.99),
+        "brownout_latency_ms_max": percentile(in_brownout, 1.0),
+        "healthy_latency_ms_p50": percentile(healthy, 0.5),
+        "generated": len(rows) - extractive - empty,
+        "extractive": extractive,
+        "no_answer": empty,
+        "recovered_after_s": round(min(recovered) - args.brownout[1], 2) if recovered else None,
+        "generated_after_slow_call_plus_reset": f"{sum(not a.endswith(EXTRACTIVE_NOTE) for a in after)}/{len(after)}",
+        "llm_calls_started": brownout.calls,
+        "fallbacks": {reason: int(FALLBACKS.value(reason=reason) - fallbacks_before[reason]) for reason in REASONS},
+        "breaker": pipeline.llm_breaker.stats() if pipeline.llm_breaker else None,
+        "elapsed_s": round(time.perf_counter() - start, 2),
+    }
+
+
+async def main(args):
+    store = make_vector_store(args.chunks, args.dim)
+    results = [await run_mode(args, store, mode) for mode in args.modes]
+    print(json.dumps({"settings": vars(args), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=40, help="Requests per second")
+    parser.add_argument("--duration", type=float, default=6)
+    parser.add_argument("--brownout", type=float, nargs=2, default=[1.0, 4.0], metavar=("START", "END"))
+    parser.add_argument("--error-rate", type=float, default=0.5)
+    parser.add_argument("--error-latency", type=float, default=0.3)
+    parser.add_argument("--hang", type=float, default=10.0)
+    parser.add_argument("--llm-latency", type=float, default=0.1)
+    parser.add_argument("--llm-timeout", type=float, default=5.0, help="Stands in for the 50 s completion timeout")
+    parser.add_argument("--deadline", type=float, default=1.5)
+    parser.add_argument("--generation-min", type=float, default=0.2)
+    parser.add_argument("--failures", type=int, default=5)
+    parser.add_argument("--slow-call", type=float, default=1.0)
+    parser.add_argument("--reset", type=float, default=0.5)
+    parser.add_argument("--modes", nargs="+", default=["baseline", "deadline", "breaker", "both"])
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--dim", type=int, default=384)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,180 @@
+"""
+Semantic answer cache: LLM calls saved on paraphrased questions, and how
+often a hit serves the answer of a different question.
+
+Synthetic intents (stubbed OpenAI providers): each of --topics topics has a
+direction with --chunks-per-topic chunks clustered around it, among --chunks
+background chunks. A topic has two intents, the base one and a sibling at
+cosine 0.8 (say, dosage vs side effects of one drug) that retrieves from the
+same chunks but needs a different answer. Every intent is asked in
+--wordings paraphrases whose embeddings sit at cosine 0.90-0.98 from it.
+
+thresholds  Cache disabled, then each --thresholds value: all wordings asked
+            once, shuffled, through RAGPipeline.aquery with the exact-match
+            answer cache off. Reports LLM calls, semantic hits, wrong answers
+            (hits that served the sibling intent's answer), mean latency and
+            the ceiling: questions whose exact context set an earlier
+            paraphrase of the same intent had already retrieved.
+lookup      Cost of one lookup in a full cache of --capacity entries at
+            --lookup-dim dims, for same-context groups of 1 and 32 entries.
+swap        Entries left after swap_vector_store.
+
+Usage:
+    python benchmarks/bench_semantic_cache.py --topics 50 --wordings 6 --thresholds 0.7 0.8 0.85 0.9 0.95
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+
+from benchmarks.stubs import StubOpenAI, stub_embedding
+
+os.environ["ANSWER_CACHE_BACKEND"] = "none"
+os.environ["EMBEDDING_CACHE_MB"] = "0"
+os.environ["RERANK_ENABLED"] = "false"
+os.environ["RETRIEVAL_MODE"] = "dense"
+
+from semantic_cache import SemanticAnswerCache
+
+SIBLING_COSINE = 0.8
+CHUNK_COSINE = 0.9
+QUESTION = re.compile(r"topic (\d+) intent (\d+)")
+
+
+def _around(rng, direction: np.ndarray, cosine: float) -> np.ndarray:
+    """Unit vector at the given cosine from direction"""
+    noise = rng.standard_normal(direction.shape[0]).astype("float32")
+    noise -= noise @ direction * direction
+    noise /= np.linalg.norm(noise)
+    vector = cosine * direction + np.sqrt(1 - cosine ** 2) * noise
+    return (vector / np.linalg.norm(vector)).astype("float32")
+
+
+def build_corpus(args):
+    """(store, {wording: embedding}, [(wording, topic, intent)])"""
+    from ingest import VectorStore
+
+    rng = np.random.default_rng(0)
+    texts = [f"Background chunk {i}." for i in range(args.chunks)]
+    embeddings = [stub_embedding(text, args.dim) for text in texts]
+    wordings, questions = {}, []
+    for topic in range(args.topics):
+        base = rng.standard_normal(args.dim).astype("float32")
+        base /= np.linalg.norm(base)
+        for c in range(args.chunks_per_topic):
+            texts.append(f"Chunk {c} on topic {topic}.")
+            embeddings.append(_around(rng, base, CHUNK_COSINE))
+        for intent, direction in enumerate((base, _around(rng, base, SIBLING_COSINE))):
+            for w in range(args.wordings):
+                text = f"topic {topic} intent {intent} wording {w}"
+                wordings[text] = _around(rng, direction, rng.uniform(0.90, 0.98))
+                questions.append((text, topic, intent))
+
+    metadata = [{"source": "synthetic.pdf", "chunk_id": i, "text": text} for i, text in enumerate(texts)]
+    store = VectorStore(embedding_dim=args.dim)
+    store.build_index(np.stack(embeddings), metadata)
+    return store, wordings, questions
+
+
+async def run_threshold(args, store, questions, threshold) -> dict:
+    from rag_pipeline import RAGPipeline
+
+    os.environ["SEMANTIC_CACHE_MAX_ENTRIES"] = str(args.capacity if threshold is not None else 0)
+    os.environ["SEMANTIC_CACHE_THRESHOLD"] = str(threshold or 0)
+    pipeline = RAGPipeline(store)
+    order = list(questions)
+    random.Random(1).shuffle(order)
+
+    latencies, wrong, reusable, seen = [], 0, 0, set()
+    for text, topic, intent in order:
+        start = time.perf_counter()
+        result = await pipeline.aquery(text, top_k=args.top_k)
+        latencies.append(time.perf_counter() - start)
+        answered = QUESTION.search(result["answer"])
+        wrong += answered is not None and (int(answered[1]), int(answered[2])) != (topic, intent)
+        seen_key = (topic, intent, SemanticAnswerCache.context_key(result["contexts"]))
+        reusable += seen_key in seen
+        seen.add(seen_key)
+
+    stats = pipeline.semantic_cache.stats() if pipeline.semantic_cache else {"hits": 0, "hit_rate": 0.0}
+    pipeline.executor.shutdown()
+    return {
+        "threshold": threshold,
+        "questions": len(order),
+        "llm_calls": len(order) - stats["hits"],
+        "semantic_hit_rate": stats["hit_rate"],
+        "hit_rate_ceiling": round(reusable / len(order), 4),
+        "wrong_answers": wrong,
+        "latency_ms_mean": round(statistics.mean(latencies) * 1000, 1),
+    }
+
+
+def bench_lookup(args) -> dict:
+    rng = np.random.default_rng(1)
+    results = {}
+    for group in (1, 32):
+        cache = SemanticAnswerCache(args.capacity, threshold=0.99)
+        cache.reset("bench")
+        for i in range(args.capacity):
+            contexts = [f"context set {i // group}"]
+            cache.store(rng.standard_normal(args.lookup_dim), contexts, f"answer {i}", "bench")
+        queries = rng.standard_normal((1000, args.lookup_dim)).astype("float32")
+        start = time.perf_counter()
+        for query in queries:
+            cache.lookup(query, ["context set 0"], "bench")
+        results[f"group_{group}_us"] = round((time.perf_counter() - start) / len(queries) * 1e6, 1)
+    results["memory_mb"] = cache.stats()["memory_mb"]
+    return results
+
+
+async def bench_swap(args, store, questions) -> dict:
+    from rag_pipeline import RAGPipeline
+
+    os.environ["SEMANTIC_CACHE_MAX_ENTRIES"] = str(args.capacity)
+    os.environ["SEMANTIC_CACHE_THRESHOLD"] = "0.9"
+    pipeline = RAGPipeline(store)
+    for text, _, _ in questions[:20]:
+        await pipeline.aquery(text, top_k=args.top_k)
+    before = pipeline.semantic_cache.stats()["entries"]
+    store.version = f"{store.version}-next"
+    pipeline.swap_vector_store(store)
+    after = pipeline.semantic_cache.stats()
+    pipeline.executor.shutdown()
+    return {"entries_before": before, "entries_after": after["entries"], "invalidations": after["invalidations"]}
+
+
+async def main(args):
+    store, wordings, questions = build_corpus(args)
+    stub = StubOpenAI(dim=args.dim, llm_latency=args.llm_latency,
+                      embedding_fn=lambda text: wordings.get(text, stub_embedding(text, args.dim))).install()
+    runs = [await run_threshold(args, store, questions, None)]
+    for threshold in args.thresholds:
+        runs.append(await run_threshold(args, store, questions, threshold))
+    swap = await bench_swap(args, store, questions)
+    stub.uninstall()
+    print(json.dumps({"thresholds": runs, "lookup": bench_lookup(args), "swap": swap}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--topics", type=int, default=50)
+    parser.add_argument("--wordings", type=int, default=6, help="Paraphrases per intent")
+    parser.add_argument("--chunks", type=int, default=20000, help="Background chunks")
+    parser.add_argument("--chunks-per-topic", type=int, default=8)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.7, 0.8, 0.85, 0.9, 0.95])
+    parser.add_argument("--capacity", type=int, default=1024)
+    parser.add_argument("--lookup-dim", type=int, default=3072)
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    asyncio.run(main(parser.parse_args()))
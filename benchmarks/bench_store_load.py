@@ -0,0 +1,162 @@
+"""
+Startup benchmark for VectorStore.load: in-memory vs. memory-mapped.
+
+A synthetic store is saved to a temporary directory, then N worker processes
+load it at the same time (like uvicorn --workers N) in each mode. Every worker
+reports its load time, first-search latency and memory:
+
+  rss_mb     resident set size, counting shared file pages in full
+  anon_mb    private (anonymous) memory the worker allocated itself
+  pss_mb     proportional set size: shared pages split between the workers
+             that map them, so summing pss_mb over workers gives real usage
+
+--drop-caches empties the OS page cache before each mode (needs root) so the
+first worker measures a true cold start.
+
+Usage:
+    python benchmarks/bench_store_load.py --chunks 200000 --dim 384 --workers 4
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+
+
+def _memory_mb() -> dict:
+    """RSS / anonymous / proportional memory of this process from /proc"""
+    fields = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in ("VmRSS", "RssAnon"):
+                fields[key] = int(value.split()[0])
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    fields["Pss"] = int(line.split()[1])
+    except OSError:
+        pass
+    return {
+        "rss_mb": round(fields.get("VmRSS", 0) / 1024, 1),
+        "anon_mb": round(fields.get("RssAnon", 0) / 1024, 1),
+        "pss_mb": round(fields["Pss"] / 1024, 1) if "Pss" in fields else None,
+    }
+
+
+def _worker(store_dir: str, mmap: bool, n_queries: int, barrier, queue):
+    os.environ["EMBEDDING_CACHE_MB"] = "0"
+    from ingest import VectorStore
+
+    baseline = _memory_mb()
+    store = VectorStore()
+    start = time.perf_counter()
+    store.load(os.path.join(store_dir, "faiss.index"), os.path.join(store_dir, "metadata.bin"), mmap=mmap)
+    load_s = time.perf_counter() - start
+
+    queries = np.random.default_rng(os.getpid()).standard_normal((n_queries, store.embedding_dim)).astype("float32")
+    start = time.perf_counter()
+    store.search_by_embedding(queries[:1], k=5)
+    first_search_ms = (time.perf_counter() - start) * 1000
+    for query in queries[1:]:
+        store.search_by_embedding(query[None, :], k=5)
+
+    # Measure while every worker is alive, so shared pages are split between them
+    barrier.wait()
+    memory = _memory_mb()
+    memory["rss_delta_mb"] = round(memory["rss_mb"] - baseline["rss_mb"], 1)
+    queue.put({"load_s": round(load_s, 3), "first_search_ms": round(first_search_ms, 1), **memory})
+    barrier.wait()
+
+
+def _drop_caches() -> bool:
+    try:
+        os.sync()
+        with open("/proc/sys/vm/drop_caches", "w") as f:
+            f.write("3\n")
+        return True
+    except OSError:
+        return False
+
+
+def build_store(store_dir: str, n_chunks: int, dim: int, text_len: int):
+    from ingest import VectorStore
+
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((n_chunks, dim)).astype("float32")
+    filler = "Clinical presentation, diagnosis and management. " * (text_len // 50 + 1)
+    metadata = [
+        {"source": f"book_{i % 20}.pdf", "chunk_id": i, "text": f"Chunk {i}: {filler[:text_len]}"}
+        for i in range(n_chunks)
+    ]
+    store = VectorStore(embedding_dim=dim)
+    store.build_index(embeddings, metadata, index_type="flat")
+    store.save(os.path.join(store_dir, "faiss.index"), os.path.join(store_dir, "metadata.bin"))
+
+
+def run_mode(store_dir: str, mmap: bool, workers: int, n_queries: int, drop_caches: bool) -> dict:
+    dropped = _drop_caches() if drop_caches else False
+    ctx = multiprocessing.get_context("spawn")
+    barrier = ctx.Barrier(workers)
+    queue = ctx.Queue()
+    procs = [ctx.Process(target=_worker, args=(store_dir, mmap, n_queries, barrier, queue)) for _ in range(workers)]
+    for proc in procs:
+        proc.start()
+    reports = [queue.get() for _ in procs]
+    for proc in procs:
+        proc.join()
+
+    def total(key):
+        values = [report[key] for report in reports if report[key] is not None]
+        return round(sum(values), 1) if values else None
+
+    return {
+        "page_cache_dropped": dropped,
+        "load_s_max": max(report["load_s"] for report in reports),
+        "first_search_ms_max": max(report["first_search_ms"] for report in reports),
+        "rss_mb_per_worker": max(report["rss_mb"] for report in reports),
+        "rss_delta_mb_per_worker": max(report["rss_delta_mb"] for report in reports),
+        "anon_mb_per_worker": max(report["anon_mb"] for report in reports),
+        "pss_mb_total": total("pss_mb"),
+        "workers": reports,
+    }
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as store_dir:
+        start = time.perf_counter()
+        build_store(store_dir, args.chunks, args.dim, args.text_len)
+        sizes = {name: round(os.path.getsize(os.path.join(store_dir, name)) / 2 ** 20, 1)
+                 for name in ("faiss.index", "metadata.bin")}
+        results = {
+            "chunks": args.chunks,
+            "dim": args.dim,
+            "build_s": round(time.perf_counter() - start, 2),
+            "file_mb": sizes,
+            "in_memory": run_mode(store_dir, False, args.workers, args.queries, args.drop_caches),
+            "mmap": run_mode(store_dir, True, args.workers, args.queries, args.drop_caches),
+        }
+    if not args.verbose:
+        for mode in ("in_memory", "mmap"):
+            results[mode].pop("workers")
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--text-len", type=int, default=1000, help="Characters per chunk text")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=20, help="Searches per worker after loading")
+    parser.add_argument("--drop-caches", action="store_true", help="Drop the OS page cache first (root)")
+    parser.add_argument("--verbose", action="store_true", help="Include per-worker reports")
+    main(parser.parse_args())
@@ -0,0 +1,117 @@
+"""
+Perceived-latency benchmark: /query vs. /query/stream (server-sent events).
+
+The app is served over real HTTP with a fake streaming LLM (benchmarks.stubs):
+the first token arrives after --first-token-latency, the full completion after
+--llm-latency. For each question the report gives time to first byte on
+/query and, on /query/stream, the time to the contexts event, to the first
+answer token and to the done event. It also checks that the streamed tokens
+add up to the final answer and that both endpoints return the same answer.
+
+Usage:
+    python benchmarks/bench_stream_query.py --questions 20 --llm-latency 3 --first-token-latency 0.4
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import httpx
+
+from benchmarks.stubs import StubOpenAI, make_vector_store, serve_app
+
+# Both endpoints must do the full work
+os.environ["ANSWER_CACHE_BACKEND"] = "none"
+os.environ["EMBEDDING_CACHE_MB"] = "0"
+
+
+async def timed_query(client: httpx.AsyncClient, question: str) -> dict:
+    start = time.perf_counter()
+    async with client.stream("POST", "/query", json={"query": question, "top_k": 5}) as response:
+        response.raise_for_status()
+        body = b""
+        first_byte = None
+        async for chunk in response.aiter_bytes():
+            first_byte = first_byte or time.perf_counter() - start
+            body += chunk
+    return {"first_byte_s": first_byte, "answer": json.loads(body)["answer"]}
+
+
+async def timed_stream(client: httpx.AsyncClient, question: str) -> dict:
+    start = time.perf_counter()
+    marks, tokens, answer, event = {}, [], None, None
+    async with client.stream("POST", "/query/stream", json={"query": question, "top_k": 5}) as response:
+        response.raise_for_status()
+        assert response.headers["content-type"].startswith("text/event-stream")
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                marks.setdefault(event, time.perf_counter() - start)
+                data = json.loads(line[len("data: "):])
+                if event == "token":
+                    tokens.append(data["text"])
+                elif event == "done":
+                    answer = data["answer"]
+    assert "".join(tokens).strip() == answer, "streamed tokens must add up to the final answer"
+    return {
+        "contexts_s": marks["contexts"],
+        "first_token_s": marks["token"],
+        "done_s": marks["done"],
+        "answer": answer,
+    }
+
+
+def _summary(values) -> dict:
+    values = sorted(values)
+    return {"p50_ms": round(statistics.median(values) * 1000, 1), "max_ms": round(values[-1] * 1000, 1)}
+
+
+async def main(args):
+    import app as app_module
+    import resources
+    from rag_pipeline import RAGPipeline
+
+    stub = StubOpenAI(dim=args.dim, llm_latency=args.llm_latency,
+                      first_token_latency=args.first_token_latency, answer_tokens=args.tokens).install()
+    plain, streamed = [], []
+    try:
+        app_module.rag_pipeline = RAGPipeline(make_vector_store(args.chunks, args.dim))
+        async with serve_app(app_module.app) as base_url, \
+                httpx.AsyncClient(base_url=base_url, timeout=None) as client:
+            for i in range(args.questions):
+                question = f"What are the complications of condition {i}?"
+                plain.append(await timed_query(client, question))
+                streamed.append(await timed_stream(client, question))
+    finally:
+        stub.uninstall()
+        await resources.close_aiohttp_session()
+
+    assert all(p["answer"] == s["answer"] for p, s in zip(plain, streamed)), "endpoints must agree"
+    print(json.dumps({
+        "questions": args.questions,
+        "llm_latency_s": args.llm_latency,
+        "first_token_latency_s": args.first_token_latency,
+        "query_first_byte": _summary([p["first_byte_s"] for p in plain]),
+        "stream_contexts": _summary([s["contexts_s"] for s in streamed]),
+        "stream_first_token": _summary([s["first_token_s"] for s in streamed]),
+        "stream_done": _summary([s["done_s"] for s in streamed]),
+        "answers_match": True,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--llm-latency", type=float, default=3.0, help="Full completion time, seconds")
+    parser.add_argument("--first-token-latency", type=float, default=0.4, help="Time to first token, seconds")
+    parser.add_argument("--tokens", type=int, default=120, help="Tokens per stub answer")
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--dim", type=int, default=384)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,134 @@
+"""
+Peak memory of a full rebuild (build_vector_store) as the corpus grows,
+streamed through bounded stages vs everything held in memory.
+
+For each --sizes entry (chunks) a synthetic PDF corpus is written, then
+every mode builds it in a fresh process with stubbed OpenAI embeddings:
+
+streaming  INGEST_STREAMING=true (pages -> chunks -> embedding batches ->
+           index, bounded queues)
+in_memory  INGEST_STREAMING=false (all chunks, rows and embeddings at once)
+
+Reports peak RSS (the build's own timing report), the size of the published
+FAISS / BM25 / refine-vector files, peak RSS minus those (what the pipeline
+holds on top of the indexes), wall time, and the queue statistics of the
+streamed build.
+
+Usage:
+    python benchmarks/bench_streaming_ingest.py --sizes 5k 20k 40k --index-type flat
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+MODES = {"streaming": "true", "in_memory": "false"}
+
+
+def parse_count(text: str) -> int:
+    scale = {"k": 1000, "m": 1000000}.get(text[-1], 1)
+    return int(float(text.rstrip("km")) * scale)
+
+
+def write_corpus(pdf_dir: str, n_chunks: int, files: int):
+    """PDFs holding about n_chunks chunks at the default chunk size / overlap"""
+    from benchmarks.stubs import synthetic_texts, write_text_pdf
+
+    os.makedirs(pdf_dir)
+    step = int(os.getenv("CHUNK_SIZE", 1000)) - int(os.getenv("CHUNK_OVERLAP", 200))
+    lines = synthetic_texts(n_chunks * step // 100 + 1, text_len=100, seed=1)
+    per_file = -(-len(lines) // files)
+    for i in range(0, len(lines), per_file):
+        book = lines[i:i + per_file]
+        write_text_pdf(os.path.join(pdf_dir, f"book_{i // per_file:03d}.pdf"),
+                       [book[j:j + 60] for j in range(0, len(book), 60)])
+
+
+def child(args):
+    """One build in this (fresh) process; prints its report as JSON"""
+    from benchmarks.stubs import StubOpenAI
+
+    os.chdir(args.workdir)
+    StubOpenAI(dim=args.dim, embed_latency=args.embed_latency).install()
+    from ingest import build_vector_store, current_store_dir
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(sys.stderr if args.verbose else open(os.devnull, "w")):
+        store = build_vector_store(os.path.join(args.workdir, "pdfs"), workers=1, full_rebuild=True)
+    wall_s = time.perf_counter() - start
+
+    with open(os.path.join("vectorstore", "ingest_timing.json")) as f:
+        timing = json.load(f)
+    store_dir = current_store_dir()
+    index_mb = sum(os.path.getsize(os.path.join(store_dir, name)) for name in os.listdir(store_dir)
+                   if name in ("faiss.index", "sparse.bin", "vectors.npy")) / 2 ** 20
+    print(json.dumps({
+        "chunks": len(store.metadata),
+        "peak_rss_mb": timing["peak_rss_mb"],
+        "index_mb": round(index_mb, 1),
+        "rss_minus_index_mb": round(timing["peak_rss_mb"] - index_mb, 1),
+        "wall_s": round(wall_s, 2),
+        "queues": timing.get("queues"),
+    }))
+
+
+def run_build(args, workdir: str, streaming: str) -> dict:
+    env = {
+        **os.environ,
+        "INGEST_STREAMING": streaming,
+        "OPENAI_API_KEY": "sk-stub",
+        "USE_LOCAL_MODEL": "false",
+        # Every chunk is embedded (no cross-build store) and nothing is cached
+        "EMBEDDING_STORE_PATH": "",
+        "FAISS_INDEX_TYPE": args.index_type,
+        "FAISS_STORAGE": args.storage,
+        "FAISS_REFINE_FACTOR": str(args.refine),
+    }
+    command = [sys.executable, os.path.abspath(__file__), "--child", "--workdir", workdir,
+               "--dim", str(args.dim), "--embed-latency", str(args.embed_latency)]
+    if args.verbose:
+        command.append("--verbose")
+    out = subprocess.run(command, env=env, cwd=ROOT, check=True, stdout=subprocess.PIPE, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main(args):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in map(parse_count, args.sizes):
+            corpus = os.path.join(tmp, f"corpus_{n}")
+            write_corpus(os.path.join(corpus, "pdfs"), n, args.pdf_files)
+            row = {"target_chunks": n}
+            for mode in args.modes:
+                workdir = os.path.join(corpus, mode)
+                os.makedirs(workdir)
+                os.symlink(os.path.join(corpus, "pdfs"), os.path.join(workdir, "pdfs"))
+                row[mode] = run_build(args, workdir, MODES[mode])
+            results.append(row)
+            print(json.dumps(row), file=sys.stderr)
+    print(json.dumps({"settings": vars(args), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", default=["5k", "20k", "40k"], help="Corpus sizes in chunks")
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    parser.add_argument("--pdf-files", type=int, default=8)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--embed-latency", type=float, default=0.0)
+    parser.add_argument("--index-type", default="flat")
+    parser.add_argument("--storage", default="float32")
+    parser.add_argument("--refine", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true", help="Show the build logs")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    child(args) if args.child else main(args)
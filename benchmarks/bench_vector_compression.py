@@ -0,0 +1,135 @@
+"""
+Memory / latency / recall of compressed vector storage.
+
+Each setting DIMS:STORAGE:REFINE (EMBEDDING_DIMENSIONS, FAISS_STORAGE,
+FAISS_REFINE_FACTOR) is built over the same corpus, published to a
+temporary directory and loaded memory-mapped, the way the server loads it.
+Queries run one at a time through VectorStore.search_by_embedding (query
+truncation and refinement included) and are compared against exact
+full-dimension float32 results.
+
+The synthetic corpus is clustered, with per-dimension variance decaying
+along the vector so that leading dimensions carry most of the signal, as
+in Matryoshka-trained text-embedding-3 vectors. How well truncation holds
+up on real embeddings is best checked with --from-store.
+
+Usage:
+    python benchmarks/bench_vector_compression.py --n 50000 --dim 3072 --k 10
+    python benchmarks/bench_vector_compression.py --settings 0:float32:0 768:sq8:0 768:sq8:4
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import faiss
+import numpy as np
+
+from benchmarks.bench_ann_index import recall_at_k, store_corpus
+from ingest import FULL_VECTORS_FILE, INDEX_FILE, METADATA_FILE, VectorStore
+
+DEFAULT_SETTINGS = [
+    "0:float32:0", "0:fp16:0", "0:sq8:0",
+    "1536:float32:0", "1024:fp16:0", "768:sq8:0", "768:sq8:4", "256:sq8:0", "256:sq8:10",
+]
+
+
+def matryoshka_corpus(n: int, dim: int, n_queries: int, seed: int = 0):
+    """Clustered unit vectors whose variance decays along the dimensions"""
+    rng = np.random.default_rng(seed)
+    scale = (1 / np.sqrt(1 + np.arange(dim) / 64)).astype("float32")
+    centers = rng.standard_normal((max(1, n // 200), dim)).astype("float32")
+    data = np.empty((n + n_queries, dim), dtype="float32")
+    # In blocks: the float64 temporaries of one pass would double peak memory
+    for start in range(0, len(data), 10000):
+        rows = min(10000, len(data) - start)
+        labels = rng.integers(0, len(centers), size=rows)
+        block = centers[labels] + 0.5 * rng.standard_normal((rows, dim), dtype="float32")
+        block *= scale
+        data[start:start + rows] = block / np.linalg.norm(block, axis=1, keepdims=True)
+    return data[:n], data[n:]
+
+
+def run_setting(setting: str, corpus, queries, truth, metadata, args, workdir) -> dict:
+    dims, storage, refine = setting.split(":")
+    store = VectorStore(embedding_dim=corpus.shape[1])
+    store.dimensions, store.storage, store.refine_factor = int(dims), storage, int(refine)
+    start = time.perf_counter()
+    store.build_index(corpus, metadata, index_type=args.index_type)
+    build_s = time.perf_counter() - start
+    store_dir = store.publish(root=os.path.join(workdir, setting.replace(":", "_")), keep=1)
+    del store
+
+    served = VectorStore()
+    served.refine_factor = int(refine)
+    served.load(os.path.join(store_dir, INDEX_FILE), os.path.join(store_dir, METADATA_FILE), mmap=True)
+    found = np.empty_like(truth)
+    latencies = []
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        hits = served.search_by_embedding(query[None, :], args.k)
+        latencies.append(time.perf_counter() - start)
+        found[i] = [hit["chunk_id"] for hit in hits] + [-1] * (args.k - len(hits))
+
+    vectors_path = os.path.join(store_dir, FULL_VECTORS_FILE)
+    return {
+        "dims": served.index.d,
+        "storage": storage,
+        "refine_factor": int(refine),
+        "bytes_per_vector": round(os.path.getsize(os.path.join(store_dir, INDEX_FILE)) / len(corpus), 1),
+        "index_mb": round(os.path.getsize(os.path.join(store_dir, INDEX_FILE)) / 2 ** 20, 1),
+        "full_vectors_on_disk_mb": round(os.path.getsize(vectors_path) / 2 ** 20, 1)
+        if os.path.exists(vectors_path) else 0,
+        "recall_at_k": round(recall_at_k(found, truth), 4),
+        "latency_ms_p50": round(statistics.median(latencies) * 1000, 3),
+        "build_s": round(build_s, 2),
+    }
+
+
+def main(args):
+    if args.from_store:
+        corpus, queries = store_corpus(args.queries)
+    else:
+        corpus, queries = matryoshka_corpus(args.n, args.dim, args.queries)
+    metadata = [{"source": "bench", "chunk_id": i, "text": ""} for i in range(len(corpus))]
+
+    exact = faiss.IndexFlatL2(corpus.shape[1])
+    exact.add(corpus)
+    _, truth = exact.search(queries, args.k)
+    del exact
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for setting in args.settings:
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                result = run_setting(setting, corpus, queries, truth, metadata, args, workdir)
+            print(json.dumps(result), file=sys.stderr)
+            results.append(result)
+
+    report = {"n": len(corpus), "dim": corpus.shape[1], "queries": len(queries), "k": args.k,
+              "index_type": args.index_type, "results": results}
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=50000, help="Synthetic corpus size")
+    parser.add_argument("--dim", type=int, default=3072)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--index-type", default="flat", choices=VectorStore.INDEX_TYPES)
+    parser.add_argument("--settings", nargs="+", default=DEFAULT_SETTINGS,
+                        help="DIMS:STORAGE:REFINE_FACTOR (dims 0 = untruncated)")
+    parser.add_argument("--from-store", action="store_true", help="Benchmark the vectors in ./vectorstore/")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    main(parser.parse_args())
@@ -0,0 +1,154 @@
+"""
+Start-up and connection-reuse benchmark for the shared resource registry.
+
+connections  Async chat completions against a local stub /v1/chat/completions
+             server, once with openai 0.28's default (a new aiohttp session,
+             so a new connection, per call) and once through the shared
+             keep-alive session app.py installs. The server charges
+             --handshake-latency for the first request on every new connection,
+             standing in for the TCP + TLS round trips to the real API.
+readiness    The real app (startup event included) is served over HTTP and
+             /health is polled from the moment the server accepts connections:
+             time until it turns 200, then the first /query latency against
+             the steady-state median (stubbed OpenAI providers).
+
+Usage:
+    python benchmarks/bench_warm_start.py --calls 100 --concurrency 8 --handshake-latency 0.1
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import httpx
+import openai
+from aiohttp import web
+
+from benchmarks.stubs import StubOpenAI, serve_app
+import resources
+
+os.environ["ANSWER_CACHE_BACKEND"] = "none"
+os.environ["EMBEDDING_CACHE_MB"] = "0"
+
+
+class StubChatServer:
+    """Local /v1/chat/completions endpoint that counts connections"""
+
+    def __init__(self, latency: float, handshake_latency: float):
+        self.latency = latency
+        self.handshake_latency = handshake_latency
+        self.connections = set()
+
+    async def chat(self, request: web.Request) -> web.Response:
+        connection = id(request.transport)
+        if connection not in self.connections:
+            self.connections.add(connection)
+            await asyncio.sleep(self.handshake_latency)
+        await asyncio.sleep(self.latency)
+        return web.json_response({
+            "id": "stub", "object": "chat.completion", "model": "gpt-4",
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": "Stub answer."}}],
+        })
+
+
+async def run_calls(server: StubChatServer, calls: int, concurrency: int) -> dict:
+    server.connections.clear()
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await openai.ChatCompletion.acreate(model="gpt-4", messages=[{"role": "user", "content": "hi"}])
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(calls)))
+    return {
+        "wall_time_s": round(time.perf_counter() - start, 3),
+        "latency_ms_p50": round(statistics.median(latencies) * 1000, 1),
+        "new_connections": len(server.connections),
+    }
+
+
+async def bench_connections(args) -> dict:
+    server = StubChatServer(args.llm_latency, args.handshake_latency)
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", server.chat)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    openai.api_base, openai.api_key = f"http://127.0.0.1:{port}/v1", "sk-benchmark-stub"
+    try:
+        results = {"per_call_session": await run_calls(server, args.calls, args.concurrency)}
+        session = await resources.open_aiohttp_session()
+        with resources.use_aiohttp_session(session):
+            results["shared_session"] = await run_calls(server, args.calls, args.concurrency)
+        await resources.close_aiohttp_session()
+    finally:
+        await runner.cleanup()
+        openai.api_base = "https://api.openai.com/v1"
+    return results
+
+
+async def bench_readiness(args) -> dict:
+    import app as app_module
+
+    stub = StubOpenAI(llm_latency=args.llm_latency).install()
+    statuses = []
+    start = time.perf_counter()
+    async with serve_app(app_module.app, lifespan="on") as base_url, \
+            httpx.AsyncClient(base_url=base_url, timeout=None) as client:
+        accepting_s = time.perf_counter() - start
+        while True:
+            response = await client.get("/health")
+            statuses.append(response.status_code)
+            if response.status_code == 200:
+                break
+            await asyncio.sleep(0.005)
+        ready_s = time.perf_counter() - start
+
+        latencies = []
+        for i in range(args.queries):
+            query_start = time.perf_counter()
+            response = await client.post("/query", json={"query": f"What is diabetes? ({i})", "top_k": 5})
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - query_start)
+        root = (await client.get("/")).json()
+    stub.uninstall()
+
+    return {
+        "accepting_connections_s": round(accepting_s, 3),
+        "health_ok_s": round(ready_s, 3),
+        "health_503_polls": statuses.count(503),
+        "warm_up_s": root.get("warm_up_s"),
+        "first_query_ms": round(latencies[0] * 1000, 1),
+        "steady_query_ms_p50": round(statistics.median(latencies[1:]) * 1000, 1),
+    }
+
+
+async def main(args):
+    print(json.dumps({
+        "connections": await bench_connections(args),
+        "readiness": await bench_readiness(args),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Stub completion latency, s")
+    parser.add_argument("--handshake-latency", type=float, default=0.1, help="Cost of a new connection, s")
+    parser.add_argument("--queries", type=int, default=20, help="/query calls after readiness")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,349 @@
+"""
+Offline benchmark suite: ingestion, index load, search and end-to-end /query
+latency on synthetic corpora. Embeddings and completions come from the stub
+providers in benchmarks.stubs, so no network or API key is needed and every
+run sees the same vectors.
+
+For each corpus size (--sizes, e.g. 1k 100k 1m), in a fresh process:
+
+  ingest   process_documents over synthetic PDFs (extraction + chunking; at
+           most --max-pdf-chunks chunks), create_embeddings through the
+           batching EmbeddingClient against the stub provider, build_index
+           (FAISS + BM25)
+  load     save, then VectorStore.load in memory and memory-mapped
+  search   VectorStore.search (one query) and search_batch (--batch-size
+           queries) latency on the memory-mapped store
+  query    /query over real HTTP (startup events included) with
+           --concurrency requests in flight: p50 / p95 / p99 and QPS
+
+Results are written to --output as JSON, together with the machine, library
+versions and git commit. --baseline compares against an earlier result file
+and exits with status 1 when a latency grew, or a throughput shrank, by
+more than --tolerance.
+
+Usage:
+    python benchmarks/run_suite.py --sizes 1k 100k
+    python benchmarks/run_suite.py --sizes 1k 100k 1m --output results.json --baseline baseline.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# Every stage must do its full work
+SUITE_ENV = {
+    "ANSWER_CACHE_BACKEND": "none",
+    "EMBEDDING_CACHE_MB": "0",
+    "EMBEDDING_STORE_PATH": "",
+    "RERANK_ENABLED": "false",
+    "INDEX_WATCH_INTERVAL": "0",
+}
+
+
+def parse_size(text: str) -> int:
+    """'1k' -> 1000, '1m' -> 1000000"""
+    text = text.strip().lower()
+    scale = {"k": 1000, "m": 1000000}.get(text[-1], 1)
+    return int(float(text.rstrip("km")) * scale)
+
+
+def percentiles(values, scale: float = 1000) -> dict:
+    """p50 / p95 / p99 in ms (values in seconds)"""
+    values = sorted(values)
+
+    def pick(q):
+        return round(values[min(len(values) - 1, int(q * len(values)))] * scale, 2)
+
+    return {"ms_p50": round(statistics.median(values) * scale, 2), "ms_p95": pick(0.95), "ms_p99": pick(0.99)}
+
+
+def _peak_rss_mb() -> float:
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def bench_ingest(args, n_chunks: int, workdir: str):
+    from benchmarks.stubs import StubOpenAI, synthetic_texts, write_text_pdf
+    from ingest import DocumentProcessor, VectorStore
+
+    # Extraction + chunking on PDFs holding about min(n, --max-pdf-chunks) chunks
+    processor = DocumentProcessor()
+    pdf_chunks = min(n_chunks, args.max_pdf_chunks)
+    step = processor.chunk_size - processor.chunk_overlap
+    lines = synthetic_texts(pdf_chunks * step // 100 + 1, text_len=100, seed=1)
+    pdf_dir = os.path.join(workdir, "pdfs")
+    os.makedirs(pdf_dir)
+    per_file = -(-len(lines) // args.pdf_files)
+    for i in range(0, len(lines), per_file):
+        book = lines[i:i + per_file]
+        write_text_pdf(os.path.join(pdf_dir, f"book_{i // per_file:03d}.pdf"),
+                       [book[j:j + 60] for j in range(0, len(book), 60)])
+    pdf_mb = sum(os.path.getsize(os.path.join(pdf_dir, name)) for name in os.listdir(pdf_dir)) / 2 ** 20
+
+    start = time.perf_counter()
+    chunks, _ = processor.process_documents(pdf_dir, workers=args.ingest_workers)
+    process_s = time.perf_counter() - start
+
+    # Embedding + indexing on the full-size corpus
+    texts = synthetic_texts(n_chunks, text_len=args.text_len)
+    stub = StubOpenAI(dim=args.dim, embed_latency=args.embed_latency).install()
+    start = time.perf_counter()
+    embeddings = processor.create_embeddings(texts)
+    embed_s = time.perf_counter() - start
+    stub.uninstall()
+
+    metadata = [{"source": f"book_{i % 50}.pdf", "chunk_id": i, "text": text} for i, text in enumerate(texts)]
+    store = VectorStore(embedding_dim=args.dim)
+    start = time.perf_counter()
+    store.build_index(embeddings, metadata, index_type=args.index_type)
+    build_s = time.perf_counter() - start
+
+    report = {
+        "process_documents": {
+            "pdf_files": len(os.listdir(pdf_dir)),
+            "pdf_mb": round(pdf_mb, 1),
+            "chunks": len(chunks),
+            "s": round(process_s, 3),
+            "chunks_per_s": round(len(chunks) / process_s, 1),
+        },
+        "create_embeddings": {"chunks": n_chunks, "s": round(embed_s, 3),
+                              "chunks_per_s": round(n_chunks / embed_s, 1)},
+        "build_index": {"index_type": args.index_type, "s": round(build_s, 3),
+                        "chunks_per_s": round(n_chunks / build_s, 1)},
+    }
+    return store, report
+
+
+def bench_load(store, workdir: str):
+    from ingest import VectorStore
+
+    store_dir = os.path.join(workdir, "store")
+    index_path, metadata_path = os.path.join(store_dir, "faiss.index"), os.path.join(store_dir, "metadata.bin")
+    start = time.perf_counter()
+    store.save(index_path, metadata_path)
+    save_s = time.perf_counter() - start
+
+    report = {
+        "save_s": round(save_s, 3),
+        "file_mb": round(sum(os.path.getsize(os.path.join(store_dir, name))
+                             for name in os.listdir(store_dir)) / 2 ** 20, 1),
+    }
+    loaded = None
+    for mode, mmap in (("in_memory", False), ("mmap", True)):
+        loaded = VectorStore()
+        start = time.perf_counter()
+        loaded.load(index_path, metadata_path, mmap=mmap)
+        report[f"load_{mode}_s"] = round(time.perf_counter() - start, 3)
+    return loaded, report
+
+
+def bench_search(args, store) -> dict:
+    from benchmarks.stubs import StubOpenAI
+
+    # Zero provider latency: only local work (stub hashing, FAISS, BM25, fusion) is timed
+    stub = StubOpenAI(dim=args.dim, embed_latency=0).install()
+    queries = [f"How is condition {i} treated in patients with {i % 7} risk factors?" for i in range(args.queries)]
+    store.search(queries[0], k=5)
+
+    single = []
+    for query in queries:
+        start = time.perf_counter()
+        store.search(query, k=5)
+        single.append(time.perf_counter() - start)
+
+    batches = []
+    for i in range(0, len(queries), args.batch_size):
+        start = time.perf_counter()
+        store.search_batch(queries[i:i + args.batch_size], k=5)
+        batches.append(time.perf_counter() - start)
+    stub.uninstall()
+
+    batch = percentiles(batches)
+    batch["ms_per_query"] = round(sum(batches) / len(queries) * 1000, 3)
+    return {"single": percentiles(single), f"batch_{args.batch_size}": batch}
+
+
+async def _bench_query(args, store) -> dict:
+    import httpx
+
+    import app as app_module
+    from benchmarks.stubs import StubOpenAI, serve_app
+
+    stub = StubOpenAI(dim=args.dim, llm_latency=args.llm_latency, embed_latency=args.embed_latency).install()
+    app_module.preloaded_vector_store = store
+    latencies, errors = [], 0
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async with serve_app(app_module.app, lifespan="on") as base_url, \
+            httpx.AsyncClient(base_url=base_url, timeout=120,
+                              limits=httpx.Limits(max_connections=args.concurrency)) as client:
+        while (await client.get("/health")).status_code != 200:
+            await asyncio.sleep(0.05)
+
+        async def one(i: int):
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await client.post("/query", json={"query": f"What treats condition {i}?",
+                                                                  "top_k": 5})
+                    ok = response.status_code == 200 and response.json()["contexts"]
+                except httpx.TransportError:
+                    ok = False
+                if ok:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(args.requests)))
+        elapsed = time.perf_counter() - start
+    stub.uninstall()
+
+    return {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "llm_latency_s": args.llm_latency,
+        "errors": errors,
+        "qps": round(len(latencies) / elapsed, 2),
+        **percentiles(latencies),
+    }
+
+
+def run_size(args, n_chunks: int) -> dict:
+    """All stages for one corpus size (runs in its own process)"""
+    import contextlib
+
+    os.environ.update(SUITE_ENV)
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark-stub")
+    log = open(os.devnull, "w") if not args.verbose else sys.stderr
+    with tempfile.TemporaryDirectory() as workdir, contextlib.redirect_stdout(log):
+        store, ingest = bench_ingest(args, n_chunks, workdir)
+        store, load = bench_load(store, workdir)
+        search = bench_search(args, store)
+        query = asyncio.run(_bench_query(args, store))
+    return {"ingest": ingest, "load": load, "search": search, "query": query, "peak_rss_mb": _peak_rss_mb()}
+
+
+def environment() -> dict:
+    import faiss
+    import numpy as np
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "faiss": getattr(faiss, "__version__", None),
+        "numpy": np.__version__,
+    }
+
+
+def _flatten(report: dict, prefix: str = "") -> dict:
+    flat = {}
+    for key, value in report.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def _direction(metric: str) -> int:
+    """+1 when larger is better, -1 when smaller is better, 0 when not compared"""
+    name = metric.rsplit(".", 1)[-1]
+    if name.endswith("per_s") or name == "qps":
+        return 1
+    if name.startswith("ms_") or name.endswith("_s") or name == "s" or name == "ms_per_query":
+        return -1
+    return 0
+
+
+def _seconds(metric: str, value: float) -> float:
+    return value / 1000 if metric.rsplit(".", 1)[-1].startswith("ms_") else value
+
+
+def compare(results: dict, baseline: dict, tolerance: float, floor_s: float = 0.005) -> list:
+    """
+    Metrics present in both reports that got worse by more than tolerance.
+    Durations below floor_s in both runs are timer noise and not compared.
+    """
+    current, previous = _flatten(results["sizes"]), _flatten(baseline.get("sizes", {}))
+    regressions = []
+    for metric, value in sorted(current.items()):
+        direction, old = _direction(metric), previous.get(metric)
+        if not direction or not old:
+            continue
+        if direction < 0 and max(_seconds(metric, value), _seconds(metric, old)) < floor_s:
+            continue
+        change = (value - old) / old
+        if -direction * change > tolerance:
+            regressions.append({"metric": metric, "baseline": old, "current": value,
+                                "change": f"{change:+.1%}"})
+    return regressions
+
+
+def main(args):
+    results = {"environment": environment(), "settings": {key: value for key, value in vars(args).items()
+                                                          if key not in ("output", "baseline")},
+               "sizes": {}}
+    for label in args.sizes:
+        n_chunks = parse_size(label)
+        print(f"▶️  {label}: {n_chunks} chunks", file=sys.stderr)
+        # A fresh process per size: clean peak RSS, no state carried between sizes
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+            results["sizes"][label] = pool.submit(run_size, args, n_chunks).result()
+
+    output = args.output or os.path.join(RESULTS_DIR, f"suite-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            results["regressions"] = compare(results, json.load(f), args.tolerance)
+        exit_code = 1 if results["regressions"] else 0
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"📄 Results written to {output}", file=sys.stderr)
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", default=["1k", "100k"], help="Corpus sizes in chunks (1k, 100k, 1m)")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--text-len", type=int, default=300, help="Characters per chunk")
+    parser.add_argument("--index-type", default="flat", choices=["flat", "ivf_flat", "ivf_pq", "hnsw"])
+    parser.add_argument("--max-pdf-chunks", type=int, default=20000, help="Cap on the PDF ingestion corpus")
+    parser.add_argument("--pdf-files", type=int, default=8)
+    parser.add_argument("--ingest-workers", type=int, default=None, help="Default: INGEST_WORKERS")
+    parser.add_argument("--embed-latency", type=float, default=0.02, help="Stub seconds per embedding call")
+    parser.add_argument("--queries", type=int, default=200, help="Search-stage queries")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=400, help="/query requests")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Stub completion seconds")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/suite-<time>.json)")
+    parser.add_argument("--baseline", help="Earlier result file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression")
+    parser.add_argument("--verbose", action="store_true", help="Show pipeline logs")
+    main(parser.parse_args())
@@ -0,0 +1,281 @@
+"""
+Offline stand-ins for the OpenAI providers used by the benchmarks.
+No network access and no API key are needed; latency is injected with sleeps.
+"""
+
+import asyncio
+import contextlib
+import hashlib
+import os
+import time
+from typing import List, Dict
+
+import numpy as np
+import openai
+from openai.util import convert_to_openai_object
+
+# DocumentProcessor only takes the OpenAI path when a key is present
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark-stub")
+
+
+def stub_embedding(text: str, dim: int) -> np.ndarray:
+    """Deterministic unit vector derived from the text"""
+    seed = int.from_bytes(hashlib.sha1(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dim).astype("float32")
+    return vector / np.linalg.norm(vector)
+
+
+class StubOpenAI:
+    """
+    Patches openai.Embedding and openai.ChatCompletion (sync + async)
+    with deterministic, latency-injected fakes.
+
+    Async chat calls with stream=True behave like a streaming LLM: the first
+    token arrives after first_token_latency and the rest of the answer's
+    answer_tokens are spread evenly over the remaining llm_latency.
+
+    Prompt sizes are tallied in prompt_tokens (~4 characters per token);
+    prefill_latency adds that many seconds per 1,000 prompt tokens to every
+    chat call, before the first token.
+
+    embedding_fn(text) replaces the hash-based stub_embedding, e.g. to
+    place paraphrases close together.
+    """
+
+    def __init__(self, dim: int = 384, llm_latency: float = 0.2, embed_latency: float = 0.01,
+                 first_token_latency: float = 0.05, answer_tokens: int = 8, prefill_latency: float = 0.0,
+                 embedding_fn=None):
+        self.dim = dim
+        self.embedding_fn = embedding_fn or (lambda text: stub_embedding(text, dim))
+        self.llm_latency = llm_latency
+        self.embed_latency = embed_latency
+        self.first_token_latency = min(first_token_latency, llm_latency)
+        self.answer_tokens = answer_tokens
+        self.prefill_latency = prefill_latency
+        self.calls = {"embedding": 0, "chat": 0}
+        self.prompt_tokens = 0
+        self._originals = {}
+
+    def _prefill(self, messages: List[Dict]) -> float:
+        """Count the prompt's tokens; returns the extra latency they cost"""
+        tokens = sum(len(message["content"]) for message in messages) // 4
+        self.prompt_tokens += tokens
+        return self.prefill_latency * tokens / 1000
+
+    def _embedding_response(self, input: List[str]) -> Dict:
+        self.calls["embedding"] += 1
+        return convert_to_openai_object({
+            "data": [
+                {"index": i, "embedding": self.embedding_fn(text).tolist()}
+                for i, text in enumerate(input)
+            ]
+        })
+
+    def _answer(self, messages: List[Dict]) -> str:
+        question = messages[-1]["content"].split("\n", 1)[0]
+        filler = " ".join(f"detail{i}" for i in range(max(0, self.answer_tokens - 4)))
+        return f"Stub answer for {question} {filler}".strip()
+
+    def _chat_response(self, messages: List[Dict]) -> Dict:
+        self.calls["chat"] += 1
+        answer = self._answer(messages)
+        prompt_tokens = sum(len(message["content"]) for message in messages) // 4
+        completion_tokens = len(answer.split())
+        return convert_to_openai_object({
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens}
+        })
+
+    async def _chat_stream(self, messages: List[Dict]):
+        self.calls["chat"] += 1
+        words = self._answer(messages).split(" ")
+        tokens = [words[0]] + [" " + word for word in words[1:]]
+        gap = (self.llm_latency - self.first_token_latency) / max(1, len(tokens) - 1)
+        await asyncio.sleep(self.first_token_latency + self._prefill(messages))
+        for i, token in enumerate(tokens):
+            if i:
+                await asyncio.sleep(gap)
+            yield convert_to_openai_object({
+                "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]
+            })
+        yield convert_to_openai_object({"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+
+    def install(self) -> "StubOpenAI":
+        stub = self
+
+        def embedding_create(model=None, input=None, **kwargs):
+            time.sleep(stub.embed_latency)
+            return stub._embedding_response(input)
+
+        async def embedding_acreate(model=None, input=None, **kwargs):
+            await asyncio.sleep(stub.embed_latency)
+            return stub._embedding_response(input)
+
+        def chat_create(model=None, messages=None, **kwargs):
+            time.sleep(stub.llm_latency + stub._prefill(messages))
+            return stub._chat_response(messages)
+
+        async def chat_acreate(model=None, messages=None, stream=False, **kwargs):
+            if stream:
+                return stub._chat_stream(messages)
+            await asyncio.sleep(stub.llm_latency + stub._prefill(messages))
+            return stub._chat_response(messages)
+
+        self._originals = {
+            (openai.Embedding, "create"): openai.Embedding.create,
+            (openai.Embedding, "acreate"): openai.Embedding.acreate,
+            (openai.ChatCompletion, "create"): openai.ChatCompletion.create,
+            (openai.ChatCompletion, "acreate"): openai.ChatCompletion.acreate,
+        }
+        openai.Embedding.create = embedding_create
+        openai.Embedding.acreate = embedding_acreate
+        openai.ChatCompletion.create = chat_create
+        openai.ChatCompletion.acreate = chat_acreate
+        return self
+
+    def uninstall(self):
+        for (owner, name), original in self._originals.items():
+            setattr(owner, name, original)
+        self._originals = {}
+
+
+class StubCrossEncoder:
+    """
+    Stand-in for sentence_transformers.CrossEncoder: scores a pair by the
+    share of query terms found in the passage (logits in [-9, 3]; only
+    passages with (nearly) every query term score above 0)
+    and burns pair_latency of CPU time per pair, like a small model on CPU.
+    """
+
+    def __init__(self, pair_latency: float = 0.004):
+        self.pair_latency = pair_latency
+        self.pairs = 0
+
+    def predict(self, pairs, batch_size: int = 32, **kwargs) -> np.ndarray:
+        from sparse_index import tokenize
+
+        scores = []
+        for start in range(0, len(pairs), batch_size):
+            batch = pairs[start:start + batch_size]
+            deadline = time.perf_counter() + self.pair_latency * len(batch)
+            for query, passage in batch:
+                terms = set(tokenize(query))
+                overlap = len(terms & set(tokenize(passage))) / max(1, len(terms))
+                scores.append(12 * overlap - 9)
+            while time.perf_counter() < deadline:
+                pass
+        self.pairs += len(pairs)
+        return np.asarray(scores, dtype="float32")
+
+
+_TOPICS = ["diabetes mellitus", "hypertension", "asthma", "sepsis", "heart failure", "pneumonia",
+           "chronic kidney disease", "hypothyroidism", "migraine", "anaemia", "tuberculosis", "gout"]
+_FINDINGS = ["elevated fasting glucose", "raised blood pressure", "wheeze and dyspnoea", "fever and tachycardia",
+             "peripheral oedema", "productive cough", "reduced eGFR", "fatigue and weight gain",
+             "unilateral throbbing headache", "low haemoglobin", "night sweats", "acute joint pain"]
+_TREATMENTS = ["metformin", "ACE inhibitors", "inhaled corticosteroids", "broad-spectrum antibiotics",
+               "loop diuretics", "amoxicillin", "dietary protein restriction", "levothyroxine",
+               "triptans", "iron supplementation", "rifampicin-based regimens", "colchicine"]
+
+
+def synthetic_texts(n: int, text_len: int = 300, seed: int = 0) -> List[str]:
+    """
+    n distinct, deterministic textbook-like passages of about text_len
+    characters, drawn from a small medical vocabulary (so BM25 and the
+    chunker see realistic sentences).
+    """
+    rng = np.random.default_rng(seed)
+    sentences = []
+    for i in range(len(_TOPICS)):
+        for j in range(len(_FINDINGS)):
+            for k in range(len(_TREATMENTS)):
+                sentences.append(f"{_TOPICS[i].capitalize()} may present with {_FINDINGS[j]} "
+                                 f"and is commonly managed with {_TREATMENTS[k]}.")
+    picks = rng.integers(0, len(sentences), size=(n, text_len // 60 + 1))
+    return [f"Passage {i}. " + " ".join(sentences[j] for j in row)[:text_len] for i, row in enumerate(picks)]
+
+
+def write_text_pdf(path: str, pages: List[List[str]]):
+    """
+    Write a minimal PDF (Helvetica, one text line per entry) that the PDF
+    extractors can read, so ingestion benchmarks need no sample books.
+    """
+    objects = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    contents = []
+    for lines in pages:
+        ops = ["BT", "/F1 9 Tf", "11 TL", "40 800 Td"]
+        for line in lines:
+            escaped = line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+            ops.append(f"({escaped}) Tj T*")
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1", "replace")
+        contents.append(add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream"))
+    pages_id = len(objects) + len(pages) + 1
+    kids = [add(b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] /Contents %d 0 R "
+                b"/Resources << /Font << /F1 %d 0 R >> >> >>" % (pages_id, content, font))
+            for content in contents]
+    add(b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % kid for kid in kids), len(kids)))
+    catalog = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def make_vector_store(n_chunks: int = 1000, dim: int = 384):
+    """Build an in-memory VectorStore over a synthetic corpus"""
+    from ingest import VectorStore
+
+    texts = [f"Synthetic medical chunk {i} about condition {i % 97}." for i in range(n_chunks)]
+    embeddings = np.stack([stub_embedding(text, dim) for text in texts])
+    metadata = [
+        {"source": f"synthetic_{i % 10}.pdf", "chunk_id": i, "text": text}
+        for i, text in enumerate(texts)
+    ]
+    store = VectorStore(embedding_dim=dim)
+    store.build_index(embeddings, metadata)
+    return store
+
+
+@contextlib.asynccontextmanager
+async def serve_app(app, host: str = "127.0.0.1", lifespan: str = "off"):
+    """
+    Run an ASGI app on a real local uvicorn server inside the current loop.
+
+    httpx.ASGITransport buffers whole response bodies, so benchmarks that
+    measure streamed responses (first line / first token) need real HTTP.
+    lifespan="on" also runs the app's startup / shutdown events.
+    Yields the base URL.
+    """
+    import socket
+
+    import uvicorn
+
+    with socket.socket() as sock:
+        sock.bind((host, 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning", lifespan=lifespan))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    try:
+        yield f"http://{host}:{port}"
+    finally:
+        server.should_exit = True
+        await task
@@ -0,0 +1,250 @@
+"""
+Chunk Metadata Storage for MedInSight
+Columnar, memory-mappable chunk metadata (replaces the pickled list of dicts)
+"""
+
+import os
+import shutil
+import struct
+from array import array
+from typing import BinaryIO, Callable, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+METADATA_MAGIC = b"MEDMETA\0"
+METADATA_VERSION = 1
+
+# magic, format version, reserved, rows, sources, source name bytes, text bytes
+_HEADER = struct.Struct("<8sIIQQQQ")
+
+
+# Chunk texts are written in slices of this many bytes
+_WRITE_BLOCK = 16 * 2 ** 20
+
+
+def _pad(n: int) -> int:
+    """Sections start on 8-byte boundaries so the arrays can be viewed in place"""
+    return -n % 8
+
+
+def _write_file(path: str, sources: List[str], source_ids: np.ndarray, chunk_ids: np.ndarray,
+                text_offsets: np.ndarray, write_texts: Callable[[BinaryIO], None]):
+    """Write the binary format atomically (via a temp file); write_texts appends the text data"""
+    names = [name.encode("utf-8") for name in sources]
+    name_offsets = np.zeros(len(names) + 1, dtype="<u8")
+    np.cumsum([len(name) for name in names], out=name_offsets[1:])
+    name_data = b"".join(names)
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(METADATA_MAGIC, METADATA_VERSION, 0, len(source_ids), len(names),
+                             len(name_data), int(text_offsets[-1])))
+        for section in (name_offsets.tobytes(), name_data,
+                        source_ids.astype("<i4").tobytes(),
+                        chunk_ids.astype("<i4").tobytes(),
+                        text_offsets.astype("<u8").tobytes()):
+            f.write(section)
+            f.write(b"\0" * _pad(len(section)))
+        write_texts(f)
+    os.replace(tmp_path, path)
+
+
+class ChunkMetadata(Sequence):
+    """
+    Per-chunk metadata (source, chunk_id, text) stored column-wise.
+
+    - sources: interned table of file names; rows hold an int32 index
+      (-1 marks a removed row)
+    - chunk_ids: int32 array
+    - texts: one contiguous UTF-8 buffer plus uint64 offsets
+
+    Indexing builds a fresh {'source', 'chunk_id', 'text'} dict (or None for
+    a removed row), so search only materializes the hits it returns.
+
+    On-disk format (little-endian, version METADATA_VERSION): header, source
+    offsets, source names, source ids, chunk ids, text offsets, text data.
+    Loaded with mmap=True, every column is a read-only view of the file.
+    """
+
+    def __init__(self, sources: List[str], source_ids: np.ndarray, chunk_ids: np.ndarray,
+                 text_offsets: np.ndarray, text_data: np.ndarray):
+        self.sources = sources
+        self._source_index = {name: i for i, name in enumerate(sources)}
+        self.source_ids = source_ids
+        self.chunk_ids = chunk_ids
+        self.text_offsets = text_offsets
+        self.text_data = text_data
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Optional[Dict]]) -> "ChunkMetadata":
+        """Build from {'source', 'chunk_id', 'text'} dicts (None = removed row)"""
+        metadata = cls([], np.empty(0, "<i4"), np.empty(0, "<i4"), np.zeros(1, "<u8"), np.empty(0, "u1"))
+        metadata.append(rows)
+        return metadata
+
+    def __len__(self) -> int:
+        return len(self.source_ids)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        source_id = self.source_ids[i]
+        if source_id < 0:
+            return None
+        return {
+            "source": self.sources[source_id],
+            "chunk_id": int(self.chunk_ids[i]),
+            "text": self.text(i)
+        }
+
+    def text(self, i: int) -> str:
+        start, end = self.text_offsets[i], self.text_offsets[i + 1]
+        return self.text_data[start:end].tobytes().decode("utf-8")
+
+    def source(self, i: int) -> Optional[str]:
+        source_id = self.source_ids[i]
+        return self.sources[source_id] if source_id >= 0 else None
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the column arrays (the source table is negligible)"""
+        return sum(a.nbytes for a in (self.source_ids, self.chunk_ids, self.text_offsets, self.text_data))
+
+    def append(self, rows: Iterable[Optional[Dict]]):
+        """Append rows (copies the columns; meant for ingestion, not serving)"""
+        source_ids, chunk_ids, texts = [], [], []
+        for row in rows:
+            if row is None:
+                source_ids.append(-1)
+                chunk_ids.append(0)
+                texts.append(b"")
+                continue
+            source = row["source"]
+            if source not in self._source_index:
+                self._source_index[source] = len(self.sources)
+                self.sources.append(source)
+            source_ids.append(self._source_index[source])
+            chunk_ids.append(row["chunk_id"])
+            texts.append(row["text"].encode("utf-8"))
+        if not source_ids:
+            return
+
+        lengths = np.fromiter((len(text) for text in texts), dtype="<u8", count=len(texts))
+        offsets = self.text_offsets[-1] + np.cumsum(lengths, dtype="<u8")
+        self.source_ids = np.concatenate([self.source_ids, np.asarray(source_ids, dtype="<i4")])
+        self.chunk_ids = np.concatenate([self.chunk_ids, np.asarray(chunk_ids, dtype="<i4")])
+        self.text_offsets = np.concatenate([self.text_offsets, offsets])
+        self.text_data = np.concatenate([self.text_data, np.frombuffer(b"".join(texts), dtype="u1")])
+
+    def drop(self, ids: Iterable[int]):
+        """Mark rows as removed; positions of the other rows are unchanged"""
+        ids = np.fromiter(ids, dtype="int64")
+        if not self.source_ids.flags.writeable:
+            self.source_ids = self.source_ids.copy()
+        self.source_ids[ids] = -1
+
+    def save(self, path: str):
+        """Write the versioned binary format (atomically, via a temp file)"""
+        text_bytes = int(self.text_offsets[-1])
+
+        def write_texts(f: BinaryIO):
+            # In slices: a memory-mapped buffer is never copied whole
+            for start in range(0, text_bytes, _WRITE_BLOCK):
+                f.write(self.text_data[start:min(start + _WRITE_BLOCK, text_bytes)].tobytes())
+
+        _write_file(path, self.sources, self.source_ids, self.chunk_ids, self.text_offsets, write_texts)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = False) -> "ChunkMetadata":
+        """
+        Read a file written by save().
+
+        Args:
+            mmap: Map the file read-only instead of reading it into memory
+        """
+        buffer = np.memmap(path, dtype="u1", mode="r") if mmap else np.fromfile(path, dtype="u1")
+        magic, version, _, n_rows, n_sources, name_bytes, text_bytes = _HEADER.unpack(
+            buffer[:_HEADER.size].tobytes()
+        )
+        if magic != METADATA_MAGIC:
+            raise ValueError(f"{path} is not a chunk metadata file")
+        if version != METADATA_VERSION:
+            raise ValueError(f"{path} has metadata format version {version}, expected {METADATA_VERSION}")
+
+        position = _HEADER.size
+
+        def section(n_bytes: int, dtype: str) -> np.ndarray:
+            nonlocal position
+            view = buffer[position:position + n_bytes].view(dtype)
+            position += n_bytes + _pad(n_bytes)
+            return view
+
+        name_offsets = section(8 * (n_sources + 1), "<u8")
+        name_data = section(name_bytes, "u1").tobytes()
+        sources = [name_data[name_offsets[i]:name_offsets[i + 1]].decode("utf-8") for i in range(n_sources)]
+        source_ids = section(4 * n_rows, "<i4")
+        chunk_ids = section(4 * n_rows, "<i4")
+        text_offsets = section(8 * (n_rows + 1), "<u8")
+        text_data = buffer[position:position + text_bytes]
+        if len(text_data) != text_bytes:
+            raise ValueError(f"{path} is truncated")
+        return cls(sources, source_ids, chunk_ids, text_offsets, text_data)
+
+
+class ChunkMetadataWriter:
+    """
+    Append-only writer of the ChunkMetadata format, for ingesting corpora
+    that do not fit in memory.
+
+    Chunk texts go straight to a side file as rows arrive. Only the fixed
+    16 bytes per row of the other columns are kept in memory. close()
+    writes the final file and returns it memory-mapped.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._texts_path = path + ".texts.tmp"
+        self._texts = open(self._texts_path, "wb")
+        self.sources: List[str] = []
+        self._source_index: Dict[str, int] = {}
+        self._source_ids = array("i")
+        self._chunk_ids = array("i")
+        self._text_offsets = array("Q", [0])
+
+    def __len__(self) -> int:
+        return len(self._source_ids)
+
+    def append(self, rows: Iterable[Dict]):
+        """Append {'source', 'chunk_id', 'text'} rows"""
+        for row in rows:
+            source = row["source"]
+            if source not in self._source_index:
+                self._source_index[source] = len(self.sources)
+                self.sources.append(source)
+            text = row["text"].encode("utf-8")
+            self._texts.write(text)
+            self._source_ids.append(self._source_index[source])
+            self._chunk_ids.append(row["chunk_id"])
+            self._text_offsets.append(self._text_offsets[-1] + len(text))
+
+    def close(self) -> ChunkMetadata:
+        """Write the file at path and return it loaded with mmap=True"""
+        self._texts.close()
+
+        def write_texts(f: BinaryIO):
+            with open(self._texts_path, "rb") as texts:
+                shutil.copyfileobj(texts, f, _WRITE_BLOCK)
+
+        try:
+            _write_file(self.path, self.sources, np.frombuffer(self._source_ids, dtype=np.int32),
+                        np.frombuffer(self._chunk_ids, dtype=np.int32),
+                        np.frombuffer(self._text_offsets, dtype=np.uint64), write_texts)
+        finally:
+            os.remove(self._texts_path)
+        return ChunkMetadata.load(self.path, mmap=True)
+
+    def abort(self):
+        """Discard everything written so far"""
+        self._texts.close()
+        if os.path.exists(self._texts_path):
+            os.remove(self._texts_path)
@@ -0,0 +1,103 @@
+"""
+Request Coalescing for MedInSight
+Concurrent identical queries share one pipeline run (single-flight)
+"""
+
+import asyncio
+import os
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from embedding_cache import normalize_query
+
+
+class _Flight:
+    """One running computation and the number of callers awaiting it"""
+
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class RequestCoalescer:
+    """
+    Single-flight execution of identical in-flight requests.
+
+    The first caller for a key starts the work as a task; callers arriving
+    while it runs await that task instead of starting their own. All of
+    them get its result or its exception. The key is released as soon as
+    the task finishes, so nothing outlives the flight.
+
+    A cancelled caller (client disconnected) only stops waiting. The work
+    itself is cancelled once no caller is left, and later callers then
+    start a fresh flight.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+
+        self.leaders = 0
+        self.followers = 0
+        self.errors = 0
+        self.abandoned = 0
+        self.max_waiters = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["RequestCoalescer"]:
+        """Build the coalescer unless COALESCE_QUERIES=false (None if disabled)"""
+        if os.getenv("COALESCE_QUERIES", "true").lower() != "true":
+            return None
+        return cls()
+
+    @staticmethod
+    def make_key(query: str, top_k: int, scope: str = "") -> Tuple[str, int, str]:
+        return normalize_query(query), top_k, scope
+
+    async def run(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Result of fn(), shared with every concurrent caller using the same key"""
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(partial(self._finish, key, flight))
+            self.leaders += 1
+        else:
+            self.followers += 1
+        flight.waiters += 1
+        self.max_waiters = max(self.max_waiters, flight.waiters)
+        try:
+            # shield: cancelling this caller must not cancel the shared task
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                # Last one waiting: stop the upstream calls; newcomers start over
+                self._release(key, flight)
+                flight.task.cancel()
+                self.abandoned += 1
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def _release(self, key: Hashable, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def _finish(self, key: Hashable, flight: _Flight, task: asyncio.Task):
+        self._release(key, flight)
+        # Also marks the exception as retrieved when nobody was left to await it
+        if not task.cancelled() and task.exception() is not None:
+            self.errors += 1
+
+    def stats(self) -> Dict[str, Any]:
+        requests = self.leaders + self.followers
+        return {
+            "in_flight": len(self._flights),
+            "leaders": self.leaders,
+            "coalesced": self.followers,
+            "errors": self.errors,
+            "abandoned": self.abandoned,
+            "max_waiters": self.max_waiters,
+            "coalesced_rate": round(self.followers / requests, 4) if requests else 0.0
+        }
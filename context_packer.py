@@ -0,0 +1,129 @@
+"""
+Context Packer for MedInSight
+Fits retrieved chunks into a token budget for the generation prompt
+"""
+
+import os
+from typing import Dict, List, Optional, Union
+
+from embedding_client import token_counter
+
+# "[Context i]\n" label and the blank line between contexts
+_BLOCK_OVERHEAD_TOKENS = 6
+
+
+def overlap_length(head: str, tail: str, min_overlap: int, max_overlap: int) -> int:
+    """
+    Length of the longest suffix of head that is a prefix of tail (0 if
+    shorter than min_overlap). Neighbouring chunks share chunk_overlap
+    characters, so this finds the seam between them.
+    """
+    window = head[-max_overlap:]
+    probe = tail[:min_overlap]
+    if len(probe) < min_overlap:
+        return 0
+    start = window.find(probe)
+    while start != -1:
+        if tail.startswith(window[start:]):
+            return len(window) - start
+        start = window.find(probe, start + 1)
+    return 0
+
+
+class ContextPacker:
+    """
+    Packs ranked contexts (strings or {'text', 'source', ...} dicts) into
+    at most `budget` prompt tokens:
+
+    - drops contexts whose text is already contained in a packed one
+    - merges neighbouring chunks (same source, overlapping seam) into one
+      block without repeating the overlap
+    - walks the contexts in relevance order and skips any that would
+      overflow the budget; if even the best one does not fit, it is cut
+
+    Tokens are counted locally with tiktoken (~4 chars/token without it).
+    """
+
+    def __init__(self, budget: int = 3000, model: str = "gpt-4", min_overlap: int = 32,
+                 max_overlap: int = 1000):
+        self.budget = budget
+        self.count_tokens = token_counter(model)
+        self.min_overlap = min_overlap
+        self.max_overlap = max_overlap
+
+    @classmethod
+    def from_env(cls, model: str = "gpt-4") -> Optional["ContextPacker"]:
+        """Build the packer from CONTEXT_* environment variables (None if the budget is 0)"""
+        budget = int(os.getenv("CONTEXT_TOKEN_BUDGET", 3000))
+        if budget <= 0:
+            return None
+        # Seams are at most CHUNK_OVERLAP characters; leave room for whitespace stripping
+        max_overlap = int(os.getenv("CHUNK_OVERLAP", 200)) * 2 + 64
+        return cls(budget=budget, model=model, max_overlap=max_overlap)
+
+    def _merge(self, first: Dict, second: Dict) -> Optional[str]:
+        """Text of first + second joined at their seam (None if not neighbours)"""
+        if first.get("source") != second.get("source"):
+            return None
+        n = overlap_length(first["text"], second["text"], self.min_overlap, self.max_overlap)
+        return first["text"] + second["text"][n:] if n else None
+
+    def _coalesce(self, blocks: List[Dict], i: int) -> int:
+        """Join block i with a block it now bridges to; returns the token change"""
+        for j, other in enumerate(blocks):
+            if j == i:
+                continue
+            merged = self._merge(blocks[i], other) or self._merge(other, blocks[i])
+            if merged is None:
+                continue
+            keep, drop = min(i, j), max(i, j)
+            tokens = self.count_tokens(merged)
+            change = tokens - blocks[i]["tokens"] - other["tokens"] - _BLOCK_OVERHEAD_TOKENS
+            blocks[keep] = dict(blocks[keep], text=merged, tokens=tokens)
+            del blocks[drop]
+            return change
+        return 0
+
+    def _truncate(self, text: str, tokens: int) -> str:
+        cut = len(text) * tokens // max(1, self.count_tokens(text))
+        while cut > 0 and self.count_tokens(text[:cut]) > tokens:
+            cut = cut * 9 // 10
+        return text[:cut]
+
+    def pack(self, contexts: List[Union[str, Dict]]) -> List[Union[str, Dict]]:
+        """
+        Packed contexts, best first, in the input's form: strings stay
+        strings; a merged dict keeps the keys of its best-ranked chunk.
+        """
+        as_text = bool(contexts) and isinstance(contexts[0], str)
+        blocks: List[Dict] = []
+        used = 0
+
+        for context in contexts:
+            item = {"text": context} if isinstance(context, str) else context
+            text = item["text"].strip()
+            if not text or any(text in block["text"] for block in blocks):
+                continue
+
+            for i, block in enumerate(blocks):
+                merged = self._merge(block, item) or self._merge(item, block)
+                if merged is None:
+                    continue
+                cost = self.count_tokens(merged) - block["tokens"]
+                if used + cost <= self.budget:
+                    blocks[i] = dict(block, text=merged, tokens=block["tokens"] + cost)
+                    used += cost + self._coalesce(blocks, i)
+                break
+            else:
+                tokens = self.count_tokens(item["text"])
+                if used + tokens + _BLOCK_OVERHEAD_TOKENS <= self.budget:
+                    blocks.append(dict(item, tokens=tokens))
+                    used += tokens + _BLOCK_OVERHEAD_TOKENS
+                elif not blocks:
+                    text = self._truncate(item["text"], self.budget - _BLOCK_OVERHEAD_TOKENS)
+                    blocks.append(dict(item, text=text, tokens=self.count_tokens(text)))
+                    used = blocks[0]["tokens"] + _BLOCK_OVERHEAD_TOKENS
+
+        if as_text:
+            return [block["text"] for block in blocks]
+        return [{key: value for key, value in block.items() if key != "tokens"} for block in blocks]
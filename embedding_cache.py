@@ -0,0 +1,239 @@
+"""
+Query Embedding Cache for MedInSight
+Bounded LRU cache of query embeddings with optional TTL and an on-disk tier
+"""
+
+import asyncio
+import os
+import re
+import sqlite3
+import threading
+import time
+import hashlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Per-entry bookkeeping overhead (key string, tuple, OrderedDict node)
+_ENTRY_OVERHEAD_BYTES = 200
+
+
+def normalize_query(query: str) -> str:
+    """Normalize query text so trivially different wordings share a key"""
+    text = re.sub(r"\s+", " ", query.casefold()).strip()
+    return text.strip(" ?!.,;:")
+
+
+class QueryEmbeddingCache:
+    """
+    LRU cache of query embeddings keyed by (normalized query, model name).
+
+    The in-memory tier is bounded in megabytes; the optional SQLite tier
+    keeps embeddings across restarts and refills the memory tier on a hit.
+    Each process opens its own SQLite connection on first use, so a cache
+    created before serve.py forks its workers never shares one across fork.
+    The async methods answer memory hits inline and do disk-tier reads and
+    writes in an executor, off the event loop.
+    """
+
+    def __init__(self, max_mb: float = 32, ttl: float = 0, disk_path: Optional[str] = None):
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.ttl = ttl
+        self.disk_path = disk_path
+        self._entries: "OrderedDict[str, Tuple[np.ndarray, float]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # Held for disk I/O only, so memory lookups never wait on SQLite
+        self._disk_lock = threading.Lock()
+        self._db = None
+        self._db_pid = None
+        # Connections inherited across fork: never used, and never closed in the child
+        self._inherited = []
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if disk_path:
+            os.makedirs(os.path.dirname(disk_path) or ".", exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> "QueryEmbeddingCache":
+        """Build the cache from EMBEDDING_CACHE_* environment variables"""
+        return cls(
+            max_mb=float(os.getenv("EMBEDDING_CACHE_MB", 32)),
+            ttl=float(os.getenv("EMBEDDING_CACHE_TTL", 0)),
+            disk_path=os.getenv("EMBEDDING_CACHE_PATH") or None
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @staticmethod
+    def make_key(query: str, model: str) -> str:
+        return hashlib.sha256(f"{model}\0{normalize_query(query)}".encode("utf-8")).hexdigest()
+
+    def _expired(self, created: float) -> bool:
+        return bool(self.ttl) and time.time() - created > self.ttl
+
+    def _store(self, key: str, vector: np.ndarray, created: float):
+        """Insert into the memory tier and evict LRU entries past the budget (lock held)"""
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key)[0].nbytes + _ENTRY_OVERHEAD_BYTES
+        self._entries[key] = (vector, created)
+        self._bytes += vector.nbytes + _ENTRY_OVERHEAD_BYTES
+        while self._bytes > self.max_bytes and self._entries:
+            _, (old, _) = self._entries.popitem(last=False)
+            self._bytes -= old.nbytes + _ENTRY_OVERHEAD_BYTES
+            self.evictions += 1
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        """This process's disk-tier connection, opened on first use (disk lock held)"""
+        if not self.disk_path:
+            return None
+        if self._db_pid != os.getpid():
+            if self._db is not None:
+                self._inherited.append(self._db)
+            self._db = sqlite3.connect(self.disk_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings "
+                "(key TEXT PRIMARY KEY, dim INTEGER, vector BLOB, created REAL)"
+            )
+            self._db.commit()
+            self._db_pid = os.getpid()
+        return self._db
+
+    def _disk_get(self, key: str) -> Optional[Tuple[np.ndarray, float]]:
+        db = self._connection()
+        row = db.execute(
+            "SELECT dim, vector, created FROM query_embeddings WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        dim, blob, created = row
+        if self._expired(created):
+            db.execute("DELETE FROM query_embeddings WHERE key = ?", (key,))
+            db.commit()
+            return None
+        return np.frombuffer(blob, dtype="float32").reshape(1, dim), created
+
+    def _memory_get(self, key: str) -> Optional[np.ndarray]:
+        """Memory-tier lookup (counts a hit, not a miss)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not self._expired(entry[1]):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                self._bytes -= self._entries.pop(key)[0].nbytes + _ENTRY_OVERHEAD_BYTES
+            return None
+
+    def _disk_get_many(self, keys: List[str]) -> List[Optional[np.ndarray]]:
+        """Disk-tier lookups for memory misses, refilling the memory tier; counts hits and misses"""
+        found = []
+        if self.disk_path:
+            with self._disk_lock:
+                found = [self._disk_get(key) for key in keys]
+        rows = []
+        with self._lock:
+            for key, entry in zip(keys, found or [None] * len(keys)):
+                if entry is None:
+                    self.misses += 1
+                    rows.append(None)
+                else:
+                    self._store(key, entry[0], entry[1])
+                    self.disk_hits += 1
+                    rows.append(entry[0])
+        return rows
+
+    def _disk_put_many(self, items: List[Tuple[str, np.ndarray, float]]):
+        with self._disk_lock:
+            db = self._connection()
+            if db is not None and items:
+                db.executemany(
+                    "INSERT OR REPLACE INTO query_embeddings VALUES (?, ?, ?, ?)",
+                    [(key, vector.shape[1], vector.tobytes(), created) for key, vector, created in items]
+                )
+                db.commit()
+
+    def _prepare(self, query: str, model: str, embedding: np.ndarray) -> Tuple[str, np.ndarray, float]:
+        """Key, read-only (1, dim) vector and creation time of a new entry, stored in the memory tier"""
+        key = self.make_key(query, model)
+        vector = np.ascontiguousarray(embedding, dtype="float32").reshape(1, -1)
+        vector.setflags(write=False)
+        created = time.time()
+        with self._lock:
+            self._store(key, vector, created)
+        return key, vector, created
+
+    def get(self, query: str, model: str) -> Optional[np.ndarray]:
+        """Return the cached (1, dim) embedding or None"""
+        if not self.enabled:
+            return None
+        key = self.make_key(query, model)
+        vector = self._memory_get(key)
+        if vector is not None:
+            return vector
+        return self._disk_get_many([key])[0]
+
+    def put(self, query: str, model: str, embedding: np.ndarray):
+        """Store a query embedding in memory (and on disk if configured)"""
+        if not self.enabled:
+            return
+        self._disk_put_many([self._prepare(query, model, embedding)])
+
+    async def aget_many(self, queries: List[str], model: str, executor=None) -> List[Optional[np.ndarray]]:
+        """
+        get() for several queries: memory hits inline, the misses looked up
+        on disk together in executor
+        """
+        if not self.enabled:
+            return [None] * len(queries)
+        keys = [self.make_key(query, model) for query in queries]
+        rows = [self._memory_get(key) for key in keys]
+        missing = [i for i, row in enumerate(rows) if row is None]
+        if missing:
+            if self.disk_path:
+                found = await asyncio.get_running_loop().run_in_executor(
+                    executor, self._disk_get_many, [keys[i] for i in missing])
+            else:
+                found = self._disk_get_many([keys[i] for i in missing])
+            for i, row in zip(missing, found):
+                rows[i] = row
+        return rows
+
+    async def aput_many(self, queries: List[str], model: str, embeddings, executor=None):
+        """put() for several queries: memory tier inline, one disk write in executor"""
+        if not self.enabled:
+            return
+        items = [self._prepare(query, model, embedding) for query, embedding in zip(queries, embeddings)]
+        if self.disk_path:
+            await asyncio.get_running_loop().run_in_executor(executor, self._disk_put_many, items)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        with self._disk_lock:
+            db = self._connection()
+            if db is not None:
+                db.execute("DELETE FROM query_embeddings")
+                db.commit()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "size_mb": round(self._bytes / (1024 * 1024), 3),
+                "max_mb": round(self.max_bytes / (1024 * 1024), 3),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0
+            }
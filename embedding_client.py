@@ -0,0 +1,197 @@
+"""
+Batched Embedding Client for MedInSight
+Concurrent, token-budgeted OpenAI embedding requests with retry and backoff
+"""
+
+import asyncio
+import os
+import random
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import aiohttp
+import numpy as np
+import openai
+from openai import error as openai_error
+
+from resources import use_aiohttp_session
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# OpenAI rejects single inputs above this many tokens
+MAX_INPUT_TOKENS = 8191
+
+
+class EmbeddingError(RuntimeError):
+    """A batch still failed after all retries; completed batches are kept"""
+
+    def __init__(self, message: str, completed: int, total: int):
+        super().__init__(message)
+        self.completed = completed
+        self.total = total
+
+
+def token_counter(model: str) -> Callable[[str], int]:
+    """Exact token count with tiktoken when installed, else ~4 characters per token"""
+    if tiktoken is not None:
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("cl100k_base")
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    return lambda text: len(text) // 4 + 1
+
+
+def _is_retryable(error: Exception) -> bool:
+    """429s, 5xx responses, timeouts and dropped connections are worth retrying"""
+    if isinstance(error, (openai_error.RateLimitError, openai_error.ServiceUnavailableError,
+                          openai_error.Timeout, openai_error.APIConnectionError, openai_error.TryAgain)):
+        return True
+    if isinstance(error, openai_error.OpenAIError):
+        return (error.http_status or 0) >= 500
+    return isinstance(error, asyncio.TimeoutError)
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Server-requested delay (Retry-After header, seconds) if any"""
+    headers = getattr(error, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after") or headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+class EmbeddingClient:
+    """
+    Embeds a corpus in token-budgeted batches with bounded concurrency.
+
+    Failed batches are retried with exponential backoff (honouring
+    Retry-After); batches that already succeeded are never re-sent, and
+    `on_batch` is called as each one completes so callers can persist them.
+    """
+
+    def __init__(self, model: str, concurrency: int = 4, batch_tokens: int = 20000,
+                 batch_size: int = 2048, max_retries: int = 6, backoff: float = 1.0,
+                 max_backoff: float = 60.0):
+        self.model = model
+        self.concurrency = max(1, concurrency)
+        self.batch_tokens = batch_tokens
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.count_tokens = token_counter(model)
+
+        self._resume_at = 0.0
+
+        self.requests = 0
+        self.retries = 0
+        self.rate_limited = 0
+
+    @classmethod
+    def from_env(cls, model: str) -> "EmbeddingClient":
+        """Build the client from EMBEDDING_* environment variables"""
+        return cls(
+            model,
+            concurrency=int(os.getenv("EMBEDDING_CONCURRENCY", 4)),
+            batch_tokens=int(os.getenv("EMBEDDING_BATCH_TOKENS", 20000)),
+            batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", 2048)),
+            max_retries=int(os.getenv("EMBEDDING_MAX_RETRIES", 6))
+        )
+
+    def make_batches(self, texts: List[str]) -> List[Tuple[int, int]]:
+        """Split texts into (start, end) ranges within the token and item budgets"""
+        batches = []
+        start, tokens = 0, 0
+        for i, text in enumerate(texts):
+            n = min(self.count_tokens(text), MAX_INPUT_TOKENS)
+            if i > start and (tokens + n > self.batch_tokens or i - start >= self.batch_size):
+                batches.append((start, i))
+                start, tokens = i, 0
+            tokens += n
+        if start < len(texts):
+            batches.append((start, len(texts)))
+        return batches
+
+    def _delay(self, attempt: int, error: Exception) -> float:
+        # Full jitter keeps concurrent batches from retrying in lockstep
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        requested = _retry_after(error)
+        if requested is not None:
+            delay = min(requested, self.max_backoff) + delay / 2
+        return delay
+
+    async def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        for attempt in range(self.max_retries + 1):
+            # A 429 on any batch pauses every batch, not just the one that hit it
+            pause = self._resume_at - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+            try:
+                self.requests += 1
+                response = await openai.Embedding.acreate(model=self.model, input=texts)
+                data = sorted(response["data"], key=lambda item: item["index"])
+                return np.array([item["embedding"] for item in data], dtype="float32")
+            except Exception as e:
+                if attempt == self.max_retries or not _is_retryable(e):
+                    raise
+                self.retries += 1
+                delay = self._delay(attempt, e)
+                if isinstance(e, openai_error.RateLimitError):
+                    self.rate_limited += 1
+                    self._resume_at = max(self._resume_at, time.monotonic() + delay)
+                await asyncio.sleep(delay)
+
+    async def aembed(self, texts: List[str],
+                     on_batch: Callable[[List[str], np.ndarray], None] = None) -> np.ndarray:
+        """
+        Embed texts, returning a (len(texts), dim) float32 matrix in input order.
+
+        Raises:
+            EmbeddingError: a batch failed permanently (after on_batch ran for
+                every batch that did succeed)
+        """
+        batches = self.make_batches(texts)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results: Dict[Tuple[int, int], np.ndarray] = {}
+        started = time.perf_counter()
+
+        async def run(batch: Tuple[int, int]):
+            async with semaphore:
+                embeddings = await self._embed_batch(texts[batch[0]:batch[1]])
+            results[batch] = embeddings
+            if on_batch is not None:
+                on_batch(texts[batch[0]:batch[1]], embeddings)
+            print(f"   Batch {len(results)}/{len(batches)} "
+                  f"({batch[1] - batch[0]} chunks, {time.perf_counter() - started:.1f}s)")
+
+        # One keep-alive connection pool for every batch of this run
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            with use_aiohttp_session(session):
+                outcomes = await asyncio.gather(*(run(batch) for batch in batches), return_exceptions=True)
+        failures = [outcome for outcome in outcomes if isinstance(outcome, BaseException)]
+        if failures:
+            done = sum(end - start for start, end in results)
+            raise EmbeddingError(
+                f"{len(failures)}/{len(batches)} embedding batches failed: {failures[0]}", done, len(texts)
+            ) from failures[0]
+        return np.concatenate([results[batch] for batch in batches]) if batches else np.empty((0, 0), "float32")
+
+    def embed(self, texts: List[str],
+              on_batch: Callable[[List[str], np.ndarray], None] = None) -> np.ndarray:
+        """Blocking wrapper around aembed() for scripts such as ingest.py"""
+        return asyncio.run(self.aembed(texts, on_batch=on_batch))
+
+    def stats(self) -> Dict:
+        return {
+            "model": self.model,
+            "concurrency": self.concurrency,
+            "batch_tokens": self.batch_tokens,
+            "requests": self.requests,
+            "retries": self.retries,
+            "rate_limited": self.rate_limited
+        }
@@ -0,0 +1,169 @@
+"""
+Chunk Embedding Store for MedInSight
+Content-addressed, on-disk store of chunk embeddings reused across ingestion runs
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+_KEY_BYTES = 32
+
+
+class EmbeddingStore:
+    """
+    Embeddings keyed by sha256(model, chunk text).
+
+    Each model gets an append-only pair of files in `path`:
+    `<model>.f32` holds the vectors as a raw float32 matrix (memory-mapped
+    for reads) and `<model>.keys` holds the 32-byte key of every row, in
+    row order. A row only counts once both its vector and its key are on
+    disk, so an interrupted write is ignored on the next open.
+    """
+
+    def __init__(self, path: str = "./vectorstore/embeddings"):
+        self.path = path
+        self._models: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["EmbeddingStore"]:
+        """Build the store from EMBEDDING_STORE_PATH (None if set to empty)"""
+        path = os.getenv("EMBEDDING_STORE_PATH", "./vectorstore/embeddings")
+        return cls(path) if path else None
+
+    @staticmethod
+    def make_key(model: str, text: str) -> bytes:
+        return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).digest()
+
+    def _files(self, model: str) -> Tuple[str, str, str]:
+        stem = os.path.join(self.path, re.sub(r"[^A-Za-z0-9_.-]", "_", model))
+        return stem + ".json", stem + ".f32", stem + ".keys"
+
+    def _open(self, model: str) -> Dict:
+        """Load the row index and vector map of a model (lock held)"""
+        state = self._models.get(model)
+        if state is not None:
+            return state
+
+        header_path, vectors_path, keys_path = self._files(model)
+        state = {"dim": None, "rows": {}, "vectors": None}
+        try:
+            with open(header_path) as f:
+                state["dim"] = json.load(f)["dim"]
+        except (OSError, ValueError, KeyError):
+            self._models[model] = state
+            return state
+
+        for path in (vectors_path, keys_path):
+            open(path, "ab").close()
+        with open(keys_path, "rb") as f:
+            keys = f.read()
+        row_bytes = 4 * state["dim"]
+        n_rows = min(len(keys) // _KEY_BYTES, os.path.getsize(vectors_path) // row_bytes)
+        state["rows"] = {keys[i * _KEY_BYTES:(i + 1) * _KEY_BYTES]: i for i in range(n_rows)}
+        self._truncate(vectors_path, keys_path, n_rows, row_bytes)
+        self._map(state, vectors_path)
+        self._models[model] = state
+        return state
+
+    @staticmethod
+    def _truncate(vectors_path: str, keys_path: str, n_rows: int, row_bytes: int):
+        """Drop a partially written tail so appends line up with the key file"""
+        if os.path.getsize(vectors_path) != n_rows * row_bytes:
+            os.truncate(vectors_path, n_rows * row_bytes)
+        if os.path.getsize(keys_path) != n_rows * _KEY_BYTES:
+            os.truncate(keys_path, n_rows * _KEY_BYTES)
+
+    @staticmethod
+    def _map(state: Dict, vectors_path: str):
+        n_rows = len(state["rows"])
+        state["vectors"] = (
+            np.memmap(vectors_path, dtype="float32", mode="r", shape=(n_rows, state["dim"]))
+            if n_rows else None
+        )
+
+    def lookup(self, model: str, texts: List[str]) -> Tuple[Optional[np.ndarray], List[int]]:
+        """
+        Fetch stored embeddings for texts.
+
+        Returns:
+            (embeddings, missing): a (len(texts), dim) float32 matrix with the
+            stored rows filled in (None if nothing is stored for the model) and
+            the positions of texts that still need embedding
+        """
+        with self._lock:
+            state = self._open(model)
+            rows = [state["rows"].get(self.make_key(model, text)) for text in texts]
+            missing = [i for i, row in enumerate(rows) if row is None]
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+            if state["vectors"] is None:
+                return None, missing
+
+            embeddings = np.zeros((len(texts), state["dim"]), dtype="float32")
+            found = [i for i, row in enumerate(rows) if row is not None]
+            if found:
+                embeddings[found] = state["vectors"][[rows[i] for i in found]]
+            return embeddings, missing
+
+    def add(self, model: str, texts: List[str], embeddings: np.ndarray):
+        """Append embeddings for texts that are not stored yet"""
+        embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+        if not len(texts):
+            return
+
+        with self._lock:
+            state = self._open(model)
+            header_path, vectors_path, keys_path = self._files(model)
+            if state["dim"] is None:
+                os.makedirs(self.path, exist_ok=True)
+                state["dim"] = embeddings.shape[1]
+                for path in (vectors_path, keys_path):
+                    open(path, "wb").close()
+                # Header last: without it the model counts as empty
+                with open(header_path, "w") as f:
+                    json.dump({"model": model, "dim": state["dim"]}, f)
+            elif embeddings.shape[1] != state["dim"]:
+                raise ValueError(
+                    f"Embedding dimension {embeddings.shape[1]} does not match "
+                    f"stored dimension {state['dim']} for {model}"
+                )
+
+            new_rows = {}
+            for text, vector in zip(texts, embeddings):
+                key = self.make_key(model, text)
+                if key not in state["rows"] and key not in new_rows:
+                    new_rows[key] = vector
+            if not new_rows:
+                return
+
+            # Vectors first, then keys: a crash in between leaves unkeyed
+            # vector rows that _open() truncates away
+            with open(vectors_path, "ab") as f:
+                f.write(np.stack(list(new_rows.values())).tobytes())
+            with open(keys_path, "ab") as f:
+                f.write(b"".join(new_rows))
+            start = len(state["rows"])
+            for offset, key in enumerate(new_rows):
+                state["rows"][key] = start + offset
+            self._map(state, vectors_path)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "path": self.path,
+                "models": {model: len(state["rows"]) for model, state in self._models.items()},
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
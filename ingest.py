@@ -4,10 +4,22 @@ Loads PDFs from ./pdfs/ directory, chunks them, and creates FAISS vector store
 Uses OpenAI text-embedding-3-large for embeddings
 """
 
+import asyncio
+import hashlib
+import json
 import os
-from typing import List, Dict, Tuple
+import time
+import weakref
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import groupby, islice, repeat
+from operator import itemgetter
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple
 from pathlib import Path
 import pickle
+import shutil
+import tempfile
 from dotenv import load_dotenv
 
 # PDF extraction libraries
@@ -26,45 +38,215 @@ import faiss
 import numpy as np
 import openai
 
+from chunk_metadata import ChunkMetadata, ChunkMetadataWriter
+from embedding_cache import QueryEmbeddingCache
+from embedding_client import EmbeddingClient
+from embedding_store import EmbeddingStore
+from ingest_stream import Stage, batched, peak_rss_mb
+from metrics import FALLBACKS, timed
+from resilience import guard, timeout_for
+from resources import configure_openai, get_breaker, get_sentence_transformer
+from sparse_index import BM25Index, reciprocal_rank_fusion
+
 # Load environment variables
 load_dotenv()
 
+OPENAI_EMBEDDING_MODEL = "text-embedding-3-large"
+FALLBACK_EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+FALLBACK_EMBEDDING_DIM = 384
+
+
+def content_hash(*paths: str) -> str:
+    """Short SHA-256 over the bytes of the given files (index version id)"""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+# Pre-ChunkMetadata stores pickled a list of dicts; still readable, never written
+LEGACY_METADATA_FILE = "metadata.pkl"
+
+# Written next to the index by save(): content hash plus file sizes/mtimes
+STORE_INFO_FILE = "store.json"
+
+# BM25 inverted index over the chunk texts, saved beside faiss.index
+SPARSE_INDEX_FILE = "sparse.bin"
+
+# Published layout: every build is saved to its own versions/<content hash>/
+# directory, then CURRENT is atomically repointed at it. A bare faiss.index
+# in the store root (pre-versioning layout) is still loaded when there is no CURRENT.
+VECTORSTORE_DIR = "./vectorstore"
+VERSIONS_DIR = "versions"
+CURRENT_FILE = "CURRENT"
+INDEX_FILE = "faiss.index"
+METADATA_FILE = "metadata.bin"
+
+# Full-precision float32 vectors (one row per id) kept beside a compressed
+# index for FAISS_REFINE_FACTOR reranking; always memory-mapped
+FULL_VECTORS_FILE = "vectors.npy"
+# Read-only memory mapping of the whole index (flat codes via MMAP_IFC on
+# newer FAISS; older releases can only map IVF inverted lists)
+MMAP_IO_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+# Streamed builds fill trained indexes from the spilled vectors this many bytes at a time
+SPILL_READ_BLOCK = 64 * 2 ** 20
+
+
+def truncate_embeddings(embeddings: np.ndarray, dim: int) -> np.ndarray:
+    """
+    Keep the first dim columns and rescale rows to unit length.
+    text-embedding-3 models are trained so that such prefixes remain usable
+    embeddings (what the API's `dimensions` parameter returns).
+    """
+    embeddings = np.asarray(embeddings, dtype='float32')
+    if not dim or embeddings.shape[1] <= dim:
+        return embeddings
+    truncated = np.ascontiguousarray(embeddings[:, :dim])
+    norms = np.linalg.norm(truncated, axis=1, keepdims=True)
+    return truncated / np.maximum(norms, 1e-12)
+
+
+def _file_stamps(paths) -> Dict[str, List[int]]:
+    stamps = {}
+    for path in paths:
+        stat = os.stat(path)
+        stamps[os.path.basename(path)] = [stat.st_size, stat.st_mtime_ns]
+    return stamps
+
+
+def _write_store_info(version: str, *paths: str):
+    """Record the content hash of freshly saved store files"""
+    with open(os.path.join(os.path.dirname(paths[0]), STORE_INFO_FILE), 'w') as f:
+        json.dump({"version": version, "files": _file_stamps(paths)}, f, indent=2)
+
+
+def _read_store_version(*paths: str) -> Optional[str]:
+    """
+    Content hash recorded by save(), if the files are unchanged since.
+    Saves hashing (and so reading) a large index on every startup.
+    """
+    try:
+        with open(os.path.join(os.path.dirname(paths[0]), STORE_INFO_FILE)) as f:
+            info = json.load(f)
+        return info["version"] if info["files"] == _file_stamps(paths) else None
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _fsync(path: str):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def current_store_dir(root: str = VECTORSTORE_DIR) -> str:
+    """Directory of the published store version (root itself for the unversioned layout)"""
+    try:
+        with open(os.path.join(root, CURRENT_FILE)) as f:
+            version = f.read().strip()
+    except OSError:
+        return root
+    store_dir = os.path.join(root, VERSIONS_DIR, version)
+    return store_dir if version and os.path.isdir(store_dir) else root
+
+
+def _prune_versions(root: str, keep: int):
+    """Delete all but the `keep` most recent published versions (never CURRENT)"""
+    versions_dir = os.path.join(root, VERSIONS_DIR)
+    current = os.path.basename(current_store_dir(root))
+    versions = sorted(
+        (entry for entry in os.scandir(versions_dir) if entry.is_dir() and not entry.name.startswith(".")),
+        key=lambda entry: entry.stat().st_mtime_ns, reverse=True
+    )
+    for entry in versions[keep:]:
+        if entry.name != current:
+            # Processes that still map these files keep reading them until they unmap
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
+# Indexed when ./pdfs/ holds no PDF, so the API can be tried out
+PLACEHOLDER_CHUNKS = [
+    "Diabetes is a chronic metabolic disease characterized by elevated levels of blood glucose (or blood sugar), which leads over time to serious damage to the heart, blood vessels, eyes, kidneys, and nerves.",
+    "The hallmark of diabetes is elevated glucose levels in the blood. This condition can result from the body's inability to produce insulin, use insulin effectively, or both.",
+    "Heart disease refers to several types of heart conditions. The most common type is coronary artery disease, which can lead to heart attack.",
+    "Hypertension, or high blood pressure, is a condition in which the force of the blood against the artery walls is too high. It can lead to serious health complications and increase the risk of heart disease.",
+    "Cancer is a disease in which some of the body's cells grow uncontrollably and spread to other parts of the body. It can start almost anywhere in the human body."
+]
+
 
 class DocumentProcessor:
     """
     Processes PDF documents: extraction, semantic chunking with overlap
     """
     
-    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
+    # Items held between the streaming stages of iter_documents()
+    PAGE_QUEUE = 64
+    CHUNK_QUEUE = 1024
+    
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200, init_embeddings: bool = True):
         self.chunk_size = int(os.getenv("CHUNK_SIZE", chunk_size))
         self.chunk_overlap = int(os.getenv("CHUNK_OVERLAP", chunk_overlap))
         self.use_fallback = False
         self.fallback_model = None
+        self.timing_report = {}
+        self.embedding_stats = {}
+        self._embedding_store = None
         
         # Initialize OpenAI for embeddings
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
+        if not init_embeddings:
+            # Extraction/chunking only (ingestion worker processes)
+            return
         if self.openai_api_key and self.openai_api_key != "your_openai_api_key_here":
-            openai.api_key = self.openai_api_key
+            configure_openai(self.openai_api_key)
         else:
             print("⚠️  WARNING: OPENAI_API_KEY not found or not set in .env file!")
             print("   Using fallback embedding model (sentence-transformers)")
             # Fallback to sentence-transformers if OpenAI not available
             try:
-                from sentence_transformers import SentenceTransformer
-                self.fallback_model = SentenceTransformer('all-MiniLM-L6-v2')
+                self.fallback_model = get_sentence_transformer(FALLBACK_EMBEDDING_MODEL)
                 self.use_fallback = True
             except Exception as e:
                 raise ValueError(f"No embedding model available. Please set OPENAI_API_KEY or install sentence-transformers: {e}")
         
+    @property
+    def embedding_model(self) -> str:
+        """Name of the model create_embeddings will use"""
+        if self.use_fallback or not self.openai_api_key or self.openai_api_key == "your_openai_api_key_here":
+            return FALLBACK_EMBEDDING_MODEL
+        return OPENAI_EMBEDDING_MODEL
+    
+    def iter_pages_pymupdf(self, pdf_path: str) -> Iterator[str]:
+        """Yield page texts one at a time using PyMuPDF"""
+        with fitz.open(pdf_path) as doc:
+            for page in doc:
+                yield page.get_text()
+    
+    def iter_pages_pdfplumber(self, pdf_path: str) -> Iterator[str]:
+        """Yield page texts one at a time using pdfplumber"""
+        with pdfplumber.open(pdf_path) as pdf:
+            for page in pdf.pages:
+                yield page.extract_text() or ""
+    
+    def iter_pages_pypdf2(self, pdf_path: str) -> Iterator[str]:
+        """Yield page texts one at a time using PyPDF2"""
+        reader = PdfReader(pdf_path)
+        for page in reader.pages:
+            yield page.extract_text() or ""
+    
+    @staticmethod
+    def _join_pages(pages: Iterator[str]) -> str:
+        # Single join instead of repeated += (quadratic on large books)
+        return "".join(page + "\n" for page in pages)
+    
     def load_pdf_pymupdf(self, pdf_path: str) -> str:
         """Extract text using PyMuPDF (best for tables and diagrams)"""
         try:
-            doc = fitz.open(pdf_path)
-            text = ""
-            for page in doc:
-                text += page.get_text() + "\n"
-            doc.close()
-            return text
+            return self._join_pages(self.iter_pages_pymupdf(pdf_path))
         except Exception as e:
             print(f"Error with PyMuPDF for {pdf_path}: {e}")
             return ""
@@ -72,11 +254,7 @@ class DocumentProcessor:
     def load_pdf_pdfplumber(self, pdf_path: str) -> str:
         """Extract text using pdfplumber"""
         try:
-            with pdfplumber.open(pdf_path) as pdf:
-                text = ""
-                for page in pdf.pages:
-                    text += page.extract_text() + "\n"
-            return text
+            return self._join_pages(self.iter_pages_pdfplumber(pdf_path))
         except Exception as e:
             print(f"Error with pdfplumber for {pdf_path}: {e}")
             return ""
@@ -84,11 +262,7 @@ class DocumentProcessor:
     def load_pdf_pypdf2(self, pdf_path: str) -> str:
         """Extract text using PyPDF2 (fallback)"""
         try:
-            reader = PdfReader(pdf_path)
-            text = ""
-            for page in reader.pages:
-                text += page.extract_text() + "\n"
-            return text
+            return self._join_pages(self.iter_pages_pypdf2(pdf_path))
         except Exception as e:
             print(f"Error with PyPDF2 for {pdf_path}: {e}")
             return ""
@@ -102,16 +276,43 @@ class DocumentProcessor:
         else:
             return self.load_pdf_pypdf2(pdf_path)
     
+    def iter_pages(self, pdf_path: str) -> Iterator[str]:
+        """Yield page texts one at a time using the available library"""
+        if PDF_LIBRARY == "pymupdf":
+            return self.iter_pages_pymupdf(pdf_path)
+        elif PDF_LIBRARY == "pdfplumber":
+            return self.iter_pages_pdfplumber(pdf_path)
+        else:
+            return self.iter_pages_pypdf2(pdf_path)
+    
     def chunk_text_semantic(self, text: str) -> List[str]:
         """
         Split text into meaningful chunks with overlap
         Tries to split at sentence boundaries for semantic coherence
         """
-        chunks = []
-        start = 0
-        text_length = len(text)
+        return list(self.iter_chunks([text]))
+    
+    def iter_chunks(self, pieces: Iterable[str]) -> Iterator[str]:
+        """
+        chunk_text_semantic over the concatenation of pieces (e.g. page
+        texts), reading pieces only as far as the next chunk needs: only
+        about one chunk of text is held at a time.
+        """
+        pieces = iter(pieces)
+        text, start, more = "", 0, True
         
-        while start < text_length:
+        while True:
+            # Read ahead until this chunk is known not to reach the end of the text
+            while more and len(text) <= start + self.chunk_size:
+                piece = next(pieces, None)
+                if piece is None:
+                    more = False
+                else:
+                    text, start = text[start:] + piece, 0
+            text_length = len(text)
+            if start >= text_length:
+                return
+            
             end = min(start + self.chunk_size, text_length)
             chunk = text[start:end]
             
@@ -132,15 +333,33 @@ class DocumentProcessor:
             
             chunk = chunk.strip()
             if len(chunk) > 50:  # Filter out very small chunks
-                chunks.append(chunk)
+                yield chunk
+            if end >= text_length:
+                return
             
             # Move start position with overlap
             start = end - self.chunk_overlap
-            
-        return chunks
     
-    def process_documents(self, pdf_dir: str = "./pdfs/") -> Tuple[List[str], List[Dict]]:
-        """Process all PDFs in directory"""
+    def process_documents(self, pdf_dir: str = "./pdfs/", workers: int = None) -> Tuple[List[str], List[Dict]]:
+        """
+        Process all PDFs in directory.
+        
+        Args:
+            pdf_dir: Directory containing PDF files
+            workers: Extraction/chunking processes (default: INGEST_WORKERS, 0 = one per CPU)
+        """
+        pdf_files = self._find_pdfs(pdf_dir)
+        if pdf_files is None:
+            return [], []
+        if not pdf_files:
+            metadata = self._placeholder_rows(pdf_dir)
+            return [row["text"] for row in metadata], metadata
+        
+        return self.process_files(pdf_files, workers=workers)
+    
+    @staticmethod
+    def _find_pdfs(pdf_dir: str) -> Optional[List[Path]]:
+        """PDFs in pdf_dir, sorted (None if the directory had to be created)"""
         pdf_path = Path(pdf_dir)
         
         # Create directory if it doesn't exist
@@ -148,44 +367,192 @@ class DocumentProcessor:
             print(f"📁 Creating {pdf_dir} directory...")
             pdf_path.mkdir(parents=True, exist_ok=True)
             print(f"⚠️  No PDF files found. Please add PDFs to {pdf_dir}")
-            return [], []
+            return None
         
-        all_chunks = []
-        metadata = []
+        pdf_files = sorted(pdf_path.glob("*.pdf"))
+        if pdf_files:
+            print(f"📚 Found {len(pdf_files)} PDF file(s) in {pdf_dir}")
+        return pdf_files
+    
+    @staticmethod
+    def _placeholder_rows(pdf_dir: str) -> List[Dict]:
+        print(f"⚠️  No PDF files found in {pdf_dir}")
+        print("   Adding placeholder content for testing...")
+        print(f"   Added {len(PLACEHOLDER_CHUNKS)} placeholder chunks")
+        return [
+            {"source": "placeholder.pdf", "chunk_id": i, "text": chunk}
+            for i, chunk in enumerate(PLACEHOLDER_CHUNKS)
+        ]
+    
+    def iter_documents(self, pdf_dir: str = "./pdfs/", workers: int = None) -> Iterator[Dict]:
+        """
+        Stream the {'source', 'chunk_id', 'text'} rows process_documents
+        returns, in the same order, without holding a whole book.
         
-        pdf_files = list(pdf_path.glob("*.pdf"))
+        With one worker, a page stage reads PDFs page by page and a chunk
+        stage cuts chunks as pages arrive, each in its own thread behind a
+        bounded queue. With more workers, whole files are extracted and
+        chunked in worker processes, at most two per worker ahead of the
+        consumer. timing_report is filled in when the stream is exhausted.
         
+        Args:
+            pdf_dir: Directory containing PDF files
+            workers: Extraction/chunking processes (default: INGEST_WORKERS, 0 = one per CPU)
+        """
+        pdf_files = self._find_pdfs(pdf_dir)
+        if pdf_files is None:
+            return
         if not pdf_files:
-            print(f"⚠️  No PDF files found in {pdf_dir}")
-            print("   Adding placeholder content for testing...")
-            # Add placeholder content
-            placeholder_chunks = [
-                "Diabetes is a chronic metabolic disease characterized by elevated levels of blood glucose (or blood sugar), which leads over time to serious damage to the heart, blood vessels, eyes, kidneys, and nerves.",
-                "The hallmark of diabetes is elevated glucose levels in the blood. This condition can result from the body's inability to produce insulin, use insulin effectively, or both.",
-                "Heart disease refers to several types of heart conditions. The most common type is coronary artery disease, which can lead to heart attack.",
-                "Hypertension, or high blood pressure, is a condition in which the force of the blood against the artery walls is too high. It can lead to serious health complications and increase the risk of heart disease.",
-                "Cancer is a disease in which some of the body's cells grow uncontrollably and spread to other parts of the body. It can start almost anywhere in the human body."
-            ]
-            all_chunks = placeholder_chunks
-            metadata = [
-                {"source": "placeholder.pdf", "chunk_id": i, "text": chunk}
-                for i, chunk in enumerate(placeholder_chunks)
-            ]
-            print(f"   Added {len(placeholder_chunks)} placeholder chunks")
-            return all_chunks, metadata
+            self.timing_report = {}
+            yield from self._placeholder_rows(pdf_dir)
+            return
         
-        print(f"📚 Found {len(pdf_files)} PDF file(s) in {pdf_dir}")
-        print(f"📖 Using {PDF_LIBRARY.upper()} for PDF extraction")
+        workers = self._resolve_workers(workers, len(pdf_files))
+        print(f"📖 Using {PDF_LIBRARY.upper()} for PDF extraction ({workers} worker process(es), streaming)")
         print()
         
+        file_timings = []
+        wall_start = time.perf_counter()
+        if workers > 1:
+            stages = [Stage("chunks", self._iter_pooled(pdf_files, workers, file_timings), self.CHUNK_QUEUE)]
+        else:
+            pages = Stage("pages", self._iter_file_pages(pdf_files), self.PAGE_QUEUE)
+            stages = [pages, Stage("chunks", self._chunk_pages(pages, file_timings), self.CHUNK_QUEUE)]
+        yield from stages[-1]
+        
+        self._set_timing_report(workers, wall_start, file_timings)
+        self.timing_report["queues"] = {stage.name: stage.stats() for stage in stages}
+    
+    def _iter_file_pages(self, pdf_files: List[Path]) -> Iterator[Tuple[str, object]]:
+        """Page stage: (file name, page text) per page, then (file name, timing dict) per file"""
         for pdf_file in pdf_files:
-            print(f"Processing: {pdf_file.name}")
-            text = self.load_pdf(str(pdf_file))
+            pages = self.iter_pages(str(pdf_file))
+            extract_s = 0.0
+            while True:
+                start = time.perf_counter()
+                try:
+                    text = next(pages, None)
+                except Exception as e:
+                    print(f"Error reading {pdf_file.name}: {e}")
+                    text = None
+                extract_s += time.perf_counter() - start
+                if text is None:
+                    break
+                yield pdf_file.name, text
+            yield pdf_file.name, {"file": pdf_file.name, "extract_s": round(extract_s, 4)}
+    
+    def _chunk_pages(self, pages: Iterable[Tuple[str, object]], file_timings: List[Dict]) -> Iterator[Dict]:
+        """Chunk stage: page stream to metadata rows, file by file"""
+        for source, items in groupby(pages, key=itemgetter(0)):
+            print(f"Processing: {source}")
+            timing = {"file": source, "extract_s": 0.0}
+            waited = [0.0]
             
-            if text:
-                chunks = self.chunk_text_semantic(text)
-                print(f"  ✓ Created {len(chunks)} chunks")
-                
+            def texts(items=items, waited=waited, timing=timing):
+                while True:
+                    start = time.perf_counter()
+                    item = next(items, None)
+                    waited[0] += time.perf_counter() - start
+                    if item is None:
+                        return
+                    if isinstance(item[1], str):
+                        yield item[1] + "\n"
+                    else:
+                        timing.update(item[1])
+            
+            chunks = self.iter_chunks(texts())
+            busy, n = 0.0, 0
+            while True:
+                start = time.perf_counter()
+                chunk = next(chunks, None)
+                busy += time.perf_counter() - start
+                if chunk is None:
+                    break
+                yield {"source": source, "chunk_id": n, "text": chunk}
+                n += 1
+            timing.update(chunks=n, chunk_s=round(busy - waited[0], 4))
+            file_timings.append(timing)
+            self._print_file(n, timing)
+    
+    def _iter_pooled(self, pdf_files: List[Path], workers: int, file_timings: List[Dict]) -> Iterator[Dict]:
+        """Rows of whole files extracted in worker processes, in file order"""
+        pool = ProcessPoolExecutor(max_workers=workers)
+        try:
+            files = iter(pdf_files)
+            pending = deque(
+                (pdf_file, pool.submit(_process_pdf, str(pdf_file), self.chunk_size, self.chunk_overlap))
+                for pdf_file in islice(files, 2 * workers)
+            )
+            while pending:
+                pdf_file, future = pending.popleft()
+                chunks, timing = future.result()
+                for next_file in islice(files, 1):
+                    pending.append((next_file, pool.submit(_process_pdf, str(next_file),
+                                                           self.chunk_size, self.chunk_overlap)))
+                print(f"Processing: {pdf_file.name}")
+                self._print_file(len(chunks), timing)
+                file_timings.append({"file": pdf_file.name, "chunks": len(chunks), **timing})
+                for i, chunk in enumerate(chunks):
+                    yield {"source": pdf_file.name, "chunk_id": i, "text": chunk}
+        finally:
+            pool.shutdown(cancel_futures=True)
+    
+    @staticmethod
+    def _print_file(n_chunks: int, timing: Dict):
+        if n_chunks:
+            print(f"  ✓ Created {n_chunks} chunks "
+                  f"(extract {timing['extract_s']:.2f}s, chunk {timing['chunk_s']:.2f}s)")
+        else:
+            print(f"  ✗ No text extracted")
+    
+    def _set_timing_report(self, workers: int, wall_start: float, file_timings: List[Dict]):
+        self.timing_report = {
+            "workers": workers,
+            "wall_s": round(time.perf_counter() - wall_start, 3),
+            "stages": {
+                "extract_s": round(sum(t["extract_s"] for t in file_timings), 3),
+                "chunk_s": round(sum(t["chunk_s"] for t in file_timings), 3)
+            },
+            "files": file_timings
+        }
+        
+        print(f"\n📊 Total chunks created: {sum(t['chunks'] for t in file_timings)}")
+        print(f"⏱️  Extraction {self.timing_report['stages']['extract_s']:.2f}s + "
+              f"chunking {self.timing_report['stages']['chunk_s']:.2f}s "
+              f"(summed over files), wall time {self.timing_report['wall_s']:.2f}s")
+    
+    def process_files(self, pdf_files: List[Path], workers: int = None) -> Tuple[List[str], List[Dict]]:
+        """
+        Extract and chunk the given PDFs (in the given order).
+        
+        Args:
+            pdf_files: PDF paths; chunk order follows this list
+            workers: Extraction/chunking processes (default: INGEST_WORKERS, 0 = one per CPU)
+        """
+        all_chunks = []
+        metadata = []
+        if not pdf_files:
+            self.timing_report = {"workers": 0, "wall_s": 0.0,
+                                  "stages": {"extract_s": 0.0, "chunk_s": 0.0}, "files": []}
+            return all_chunks, metadata
+        
+        workers = self._resolve_workers(workers, len(pdf_files))
+        print(f"📖 Using {PDF_LIBRARY.upper()} for PDF extraction ({workers} worker process(es))")
+        print()
+        
+        file_timings = []
+        wall_start = time.perf_counter()
+        pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        try:
+            # map() yields in submission order, so chunk order (and FAISS ids)
+            # is the same regardless of which worker finishes first
+            paths = [str(pdf_file) for pdf_file in pdf_files]
+            args = (paths, repeat(self.chunk_size), repeat(self.chunk_overlap))
+            outputs = pool.map(_process_pdf, *args) if pool else map(_process_pdf, *args)
+            
+            for pdf_file, (chunks, timing) in zip(pdf_files, outputs):
+                print(f"Processing: {pdf_file.name}")
+                self._print_file(len(chunks), timing)
                 for i, chunk in enumerate(chunks):
                     all_chunks.append(chunk)
                     metadata.append({
@@ -193,50 +560,117 @@ class DocumentProcessor:
                         'chunk_id': i,
                         'text': chunk
                     })
-            else:
-                print(f"  ✗ No text extracted")
+                file_timings.append({"file": pdf_file.name, "chunks": len(chunks), **timing})
+        finally:
+            if pool:
+                pool.shutdown()
         
-        print(f"\n📊 Total chunks created: {len(all_chunks)}")
+        self._set_timing_report(workers, wall_start, file_timings)
         return all_chunks, metadata
     
+    @staticmethod
+    def _resolve_workers(workers: int, n_files: int) -> int:
+        """Worker count from argument or INGEST_WORKERS (0 = one per CPU)"""
+        if workers is None:
+            workers = int(os.getenv("INGEST_WORKERS", 0))
+        if workers <= 0:
+            workers = os.cpu_count() or 1
+        return max(1, min(workers, n_files))
+    
+    @property
+    def embedding_store(self) -> Optional[EmbeddingStore]:
+        """Chunk embeddings kept across builds (EMBEDDING_STORE_PATH); None when disabled"""
+        if self._embedding_store is None:
+            self._embedding_store = EmbeddingStore.from_env() or False
+        return self._embedding_store or None
+
     def create_embeddings(self, texts: List[str]) -> np.ndarray:
-        """Create embeddings using OpenAI text-embedding-3-large"""
+        """
+        Create embeddings, reusing stored vectors for previously seen chunks.
+
+        Only chunks missing from the embedding store are sent to the model;
+        their vectors are appended to the store as each batch completes, so
+        an interrupted build resumes where it stopped.
+        """
+        self.embedding_stats = {}
+        store = self.embedding_store
+        if store is None:
+            embeddings, model = self._encode(texts)
+            self.embedding_stats = {"model": model, "cached": 0, "embedded": len(texts), **self.embedding_stats}
+            return embeddings
+
+        model = self.embedding_model
+        embeddings, missing = store.lookup(model, texts)
+        print(f"🗃️  Embedding store: {len(texts) - len(missing)} cached, {len(missing)} to embed ({model})")
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            new, used_model = self._encode(missing_texts, on_batch=partial(store.add, model))
+            new = np.asarray(new, dtype='float32')
+            # No-op for rows already stored batch by batch
+            store.add(used_model, missing_texts, new)
+            if used_model != model:
+                # The provider failed over to the fallback model; stored rows
+                # of the original model would mix dimensions, so start over
+                return self.create_embeddings(texts)
+            if embeddings is None:
+                embeddings = np.empty((len(texts), new.shape[1]), dtype='float32')
+            embeddings[missing] = new
+
+        self.embedding_stats = {"model": model, "cached": len(texts) - len(missing),
+                                "embedded": len(missing), **self.embedding_stats}
+        return embeddings
+
+    def _encode_fallback(self, texts: List[str]) -> np.ndarray:
+        """Embed texts with the local sentence-transformers model"""
+        if self.fallback_model is None:
+            self.fallback_model = get_sentence_transformer(FALLBACK_EMBEDDING_MODEL)
+        return self.fallback_model.encode(texts, show_progress_bar=True)
+
+    def _encode(self, texts: List[str], on_batch=None) -> Tuple[np.ndarray, str]:
+        """
+        Embed texts with the configured model.
+
+        Args:
+            texts: Chunks to embed
+            on_batch: Called with (texts, embeddings) for every completed OpenAI batch
+
+        Returns:
+            (embeddings, model actually used)
+        """
         # Use fallback model if OpenAI not configured
-        if self.use_fallback or not self.openai_api_key or self.openai_api_key == "your_openai_api_key_here":
+        if self.embedding_model == FALLBACK_EMBEDDING_MODEL:
             print("📊 Using fallback embedding model (sentence-transformers)")
-            if self.fallback_model is None:
-                from sentence_transformers import SentenceTransformer
-                self.fallback_model = SentenceTransformer('all-MiniLM-L6-v2')
-            return self.fallback_model.encode(texts, show_progress_bar=True)
-        
+            return self._encode_fallback(texts), FALLBACK_EMBEDDING_MODEL
+
+        client = EmbeddingClient.from_env(OPENAI_EMBEDDING_MODEL)
         print("🔄 Creating embeddings with OpenAI text-embedding-3-large...")
-        print(f"   Processing {len(texts)} chunks...")
-        
-        embeddings = []
-        batch_size = 100  # Process in batches for efficiency
-        
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i:i + batch_size]
-            print(f"   Batch {i//batch_size + 1}/{(len(texts)-1)//batch_size + 1}")
-            
-            try:
-                response = openai.Embedding.create(
-                    model="text-embedding-3-large",
-                    input=batch
-                )
-                
-                batch_embeddings = [item['embedding'] for item in response['data']]
-                embeddings.extend(batch_embeddings)
-                
-            except Exception as e:
-                print(f"   Error creating embeddings: {e}")
-                print("   Falling back to sentence-transformers")
-                if not hasattr(self, 'fallback_model'):
-                    from sentence_transformers import SentenceTransformer
-                    self.fallback_model = SentenceTransformer('all-MiniLM-L6-v2')
-                return self.fallback_model.encode(texts, show_progress_bar=True)
-        
-        return np.array(embeddings)
+        print(f"   Processing {len(texts)} chunks in {len(client.make_batches(texts))} batches "
+              f"(up to {client.concurrency} concurrent)...")
+        try:
+            return client.embed(texts, on_batch=on_batch), OPENAI_EMBEDDING_MODEL
+        except Exception as e:
+            print(f"   Error creating embeddings: {e}")
+            print("   Falling back to sentence-transformers")
+            # Every row must come from one model, so the whole input is re-encoded
+            self.use_fallback = True
+            return self._encode_fallback(texts), FALLBACK_EMBEDDING_MODEL
+        finally:
+            self.embedding_stats = {"client": client.stats()}
+
+
+def _process_pdf(pdf_path: str, chunk_size: int, chunk_overlap: int) -> Tuple[List[str], Dict[str, float]]:
+    """Extract and chunk a single PDF; top-level so worker processes can run it"""
+    processor = DocumentProcessor(chunk_size, chunk_overlap, init_embeddings=False)
+    
+    start = time.perf_counter()
+    text = processor.load_pdf(pdf_path)
+    extracted = time.perf_counter()
+    chunks = processor.chunk_text_semantic(text) if text else []
+    
+    return chunks, {
+        "extract_s": round(extracted - start, 4),
+        "chunk_s": round(time.perf_counter() - extracted, 4)
+    }
 
 
 class VectorStore:
@@ -244,113 +678,1097 @@ class VectorStore:
     FAISS-based vector store for similarity search
     """
     
+    INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+    # Per-dimension encoding of stored vectors: 4, 2 or 1 byte(s)
+    STORAGES = ("float32", "fp16", "sq8")
+    _SQ_CODECS = {"fp16": "SQfp16", "sq8": "SQ8"}
+    
     def __init__(self, embedding_dim: int = None):
         # OpenAI text-embedding-3-large has 3072 dimensions
         # Fallback model has 384 dimensions
         self.embedding_dim = embedding_dim or 3072
         self.index = None
-        self.metadata = []
+        self.metadata = ChunkMetadata.from_rows([])
+        # True when the index and metadata are memory-mapped by load()
+        self.read_only = False
         self.processor = None
+        # Content hash of the loaded index; changes whenever ingest.py rebuilds it
+        self.version = None
+        # Query embeddings are reused across searches (EMBEDDING_CACHE_* in .env)
+        self.embedding_cache = QueryEmbeddingCache.from_env()
+        # Longest an OpenAI query embedding may take before the local model answers
+        self.embedding_timeout = float(os.getenv("QUERY_EMBEDDING_TIMEOUT_S", 10))
+        # Default query-time accuracy/speed knobs for IVF and HNSW indexes
+        self.nprobe = int(os.getenv("FAISS_NPROBE", 16))
+        self.ef_search = int(os.getenv("FAISS_EF_SEARCH", 64))
+        # Compression applied by build_index (ivf_pq has its own codes)
+        self.dimensions = int(os.getenv("EMBEDDING_DIMENSIONS", 0))
+        self.storage = os.getenv("FAISS_STORAGE", "float32").lower()
+        # Rerank refine_factor * k compressed hits against full_vectors (0 = off)
+        self.refine_factor = int(os.getenv("FAISS_REFINE_FACTOR", 0))
+        self.full_vectors = None
+        # Finalizer removing build_index_streaming's temporary directory (None once removed)
+        self._build_dir = None
+        # Lexical side of hybrid retrieval; None until built or loaded
+        self.sparse_index = None
+        # hybrid fuses BM25 and vector rankings with reciprocal rank fusion
+        self.retrieval_mode = os.getenv("RETRIEVAL_MODE", "hybrid").lower()
+        self.hybrid_candidates = int(os.getenv("HYBRID_CANDIDATES", 50))
+        self.rrf_k = int(os.getenv("RRF_K", 60))
+    
+    @staticmethod
+    def _training_set(embeddings: np.ndarray, default_size: int) -> np.ndarray:
+        """Reproducible random sample of FAISS_TRAIN_SIZE rows rather than the whole corpus"""
+        n = len(embeddings)
+        train_size = int(os.getenv("FAISS_TRAIN_SIZE", 0)) or default_size
+        if train_size >= n:
+            return embeddings
+        sample = np.sort(np.random.default_rng(0).choice(n, size=train_size, replace=False))
+        if not isinstance(embeddings, np.memmap):
+            return embeddings[sample]
+        # Spilled vectors (streamed build): read block by block rather than
+        # faulting nearly every page of the mapping in for a scattered sample
+        d = embeddings.shape[1]
+        block_rows = max(1, SPILL_READ_BLOCK // (d * 4))
+        rows = []
+        with open(embeddings.filename, 'rb') as f:
+            f.seek(embeddings.offset)
+            for start in range(0, n, block_rows):
+                block = np.fromfile(f, dtype='float32', count=block_rows * d).reshape(-1, d)
+                picked = sample[np.searchsorted(sample, start):np.searchsorted(sample, start + len(block))]
+                rows.append(block[picked - start])
+        return np.concatenate(rows)
+    
+    def _create_index(self, embeddings: np.ndarray, index_type: str, storage: str = None) -> "faiss.Index":
+        """
+        Create (and train, if needed) an empty FAISS index of the given type.
+        
+        Args:
+            embeddings: Full corpus matrix (float32); a sample is used for training
+            index_type: One of INDEX_TYPES
+            storage: One of STORAGES (default: FAISS_STORAGE)
+            
+        Returns:
+            Trained index ready for add()
+        """
+        n, d = embeddings.shape
+        storage = storage or self.storage
+        if storage not in self.STORAGES:
+            raise ValueError(f"Unknown FAISS storage '{storage}', expected one of {self.STORAGES}")
+        codec = self._SQ_CODECS.get(storage, "Flat")
+        
+        # Flat and HNSW have no ids of their own; IDMap2 lets vectors keep
+        # stable ids across incremental updates (IVF supports ids natively)
+        if index_type == "flat":
+            if storage == "float32":
+                return faiss.IndexIDMap2(faiss.IndexFlatL2(d))
+            index = faiss.index_factory(d, codec)
+            # Per-dimension value ranges of the quantizer
+            index.train(self._training_set(embeddings, 100000))
+            return faiss.IndexIDMap2(index)
+        
+        if index_type == "hnsw":
+            index = faiss.index_factory(d, f"HNSW{int(os.getenv('FAISS_HNSW_M', 32))},{codec}")
+            index.hnsw.efConstruction = int(os.getenv("FAISS_EF_CONSTRUCTION", 80))
+            if storage != "float32":
+                index.train(self._training_set(embeddings, 100000))
+            return faiss.IndexIDMap2(index)
+        
+        # IVF variants: ~4*sqrt(n) lists, but at least 39 training points per list
+        nlist = int(os.getenv("FAISS_NLIST", 0)) or int(4 * np.sqrt(n))
+        nlist = max(1, min(nlist, n // 39))
+        
+        if index_type == "ivf_pq":
+            if storage != "float32":
+                print(f"⚠️  FAISS_STORAGE={storage} is ignored for ivf_pq (vectors are PQ codes)")
+            if n < 256:
+                print(f"⚠️  {n} vectors are too few to train PQ codebooks, using ivf_flat")
+                index_type = "ivf_flat"
+            else:
+                # ~16 dimensions per one-byte code; m must divide d
+                pq_m = int(os.getenv("FAISS_PQ_M", 0)) or max(1, d // 16)
+                while d % pq_m:
+                    pq_m -= 1
+        
+        if index_type == "ivf_flat":
+            index = faiss.index_factory(d, f"IVF{nlist},{codec}")
+        else:
+            index = faiss.index_factory(d, f"IVF{nlist},PQ{pq_m}")
+        
+        training_set = self._training_set(embeddings, max(100 * nlist, 10000))
+        print(f"🎯 Training {index_type} index (nlist={nlist}) on {len(training_set)} vectors...")
+        index.train(training_set)
+        return index
+    
+    def _search_params(self, nprobe: int = None, ef_search: int = None):
+        """Per-call FAISS search parameters (thread-safe alternative to mutating the index)"""
+        if self.index is None:
+            return None
+        try:
+            faiss.extract_index_ivf(self.index)
+            return faiss.SearchParametersIVF(nprobe=nprobe or self.nprobe)
+        except RuntimeError:
+            pass
+        if isinstance(self._base_index(), faiss.IndexHNSW):
+            return faiss.SearchParametersHNSW(efSearch=ef_search or self.ef_search)
+        return None
+    
+    def build_index(self, embeddings: np.ndarray, metadata: List[Dict], index_type: str = None):
+        """
+        Build FAISS index from embeddings.
+        
+        Vectors are truncated to EMBEDDING_DIMENSIONS and stored as
+        FAISS_STORAGE; with FAISS_REFINE_FACTOR the full-precision rows are
+        kept (and saved) for reranking.
+        
+        Args:
+            embeddings: (n, dim) embedding matrix
+            metadata: One dict per row of embeddings (or a ChunkMetadata)
+            index_type: flat | ivf_flat | ivf_pq | hnsw (default: FAISS_INDEX_TYPE or flat)
+        """
+        full = np.ascontiguousarray(embeddings, dtype='float32')
+        embeddings = truncate_embeddings(full, self.dimensions)
+        self.full_vectors = full if self.refine_factor > 0 else None
         
-    def build_index(self, embeddings: np.ndarray, metadata: List[Dict]):
-        """Build FAISS index from embeddings"""
         # Auto-detect embedding dimension
         if embeddings.shape[1] != self.embedding_dim:
             self.embedding_dim = embeddings.shape[1]
             print(f"📐 Auto-detected embedding dimension: {self.embedding_dim}")
         
-        self.metadata = metadata
+        self.metadata = metadata if isinstance(metadata, ChunkMetadata) else ChunkMetadata.from_rows(metadata)
+        self.read_only = False
+        
+        index_type = (index_type or os.getenv("FAISS_INDEX_TYPE", "flat")).lower()
+        if index_type not in self.INDEX_TYPES:
+            raise ValueError(f"Unknown FAISS index type '{index_type}', expected one of {self.INDEX_TYPES}")
+        
+        # Create FAISS index (L2 distance); ids are positions in self.metadata
+        self.index = self._create_index(embeddings, index_type)
+        self.index.add_with_ids(embeddings, np.arange(len(embeddings), dtype='int64'))
+        self.version = hashlib.sha256(np.ascontiguousarray(embeddings, dtype='float32').tobytes()).hexdigest()[:16]
+        
+        print(f"✅ FAISS index built with {self.index.ntotal} vectors ({type(self.index).__name__}, "
+              f"dim={self.embedding_dim}, {self.storage if index_type != 'ivf_pq' else 'pq'})")
+        self.build_sparse_index()
+    
+    def build_index_streaming(self, batches: Iterable[Tuple[np.ndarray, List[Dict]]],
+                              index_type: str = None, workdir: str = None) -> int:
+        """
+        Build the index build_index would, from (embeddings, metadata rows)
+        batches, without holding the corpus in memory.
+        
+        Rows go to an append-only metadata file. Flat and HNSW float32
+        indexes add each batch as it arrives. Index types trained on a
+        sample of the whole corpus (IVF, fp16 / sq8) first append the
+        vectors to a file, then train and fill from it memory-mapped. With
+        FAISS_REFINE_FACTOR the full vectors are kept in a file as well.
+        
+        Args:
+            batches: (embeddings, rows) pairs, e.g. a streaming Stage
+            index_type: flat | ivf_flat | ivf_pq | hnsw (default: FAISS_INDEX_TYPE or flat)
+            workdir: Directory for the build files (default: a temporary
+                directory under ./vectorstore/, removed once publish() has
+                copied the store out of it, or with this store)
+        
+        Returns:
+            Number of vectors indexed
+        """
+        index_type = (index_type or os.getenv("FAISS_INDEX_TYPE", "flat")).lower()
+        if index_type not in self.INDEX_TYPES:
+            raise ValueError(f"Unknown FAISS index type '{index_type}', expected one of {self.INDEX_TYPES}")
+        if self.storage not in self.STORAGES:
+            raise ValueError(f"Unknown FAISS storage '{self.storage}', expected one of {self.STORAGES}")
+        if workdir is None:
+            os.makedirs(VECTORSTORE_DIR, exist_ok=True)
+            workdir = tempfile.mkdtemp(prefix=".build-", dir=VECTORSTORE_DIR)
+            # The metadata and vectors stay memory-mapped from here until publish()
+            self._build_dir = weakref.finalize(self, shutil.rmtree, workdir, True)
+        trained = index_type not in ("flat", "hnsw") or self.storage != "float32"
+        
+        writer = ChunkMetadataWriter(os.path.join(workdir, METADATA_FILE))
+        spill_path = os.path.join(workdir, "index_vectors.f32")
+        full_path = os.path.join(workdir, "full_vectors.f32")
+        spill = full = None
+        digest = hashlib.sha256()
+        n, dim, full_dim = 0, None, None
+        self.index = None
+        self.read_only = False
+        try:
+            for embeddings, rows in batches:
+                full_batch = np.ascontiguousarray(embeddings, dtype='float32')
+                vectors = np.ascontiguousarray(truncate_embeddings(full_batch, self.dimensions))
+                if dim is None:
+                    dim, full_dim = vectors.shape[1], full_batch.shape[1]
+                    spill = open(spill_path, 'wb') if trained else None
+                    # Untruncated vectors of a trained index are already in the spill file
+                    if self.refine_factor > 0 and not (trained and dim == full_dim):
+                        full = open(full_path, 'wb')
+                elif full_batch.shape[1] != full_dim:
+                    raise ValueError(f"Embedding dimension changed mid-build ({full_dim} -> {full_batch.shape[1]})")
+                
+                digest.update(vectors.tobytes())
+                if trained:
+                    spill.write(vectors.tobytes())
+                else:
+                    if self.index is None:
+                        self.index = self._create_index(vectors, index_type)
+                    self.index.add_with_ids(vectors, np.arange(n, n + len(vectors), dtype='int64'))
+                if full is not None:
+                    full.write(full_batch.tobytes())
+                writer.append(rows)
+                n += len(vectors)
+        except BaseException:
+            writer.abort()
+            for f in (spill, full):
+                if f is not None:
+                    f.close()
+            self._release_build_dir()
+            raise
+        for f in (spill, full):
+            if f is not None:
+                f.close()
+        if n == 0:
+            writer.abort()
+            self._release_build_dir()
+            return 0
+        
+        self.metadata = writer.close()
+        if trained:
+            stored = np.memmap(spill_path, dtype='float32', mode='r', shape=(n, dim))
+            self.index = self._create_index(stored, index_type)
+            # Unmapped after training: only the training sample and one read block are ever in memory
+            del stored
+            block_rows = max(1, SPILL_READ_BLOCK // (dim * 4))
+            with open(spill_path, 'rb') as f:
+                for start in range(0, n, block_rows):
+                    block = np.fromfile(f, dtype='float32', count=block_rows * dim).reshape(-1, dim)
+                    self.index.add_with_ids(block, np.arange(start, start + len(block), dtype='int64'))
+        if self.refine_factor > 0:
+            self.full_vectors = np.memmap(full_path if full is not None else spill_path,
+                                          dtype='float32', mode='r', shape=(n, full_dim))
+        else:
+            self.full_vectors = None
         
-        # Create FAISS index (L2 distance)
-        self.index = faiss.IndexFlatL2(self.embedding_dim)
-        self.index.add(embeddings.astype('float32'))
+        if dim != self.embedding_dim:
+            self.embedding_dim = dim
+            print(f"📐 Auto-detected embedding dimension: {self.embedding_dim}")
+        self.version = digest.hexdigest()[:16]
+        print(f"✅ FAISS index built with {self.index.ntotal} vectors ({type(self.index).__name__}, "
+              f"dim={self.embedding_dim}, {self.storage if index_type != 'ivf_pq' else 'pq'}, streamed)")
+        self.build_sparse_index()
+        return n
+    
+    def _release_build_dir(self, store_dir: str = None):
+        """
+        Remove build_index_streaming's temporary directory. With store_dir
+        (a saved copy of this store) the metadata and full vectors are
+        remapped from there first.
+        """
+        if self._build_dir is None:
+            return
+        if store_dir is not None:
+            self.metadata = ChunkMetadata.load(os.path.join(store_dir, METADATA_FILE), mmap=True)
+            if self.full_vectors is not None:
+                self.full_vectors = np.load(os.path.join(store_dir, FULL_VECTORS_FILE), mmap_mode='r')
+        self._build_dir()
+        self._build_dir = None
+    
+    def build_sparse_index(self):
+        """(Re)build the BM25 index from the metadata texts; removed rows never match"""
+        start = time.time()
+        self.sparse_index = BM25Index.build(
+            self.metadata.text(i) if self.metadata.source_ids[i] >= 0 else None
+            for i in range(len(self.metadata))
+        )
+        print(f"✅ BM25 index built: {len(self.sparse_index.terms)} terms, "
+              f"{len(self.sparse_index.doc_ids)} postings ({time.time() - start:.1f}s)")
+    
+    def _base_index(self) -> "faiss.Index":
+        """The loaded index without its IDMap wrapper (if any)"""
+        if isinstance(self.index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+            return faiss.downcast_index(self.index.index)
+        return self.index
+    
+    def index_type(self) -> str:
+        """INDEX_TYPES name of the loaded index"""
+        index = self._base_index()
+        if isinstance(index, faiss.IndexHNSW):
+            return "hnsw"
+        try:
+            ivf = faiss.downcast_index(faiss.extract_index_ivf(index))
+        except RuntimeError:
+            return "flat"
+        return "ivf_pq" if isinstance(ivf, faiss.IndexIVFPQ) else "ivf_flat"
+    
+    def vector_storage(self) -> str:
+        """STORAGES name of the loaded index's vectors (float32 for ivf_pq)"""
+        index = self._base_index()
+        if isinstance(index, faiss.IndexHNSW):
+            index = faiss.downcast_index(index.storage)
+        else:
+            try:
+                index = faiss.downcast_index(faiss.extract_index_ivf(index))
+            except RuntimeError:
+                pass
+        if not hasattr(index, "sq"):
+            return "float32"
+        return {faiss.ScalarQuantizer.QT_fp16: "fp16", faiss.ScalarQuantizer.QT_8bit: "sq8"}.get(index.sq.qtype,
+                                                                                                 "float32")
+    
+    def stored_vectors(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(ids, vectors) currently in an id-mapped flat/HNSW index"""
+        ids = faiss.vector_to_array(self.index.id_map).astype('int64')
+        return ids, self.index.index.reconstruct_n(0, self.index.ntotal)
+    
+    def _check_writable(self):
+        # Mutating a memory-mapped FAISS index aborts the process
+        if self.read_only:
+            raise ValueError("Vector store is memory-mapped (read-only); load it with mmap=False to modify it")
+    
+    def add(self, embeddings: np.ndarray, metadata: List[Dict]) -> List[int]:
+        """
+        Append vectors to the loaded index under fresh ids.
         
-        print(f"✅ FAISS index built with {self.index.ntotal} vectors")
+        Returns:
+            The ids (metadata positions) assigned to the new rows
+        """
+        self._check_writable()
+        start = len(self.metadata)
+        ids = np.arange(start, start + len(embeddings), dtype='int64')
+        if len(embeddings):
+            full = np.ascontiguousarray(embeddings, dtype='float32')
+            self.index.add_with_ids(truncate_embeddings(full, self.index.d), ids)
+            if self.full_vectors is not None:
+                self.full_vectors = np.concatenate([self.full_vectors, full])
+        self.metadata.append(metadata)
+        # Stale until save() rebuilds it
+        self.sparse_index = None
+        return ids.tolist()
+    
+    def remove(self, ids: List[int]):
+        """
+        Drop vectors by id. Their metadata slots become None so the
+        remaining ids (and their metadata positions) stay valid.
+        """
+        if not ids:
+            return
+        self._check_writable()
+        remove_ids = np.asarray(ids, dtype='int64')
+        try:
+            self.index.remove_ids(remove_ids)
+        except RuntimeError:
+            # HNSW graphs cannot delete nodes: rebuild from the stored vectors
+            index_type, storage = self.index_type(), self.vector_storage()
+            stored_ids, vectors = self.stored_vectors()
+            keep = ~np.isin(stored_ids, remove_ids)
+            self.index = self._create_index(vectors[keep], index_type, storage)
+            self.index.add_with_ids(vectors[keep], stored_ids[keep])
+        self.metadata.drop(ids)
+        self.sparse_index = None
     
     def save(self, index_path: str = "./vectorstore/faiss.index", 
-             metadata_path: str = "./vectorstore/metadata.pkl"):
-        """Save index and metadata to ./vectorstore/"""
+             metadata_path: str = "./vectorstore/metadata.bin"):
+        """
+        Save index, metadata (ChunkMetadata binary format) and BM25 index,
+        overwriting the files in place. Use publish() for a store that
+        running servers may be loading.
+        """
         os.makedirs(os.path.dirname(index_path), exist_ok=True)
         
         faiss.write_index(self.index, index_path)
-        with open(metadata_path, 'wb') as f:
-            pickle.dump(self.metadata, f)
+        self.metadata.save(metadata_path)
+        if self.sparse_index is None:
+            self.build_sparse_index()
+        self.sparse_index.save(os.path.join(os.path.dirname(index_path), SPARSE_INDEX_FILE))
+        vectors_path = os.path.join(os.path.dirname(index_path), FULL_VECTORS_FILE)
+        if self.full_vectors is not None:
+            # Replaced, not rewritten: processes mapping the old file keep their pages
+            with open(vectors_path + ".tmp", 'wb') as f:
+                np.save(f, self.full_vectors)
+            os.replace(vectors_path + ".tmp", vectors_path)
+        elif os.path.exists(vectors_path):
+            os.remove(vectors_path)
+        legacy_path = os.path.join(os.path.dirname(metadata_path), LEGACY_METADATA_FILE)
+        if os.path.exists(legacy_path):
+            os.remove(legacy_path)
+        self.version = content_hash(index_path, metadata_path)
+        _write_store_info(self.version, index_path, metadata_path)
         
         print(f"💾 Vector store saved to {index_path}")
         print(f"💾 Metadata saved to {metadata_path}")
     
-    def load(self, index_path: str = "./vectorstore/faiss.index",
-             metadata_path: str = "./vectorstore/metadata.pkl") -> bool:
-        """Load index and metadata from disk"""
+    def publish(self, root: str = VECTORSTORE_DIR, keep: int = None) -> str:
+        """
+        Save to a new version directory and atomically make it CURRENT.
+        
+        The files are written to a temporary directory under versions/,
+        flushed, and renamed to versions/<version>; only then is CURRENT
+        replaced. Readers therefore see either the old or the new store,
+        never a partially written one.
+        
+        Args:
+            keep: Published versions to retain (default: VECTORSTORE_KEEP_VERSIONS)
+        
+        Returns:
+            The published version directory
+        """
+        versions_dir = os.path.join(root, VERSIONS_DIR)
+        os.makedirs(versions_dir, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=".staging-", dir=versions_dir)
         try:
+            self.save(os.path.join(staging, INDEX_FILE), os.path.join(staging, METADATA_FILE))
+            for name in os.listdir(staging):
+                _fsync(os.path.join(staging, name))
+            store_dir = os.path.join(versions_dir, self.version)
+            if os.path.isdir(store_dir):
+                # Identical content was published before
+                shutil.rmtree(staging)
+            else:
+                os.rename(staging, store_dir)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        _fsync(versions_dir)
+        self._release_build_dir(store_dir)
+        
+        pointer = os.path.join(root, f".{CURRENT_FILE}.tmp")
+        with open(pointer, 'w') as f:
+            f.write(self.version + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(pointer, os.path.join(root, CURRENT_FILE))
+        _fsync(root)
+        print(f"📦 Published vector store version {self.version}")
+        
+        _prune_versions(root, keep if keep is not None else int(os.getenv("VECTORSTORE_KEEP_VERSIONS", 3)))
+        return store_dir
+    
+    def load(self, index_path: str = None, metadata_path: str = None, mmap: bool = None) -> bool:
+        """
+        Load index and metadata from disk (default: the published CURRENT
+        version under ./vectorstore/).
+        
+        Args:
+            mmap: Memory-map the index and metadata instead of reading them
+                into RAM (default: VECTORSTORE_MMAP). Pages are shared between
+                worker processes, but the store becomes read-only.
+        """
+        if index_path is None or metadata_path is None:
+            store_dir = current_store_dir()
+            index_path = index_path or os.path.join(store_dir, INDEX_FILE)
+            metadata_path = metadata_path or os.path.join(store_dir, METADATA_FILE)
+        try:
+            legacy_path = os.path.join(os.path.dirname(metadata_path), LEGACY_METADATA_FILE)
+            if not os.path.exists(metadata_path) and os.path.exists(legacy_path):
+                metadata_path = legacy_path
             if not os.path.exists(index_path) or not os.path.exists(metadata_path):
                 print(f"⚠️  Vector store not found at {index_path}")
                 return False
             
-            self.index = faiss.read_index(index_path)
-            with open(metadata_path, 'rb') as f:
-                self.metadata = pickle.load(f)
+            if mmap is None:
+                mmap = os.getenv("VECTORSTORE_MMAP", "true").lower() == "true"
+            
+            self.index = faiss.read_index(index_path, MMAP_IO_FLAGS if mmap else 0)
+            if metadata_path == legacy_path:
+                print(f"⚠️  Loading legacy pickled metadata from {legacy_path}; "
+                      f"run ingest.py --full to convert it")
+                with open(legacy_path, 'rb') as f:
+                    self.metadata = ChunkMetadata.from_rows(pickle.load(f))
+            else:
+                self.metadata = ChunkMetadata.load(metadata_path, mmap=mmap)
+            self.read_only = mmap
+            
+            sparse_path = os.path.join(os.path.dirname(index_path), SPARSE_INDEX_FILE)
+            if os.path.exists(sparse_path):
+                self.sparse_index = BM25Index.load(sparse_path, mmap=mmap)
+            else:
+                self.sparse_index = None
+                if self.retrieval_mode == "hybrid":
+                    print(f"⚠️  No BM25 index at {sparse_path}; searching vectors only "
+                          f"(run ingest.py to build it)")
+            
+            vectors_path = os.path.join(os.path.dirname(index_path), FULL_VECTORS_FILE)
+            if self.refine_factor > 0 and os.path.exists(vectors_path):
+                self.full_vectors = np.load(vectors_path, mmap_mode='r')
+            else:
+                self.full_vectors = None
             
             # Detect embedding dimension from loaded index
             self.embedding_dim = self.index.d
+            self.version = _read_store_version(index_path, metadata_path) or content_hash(index_path, metadata_path)
             
-            print(f"✅ Vector store loaded: {self.index.ntotal} vectors, dim={self.embedding_dim}")
+            print(f"✅ Vector store loaded: {self.index.ntotal} vectors, dim={self.embedding_dim}, "
+                  f"{self.vector_storage()}{' (memory-mapped)' if mmap else ''}"
+                  f"{', refined against full vectors' if self.full_vectors is not None else ''}")
             return True
             
         except Exception as e:
             print(f"❌ Error loading vector store: {e}")
             return False
     
-    def search(self, query: str, k: int = 5) -> List[Dict]:
-        """Search for similar chunks using FAISS"""
-        if self.index is None:
-            print("⚠️  Index not loaded")
-            return []
-        
-        # Initialize processor if not already done
+    def _get_processor(self) -> "DocumentProcessor":
+        """Lazily create the processor that owns the embedding models"""
         if self.processor is None:
             self.processor = DocumentProcessor()
-        
-        # Create query embedding
+        return self.processor
+    
+    def _uses_openai(self) -> bool:
+        processor = self._get_processor()
+        return bool(processor.openai_api_key) and not getattr(processor, 'use_fallback', False)
+    
+    def _fallback_fits_index(self) -> bool:
+        """
+        Whether local-model query vectors can search this index: always when
+        the store was built with that model (no OpenAI key), otherwise only
+        if the widths match. A query without a usable vector is ranked by
+        BM25 alone in search_hybrid.
+        """
+        if self.index is None or not self._uses_openai():
+            return True
+        dim = self.full_vectors.shape[1] if self.full_vectors is not None else self.index.d
+        return dim == FALLBACK_EMBEDDING_DIM
+    
+    def _count_fallback(self):
+        FALLBACKS.inc(reason="local_embedding" if self._fallback_fits_index() else "no_query_vector")
+    
+    def _encode_fallback(self, query: str) -> np.ndarray:
+        """Encode a query with the local sentence-transformers model"""
+        processor = self._get_processor()
+        if processor.fallback_model is None:
+            processor.fallback_model = get_sentence_transformer(FALLBACK_EMBEDDING_MODEL)
+        return np.asarray(processor.fallback_model.encode([query]), dtype='float32')
+    
+    def _encode_fallback_cached(self, query: str) -> np.ndarray:
+        cached = self.embedding_cache.get(query, FALLBACK_EMBEDDING_MODEL)
+        if cached is not None:
+            return cached
+        embedding = self._encode_fallback(query)
+        self.embedding_cache.put(query, FALLBACK_EMBEDDING_MODEL, embedding)
+        return embedding
+    
+    def _openai_embed(self, texts: List[str]):
+        """
+        OpenAI embedding call for queries, behind the embedding circuit breaker
+        and bounded by the request deadline (any failure means local fallback)
+        """
+        with guard(get_breaker("embedding", slow_call_s=5), timeout_for(self.embedding_timeout)) as timeout:
+            return openai.Embedding.create(model=OPENAI_EMBEDDING_MODEL, input=texts, request_timeout=timeout)
+    
+    async def _aopenai_embed(self, texts: List[str]):
+        """Async variant of _openai_embed"""
+        with guard(get_breaker("embedding", slow_call_s=5), timeout_for(self.embedding_timeout)) as timeout:
+            return await asyncio.wait_for(
+                openai.Embedding.acreate(model=OPENAI_EMBEDDING_MODEL, input=texts, request_timeout=timeout),
+                timeout
+            )
+    
+    def embed_query(self, query: str) -> Optional[np.ndarray]:
+        """Create the (1, dim) float32 embedding for a query string (None: search by BM25 only)"""
         try:
-            if self.processor.openai_api_key and not getattr(self.processor, 'use_fallback', False):
+            if self._uses_openai():
+                cached = self.embedding_cache.get(query, OPENAI_EMBEDDING_MODEL)
+                if cached is not None:
+                    return cached
                 # Use OpenAI
-                response = openai.Embedding.create(
-                    model="text-embedding-3-large",
-                    input=[query]
-                )
-                query_embedding = np.array([response['data'][0]['embedding']])
-            else:
-                # Use fallback
-                query_embedding = self.processor.fallback_model.encode([query])
-        except:
-            # Fallback
-            if not hasattr(self.processor, 'fallback_model'):
-                from sentence_transformers import SentenceTransformer
-                self.processor.fallback_model = SentenceTransformer('all-MiniLM-L6-v2')
-            query_embedding = self.processor.fallback_model.encode([query])
+                response = self._openai_embed([query])
+                embedding = np.array([response['data'][0]['embedding']], dtype='float32')
+                self.embedding_cache.put(query, OPENAI_EMBEDDING_MODEL, embedding)
+                return embedding
+        except Exception:
+            self._count_fallback()
+        # Use fallback
+        if not self._fallback_fits_index():
+            return None
+        return self._encode_fallback_cached(query)
+    
+    async def aembed_query(self, query: str, executor=None) -> Optional[np.ndarray]:
+        """
+        Async variant of embed_query.
+        
+        The OpenAI call is awaited natively; the CPU-bound sentence-transformers
+        encode and the embedding cache's disk tier run on the given executor
+        so the event loop stays free.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            if self._uses_openai():
+                cached = (await self.embedding_cache.aget_many([query], OPENAI_EMBEDDING_MODEL, executor))[0]
+                if cached is not None:
+                    return cached
+                response = await self._aopenai_embed([query])
+                embedding = np.array([response['data'][0]['embedding']], dtype='float32')
+                await self.embedding_cache.aput_many([query], OPENAI_EMBEDDING_MODEL, [embedding], executor)
+                return embedding
+        except Exception:
+            self._count_fallback()
+        if not self._fallback_fits_index():
+            return None
+        return await loop.run_in_executor(executor, self._encode_fallback_cached, query)
+    
+    def _cached_rows(self, queries: List[str], model: str) -> Tuple[List[Optional[np.ndarray]], List[str]]:
+        """Per-query cached embeddings (None on a miss) and the distinct missing texts"""
+        rows = [self.embedding_cache.get(query, model) for query in queries]
+        missing = list(dict.fromkeys(query for query, row in zip(queries, rows) if row is None))
+        return rows, missing
+    
+    def _fill_rows(self, queries: List[str], model: str, rows: List[Optional[np.ndarray]],
+                   missing: List[str], vectors: np.ndarray) -> np.ndarray:
+        """Cache freshly embedded queries and stack all rows into an (n, dim) matrix"""
+        fresh = {}
+        for query, vector in zip(missing, vectors):
+            fresh[query] = vector[None, :]
+            self.embedding_cache.put(query, model, fresh[query])
+        return np.vstack([row if row is not None else fresh[query] for query, row in zip(queries, rows)])
+    
+    async def _acached_rows(self, queries: List[str], model: str,
+                            executor=None) -> Tuple[List[Optional[np.ndarray]], List[str]]:
+        """_cached_rows with the cache's disk tier read on the executor"""
+        rows = await self.embedding_cache.aget_many(queries, model, executor)
+        missing = list(dict.fromkeys(query for query, row in zip(queries, rows) if row is None))
+        return rows, missing
+    
+    async def _afill_rows(self, queries: List[str], model: str, rows: List[Optional[np.ndarray]],
+                          missing: List[str], vectors: np.ndarray, executor=None) -> np.ndarray:
+        """_fill_rows with the cache's disk tier written on the executor"""
+        fresh = {query: vector[None, :] for query, vector in zip(missing, vectors)}
+        await self.embedding_cache.aput_many(list(fresh), model, list(fresh.values()), executor)
+        return np.vstack([row if row is not None else fresh[query] for query, row in zip(queries, rows)])
+    
+    @staticmethod
+    def _response_matrix(response) -> np.ndarray:
+        data = sorted(response['data'], key=lambda item: item['index'])
+        return np.array([item['embedding'] for item in data], dtype='float32')
+    
+    def _encode_fallback_batch_cached(self, queries: List[str]) -> np.ndarray:
+        rows, missing = self._cached_rows(queries, FALLBACK_EMBEDDING_MODEL)
+        vectors = []
+        if missing:
+            processor = self._get_processor()
+            if processor.fallback_model is None:
+                processor.fallback_model = get_sentence_transformer(FALLBACK_EMBEDDING_MODEL)
+            vectors = np.asarray(processor.fallback_model.encode(missing), dtype='float32')
+        return self._fill_rows(queries, FALLBACK_EMBEDDING_MODEL, rows, missing, vectors)
+    
+    def embed_queries(self, queries: List[str]) -> Optional[np.ndarray]:
+        """
+        Create the (n, dim) float32 embeddings for several queries.
+        Cache misses are embedded together in a single provider call.
+        None when no usable embedding is available (search by BM25 only).
+        """
+        try:
+            if self._uses_openai():
+                rows, missing = self._cached_rows(queries, OPENAI_EMBEDDING_MODEL)
+                vectors = []
+                if missing:
+                    response = self._openai_embed(missing)
+                    vectors = self._response_matrix(response)
+                return self._fill_rows(queries, OPENAI_EMBEDDING_MODEL, rows, missing, vectors)
+        except Exception:
+            self._count_fallback()
+        if not self._fallback_fits_index():
+            return None
+        return self._encode_fallback_batch_cached(queries)
+    
+    async def aembed_queries(self, queries: List[str], executor=None) -> Optional[np.ndarray]:
+        """Async variant of embed_queries (fallback encode and cache disk I/O run on the executor)"""
+        loop = asyncio.get_running_loop()
+        try:
+            if self._uses_openai():
+                rows, missing = await self._acached_rows(queries, OPENAI_EMBEDDING_MODEL, executor)
+                vectors = []
+                if missing:
+                    response = await self._aopenai_embed(missing)
+                    vectors = self._response_matrix(response)
+                return await self._afill_rows(queries, OPENAI_EMBEDDING_MODEL, rows, missing, vectors, executor)
+        except Exception:
+            self._count_fallback()
+        if not self._fallback_fits_index():
+            return None
+        return await loop.run_in_executor(executor, self._encode_fallback_batch_cached, queries)
+    
+    def _search_ids(self, query_embeddings: np.ndarray, k: int,
+                    nprobe: int = None, ef_search: int = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (distances, ids) of one multi-row FAISS search. Queries are truncated
+        to the index dimension; with full vectors kept, refine_factor * k
+        candidates are reranked by exact full-dimension distance.
+        """
+        queries = np.ascontiguousarray(query_embeddings, dtype='float32')
+        params = self._search_params(nprobe, ef_search)
+        refine = (self.full_vectors is not None and self.refine_factor > 0
+                  and queries.shape[1] == self.full_vectors.shape[1])
+        if not refine:
+            return self.index.search(truncate_embeddings(queries, self.index.d), k, params=params)
+        
+        _, candidates = self.index.search(truncate_embeddings(queries, self.index.d),
+                                          k * self.refine_factor, params=params)
+        distances = np.full((len(queries), k), np.finfo('float32').max, dtype='float32')
+        ids = np.full((len(queries), k), -1, dtype='int64')
+        for row, (query, row_ids) in enumerate(zip(queries, candidates)):
+            # Sorted ids read the memory-mapped rows in file order
+            row_ids = np.sort(row_ids[(row_ids >= 0) & (row_ids < len(self.full_vectors))])
+            exact = ((np.asarray(self.full_vectors[row_ids]) - query) ** 2).sum(axis=1)
+            order = np.argsort(exact)[:k]
+            distances[row, :len(order)] = exact[order]
+            ids[row, :len(order)] = row_ids[order]
+        return distances, ids
+    
+    def _result(self, idx: int, **scores) -> Optional[Dict]:
+        """Metadata row for a hit plus its scores (None for removed / unknown ids)"""
+        row = self.metadata[idx] if 0 <= idx < len(self.metadata) else None
+        if row is None:
+            return None
+        result = dict(row)
+        result.update(scores)
+        return result
+    
+    def search_by_embeddings(self, query_embeddings: np.ndarray, k: int = 5,
+                             nprobe: int = None, ef_search: int = None) -> List[List[Dict]]:
+        """
+        Search for similar chunks for every row of an (n, dim) query matrix
+        in one FAISS call. Returns one result list per row.
+        """
+        if self.index is None:
+            print("⚠️  Index not loaded")
+            return [[] for _ in range(len(query_embeddings))]
         
         # Search in FAISS
-        distances, indices = self.index.search(query_embedding.astype('float32'), k)
+        distances, indices = self._search_ids(query_embeddings, k, nprobe, ef_search)
         
         # Get results with metadata
-        results = []
-        for i, idx in enumerate(indices[0]):
-            if idx < len(self.metadata):
-                result = self.metadata[idx].copy()
-                result['distance'] = float(distances[0][i])
-                result['relevance_score'] = 1 / (1 + result['distance'])
-                results.append(result)
+        batch = []
+        for row_distances, row_indices in zip(distances, indices):
+            results = []
+            for distance, idx in zip(row_distances, row_indices):
+                result = self._result(idx, distance=float(distance), relevance_score=1 / (1 + float(distance)))
+                if result is not None:
+                    results.append(result)
+            batch.append(results)
+        
+        return batch
+    
+    def _hybrid_enabled(self) -> bool:
+        return self.retrieval_mode == "hybrid" and self.sparse_index is not None
+    
+    def search_hybrid(self, queries: List[str], query_embeddings: Optional[np.ndarray],
+                      k: int = 5) -> List[List[Dict]]:
+        """
+        Fuse BM25 and vector rankings with reciprocal rank fusion.
+        
+        Both sides fetch max(k, HYBRID_CANDIDATES) candidates; results carry
+        'distance' / 'bm25_score' (None when only the other side found the
+        chunk) and the fused 'relevance_score'. Falls back to vector search
+        when there is no BM25 index or RETRIEVAL_MODE=dense, and to BM25
+        alone when query_embeddings is None (no usable query embedding).
+        """
+        if not self._hybrid_enabled():
+            if query_embeddings is None:
+                return [[] for _ in queries]
+            return self.search_by_embeddings(query_embeddings, k)
+        
+        n = max(k, self.hybrid_candidates)
+        if query_embeddings is None:
+            distances = indices = np.empty((len(queries), 0))
+        else:
+            distances, indices = self._search_ids(query_embeddings, n)
+        batch = []
+        for query, row_distances, row_indices in zip(queries, distances, indices):
+            dense = {int(idx): float(distance) for distance, idx in zip(row_distances, row_indices) if idx >= 0}
+            sparse_ids, sparse_scores = self.sparse_index.search(query, n)
+            sparse = dict(zip(sparse_ids.tolist(), sparse_scores.tolist()))
+            
+            results = []
+            for idx, score in reciprocal_rank_fusion([list(dense), list(sparse)], self.rrf_k):
+                result = self._result(idx, distance=dense.get(idx), bm25_score=sparse.get(idx),
+                                      relevance_score=score)
+                if result is not None:
+                    results.append(result)
+                    if len(results) == k:
+                        break
+            batch.append(results)
+        return batch
+    
+    def search_by_embedding(self, query_embedding: np.ndarray, k: int = 5,
+                            nprobe: int = None, ef_search: int = None) -> List[Dict]:
+        """
+        Search for similar chunks using a precomputed query embedding.
+        nprobe / ef_search override the store defaults for IVF / HNSW indexes.
+        """
+        if self.index is None:
+            print("⚠️  Index not loaded")
+            return []
+        return self.search_by_embeddings(query_embedding, k, nprobe, ef_search)[0]
+    
+    def search(self, query: str, k: int = 5, query_embedding: np.ndarray = None) -> List[Dict]:
+        """Search for similar chunks using FAISS (query_embedding skips embedding the query)"""
+        if self.index is None:
+            print("⚠️  Index not loaded")
+            return []
+        
+        # Create query embedding
+        if query_embedding is None:
+            with timed("embed"):
+                query_embedding = self.embed_query(query)
+        
+        with timed("search"):
+            return self.search_hybrid([query], query_embedding, k)[0]
+    
+    async def asearch(self, query: str, k: int = 5, executor=None, query_embedding: np.ndarray = None) -> List[Dict]:
+        """Async search: awaits the embedding, runs the FAISS scan on the executor"""
+        if self.index is None:
+            print("⚠️  Index not loaded")
+            return []
         
-        return results
+        if query_embedding is None:
+            with timed("embed"):
+                query_embedding = await self.aembed_query(query, executor=executor)
+        loop = asyncio.get_running_loop()
+        # Includes the wait for a free executor thread, which the request pays too
+        with timed("search"):
+            results = await loop.run_in_executor(executor, self.search_hybrid, [query], query_embedding, k)
+        return results[0]
+    
+    def search_batch(self, queries: List[str], k: int = 5) -> List[List[Dict]]:
+        """Search for many queries: one batched embedding call, one multi-row FAISS search"""
+        if self.index is None:
+            print("⚠️  Index not loaded")
+            return [[] for _ in queries]
+        if not queries:
+            return []
+        with timed("embed"):
+            query_embeddings = self.embed_queries(queries)
+        with timed("search"):
+            return self.search_hybrid(queries, query_embeddings, k)
+    
+    async def asearch_batch(self, queries: List[str], k: int = 5, executor=None,
+                            query_embeddings: np.ndarray = None) -> List[List[Dict]]:
+        """Async search_batch: awaits the embeddings, runs the FAISS scan on the executor"""
+        if self.index is None:
+            print("⚠️  Index not loaded")
+            return [[] for _ in queries]
+        if not queries:
+            return []
+        
+        if query_embeddings is None:
+            with timed("embed"):
+                query_embeddings = await self.aembed_queries(queries, executor=executor)
+        loop = asyncio.get_running_loop()
+        with timed("search"):
+            return await loop.run_in_executor(executor, self.search_hybrid, queries, query_embeddings, k)
 
 
-def build_vector_store(pdf_dir: str = "./pdfs/"):
+MANIFEST_PATH = "./vectorstore/manifest.json"
+
+
+def load_manifest(path: str = MANIFEST_PATH) -> Optional[Dict]:
+    """Read the ingestion manifest written by the last build, if any"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_manifest(manifest: Dict, path: str = MANIFEST_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+
+def scan_pdfs(pdf_dir: str, known: Dict[str, Dict] = None) -> Dict[str, Dict]:
+    """
+    Fingerprint every PDF in pdf_dir.
+    
+    Files whose size and mtime match the previous manifest entry reuse its
+    hash, so unchanged books are not re-read.
+    """
+    known = known or {}
+    files = {}
+    for pdf_file in sorted(Path(pdf_dir).glob("*.pdf")):
+        stat = pdf_file.stat()
+        previous = known.get(pdf_file.name, {})
+        if previous.get("size") == stat.st_size and previous.get("mtime_ns") == stat.st_mtime_ns:
+            digest = previous["sha256"]
+        else:
+            digest = content_hash(str(pdf_file))
+        files[pdf_file.name] = {"sha256": digest, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    return files
+
+
+# Values of settings added after the first manifests, assumed when a manifest lacks them
+_SETTING_DEFAULTS = {"embedding_dimensions": 0, "storage": "float32", "full_vectors": False}
+
+
+def _ingest_settings(processor: DocumentProcessor) -> Dict:
+    """Build parameters that invalidate every stored vector when changed"""
+    return {
+        "chunk_size": processor.chunk_size,
+        "chunk_overlap": processor.chunk_overlap,
+        "embedding_model": processor.embedding_model,
+        "index_type": os.getenv("FAISS_INDEX_TYPE", "flat").lower(),
+        "embedding_dimensions": int(os.getenv("EMBEDDING_DIMENSIONS", 0)),
+        "storage": os.getenv("FAISS_STORAGE", "float32").lower(),
+        "full_vectors": int(os.getenv("FAISS_REFINE_FACTOR", 0)) > 0
+    }
+
+
+def _file_ids(metadata: ChunkMetadata, ids: List[int]) -> Dict[str, List[int]]:
+    """Group index ids by the source file of their metadata row"""
+    grouped = {}
+    for i in ids:
+        grouped.setdefault(metadata.source(i), []).append(i)
+    return grouped
+
+
+def _update_vector_store(processor: DocumentProcessor, pdf_dir: str, workers: int,
+                         manifest: Dict, files: Dict[str, Dict]) -> Optional[VectorStore]:
+    """
+    Apply added / modified / deleted PDFs to the saved vector store.
+    
+    Returns:
+        The updated store, or None if a full rebuild is needed instead
+    """
+    vector_store = VectorStore()
+    if not vector_store.load(mmap=False):
+        return None
+    
+    old_files = manifest["files"]
+    changed = [name for name in files if name not in old_files or files[name]["sha256"] != old_files[name]["sha256"]]
+    deleted = [name for name in old_files if name not in files]
+    print(f"🔁 Incremental update: {len(changed)} new/modified, {len(deleted)} deleted, "
+          f"{len(files) - len(changed)} unchanged")
+    
+    # Removed chunks stay behind as dead metadata / BM25 rows (ids are row
+    # positions); past INGEST_COMPACT_RATIO of all rows a full rebuild
+    # compacts them, re-embedding only what the embedding store lacks
+    removed = [i for name in changed + deleted for i in old_files.get(name, {}).get("ids", [])]
+    slots = len(vector_store.metadata)
+    dead = int(np.count_nonzero(vector_store.metadata.source_ids < 0)) + len(removed)
+    compact_ratio = float(os.getenv("INGEST_COMPACT_RATIO", 0.25))
+    if slots and dead / slots > compact_ratio:
+        print(f"♻️  {dead}/{slots} stored chunks would be removed ones "
+              f"(> INGEST_COMPACT_RATIO={compact_ratio:g}), rebuilding from scratch to compact")
+        return None
+    
+    vector_store.remove(removed)
+    
+    chunks, metadata = processor.process_files([Path(pdf_dir) / name for name in changed], workers=workers)
+    processor.timing_report["incremental"] = {"changed": changed, "deleted": deleted}
+    
+    start = time.perf_counter()
+    ids = []
+    if chunks:
+        embeddings = np.asarray(processor.create_embeddings(chunks), dtype='float32')
+        # Wider is fine when the index keeps truncated (EMBEDDING_DIMENSIONS) vectors
+        full_dim = vector_store.full_vectors.shape[1] if vector_store.full_vectors is not None else None
+        if embeddings.shape[1] < vector_store.index.d or full_dim not in (None, embeddings.shape[1]):
+            print(f"⚠️  Embedding dimension changed ({full_dim or vector_store.index.d} -> {embeddings.shape[1]})")
+            return None
+        ids = vector_store.add(embeddings, metadata)
+    processor.timing_report["stages"]["embed_s"] = round(time.perf_counter() - start, 3)
+    slots = len(vector_store.metadata)
+    processor.timing_report["incremental"]["tombstones"] = {"dead": dead, "rows": slots}
+    if dead:
+        print(f"🪦 {dead}/{slots} stored chunks are removed ones ({dead / max(slots, 1):.0%}); "
+              f"compacted by a full rebuild past INGEST_COMPACT_RATIO={compact_ratio:g} or with --full")
+    
+    new_ids = _file_ids(vector_store.metadata, ids)
+    manifest["files"] = {
+        name: {**files[name], "ids": new_ids.get(name, []) if name in changed else old_files[name]["ids"]}
+        for name in files
+    }
+    return vector_store
+
+
+class _EmbeddingModelChanged(RuntimeError):
+    """The embedding provider failed over mid-build; earlier batches used another model"""
+
+
+def _embed_batches(processor: DocumentProcessor, batches: Iterable[List[Dict]],
+                   totals: Dict) -> Iterator[Tuple[np.ndarray, List[Dict]]]:
+    """Embedding stage: (embeddings, rows) per batch of metadata rows"""
+    model = processor.embedding_model
+    for rows in batches:
+        start = time.perf_counter()
+        embeddings = np.asarray(processor.create_embeddings([row["text"] for row in rows]), dtype='float32')
+        totals["embed_s"] += time.perf_counter() - start
+        if processor.embedding_model != model:
+            raise _EmbeddingModelChanged(f"{model} -> {processor.embedding_model}")
+        totals["batches"] += 1
+        for key in ("cached", "embedded"):
+            totals[key] += processor.embedding_stats.get(key, 0)
+        yield embeddings, rows
+
+
+def _stream_vector_store(processor: DocumentProcessor, pdf_dir: str, workers: int) -> Optional[VectorStore]:
+    """
+    Full rebuild as a pipeline: pages -> chunks -> embedding batches ->
+    index.add and the append-only metadata writer. Every stage runs in its
+    own thread behind a bounded queue, so memory does not grow with the
+    corpus (beyond the index itself and 16 bytes of metadata per chunk).
+    """
+    batch_size = int(os.getenv("INGEST_BATCH_CHUNKS", 1024))
+    queue_batches = int(os.getenv("INGEST_QUEUE_BATCHES", 2))
+    while True:
+        totals = {"embed_s": 0.0, "batches": 0, "cached": 0, "embedded": 0}
+        rows = processor.iter_documents(pdf_dir, workers=workers)
+        embedded = Stage("embeddings", _embed_batches(processor, batched(rows, batch_size), totals), queue_batches)
+        vector_store = VectorStore()
+        start = time.perf_counter()
+        try:
+            n = vector_store.build_index_streaming(embedded)
+        except _EmbeddingModelChanged as e:
+            # Every row must come from one model: start over with the fallback
+            print(f"♻️  Embedding model changed mid-build ({e}), restarting")
+            continue
+        break
+    if n == 0:
+        return None
+    
+    # Placeholder corpora (no PDFs) skip the extraction report
+    processor.timing_report = processor.timing_report or {"stages": {}, "files": []}
+    processor.timing_report["stages"]["embed_s"] = round(totals["embed_s"], 3)
+    processor.timing_report["pipeline_wall_s"] = round(time.perf_counter() - start, 3)
+    processor.timing_report.setdefault("queues", {})["embeddings"] = embedded.stats()
+    processor.embedding_stats = {"model": processor.embedding_model, "batch_chunks": batch_size,
+                                 **{key: totals[key] for key in ("batches", "cached", "embedded")}}
+    return vector_store
+
+
+def _build_in_memory(processor: DocumentProcessor, pdf_dir: str, workers: int) -> Optional[VectorStore]:
+    """Full rebuild with every chunk, row and embedding in memory at once (INGEST_STREAMING=false)"""
+    chunks, metadata = processor.process_documents(pdf_dir, workers=workers)
+    if not chunks:
+        return None
+    
+    # Create embeddings
+    start = time.perf_counter()
+    embeddings = processor.create_embeddings(chunks)
+    # Placeholder corpora (no PDFs) skip the extraction report
+    processor.timing_report = processor.timing_report or {"stages": {}, "files": []}
+    processor.timing_report["stages"]["embed_s"] = round(time.perf_counter() - start, 3)
+    
+    vector_store = VectorStore()
+    vector_store.build_index(embeddings, metadata)
+    return vector_store
+
+
+def build_vector_store(pdf_dir: str = "./pdfs/", workers: int = None,
+                       report_path: str = "./vectorstore/ingest_timing.json",
+                       full_rebuild: bool = False, manifest_path: str = MANIFEST_PATH):
     """
     Main function to build the vector store from PDFs.
     
+    When a manifest from a previous build exists and the chunking, embedding
+    and index settings are unchanged, only new or modified PDFs are extracted
+    and embedded, and vectors of deleted PDFs are removed from the index.
+    
     Args:
         pdf_dir: Directory containing PDF files (default: ./pdfs/)
+        workers: Extraction/chunking processes (default: INGEST_WORKERS)
+        report_path: Where to write the per-file / per-stage timing report
+        full_rebuild: Ignore the manifest and re-process every PDF
+        manifest_path: Ingestion manifest (file hashes, build settings, ids)
     """
     print("=" * 60)
     print("🏗️  Building Vector Store for MedInSight")
@@ -358,21 +1776,56 @@ def build_vector_store(pdf_dir: str = "./pdfs/"):
     
     # Initialize processor
     processor = DocumentProcessor()
+    settings = _ingest_settings(processor)
     
-    # Process documents
-    chunks, metadata = processor.process_documents(pdf_dir)
+    manifest = None if full_rebuild else load_manifest(manifest_path)
+    vector_store = None
+    files = {}
+    if manifest:
+        files = scan_pdfs(pdf_dir, manifest["files"])
+        stale = [key for key, value in settings.items() if manifest.get(key, _SETTING_DEFAULTS.get(key)) != value]
+        if stale:
+            print(f"♻️  Build settings changed ({', '.join(stale)}), rebuilding from scratch")
+        elif files:
+            vector_store = _update_vector_store(processor, pdf_dir, workers, manifest, files)
     
-    if not chunks:
-        print("❌ No chunks created. Please add PDF files to ./pdfs/")
-        return None
+    if vector_store is None:
+        # Full rebuild: streamed unless INGEST_STREAMING=false
+        if os.getenv("INGEST_STREAMING", "true").lower() == "true":
+            vector_store = _stream_vector_store(processor, pdf_dir, workers)
+        else:
+            vector_store = _build_in_memory(processor, pdf_dir, workers)
+        
+        if vector_store is None:
+            print("❌ No chunks created. Please add PDF files to ./pdfs/")
+            return None
+        
+        files = scan_pdfs(pdf_dir, files)
+        ids = _file_ids(vector_store.metadata, range(len(vector_store.metadata)))
+        manifest = {**settings, "files": {name: {**files[name], "ids": ids.get(name, [])} for name in files}}
     
-    # Create embeddings
-    embeddings = processor.create_embeddings(chunks)
+    timing = processor.timing_report
+    timing["embeddings"] = processor.embedding_stats
     
-    # Build and save vector store
-    vector_store = VectorStore()
-    vector_store.build_index(embeddings, metadata)
-    vector_store.save()
+    # Publish a new store version and save the manifest (an up-to-date store is left untouched)
+    start = time.perf_counter()
+    incremental = timing.get("incremental")
+    if incremental is None or incremental["changed"] or incremental["deleted"]:
+        vector_store.publish()
+    timing["stages"]["index_s"] = round(time.perf_counter() - start, 3)
+    timing["peak_rss_mb"] = peak_rss_mb()
+    if manifest["files"]:
+        save_manifest(manifest, manifest_path)
+    elif os.path.exists(manifest_path):
+        # Placeholder index: nothing to update incrementally next time
+        os.remove(manifest_path)
+    
+    with open(report_path, 'w') as f:
+        json.dump(timing, f, indent=2)
+    print(f"⏱️  Embedding {timing['stages']['embed_s']:.2f}s, "
+          f"indexing {timing['stages']['index_s']:.2f}s")
+    print(f"🧠 Peak RSS {timing['peak_rss_mb']:.0f} MB")
+    print(f"⏱️  Timing report saved to {report_path}")
     
     print("=" * 60)
     print("✅ Vector store built successfully!")
@@ -389,5 +1842,13 @@ def build_vector_store(pdf_dir: str = "./pdfs/"):
 
 
 if __name__ == "__main__":
-    build_vector_store()
-
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Build the MedInSight vector store from PDFs")
+    parser.add_argument("--pdf-dir", default="./pdfs/")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Extraction processes (default: INGEST_WORKERS)")
+    parser.add_argument("--full", action="store_true",
+                        help="Ignore the manifest and rebuild from scratch")
+    args = parser.parse_args()
+    build_vector_store(args.pdf_dir, workers=args.workers, full_rebuild=args.full)
@@ -0,0 +1,113 @@
+"""
+Streaming Ingestion Stages for MedInSight
+Generator stages joined by bounded queues, so ingestion memory does not grow with the corpus
+"""
+
+import queue
+import resource
+import threading
+import time
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List
+
+_DONE = object()
+
+
+class _Failed:
+    """Carries an exception raised by a stage to its consumer"""
+
+    __slots__ = ("error",)
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+class Stage:
+    """
+    Runs an iterable in its own thread, handing its items on through a
+    queue of at most `maxsize` items.
+
+    A full queue blocks the producer (backpressure), so a slow stage
+    downstream holds back everything before it instead of letting items
+    pile up. An exception in the producer is re-raised in the consumer; a
+    consumer that stops early stops the producer too.
+    """
+
+    def __init__(self, name: str, iterable: Iterable, maxsize: int = 4):
+        self.name = name
+        self.maxsize = max(1, maxsize)
+        self._iterable = iterable
+        self._queue = queue.Queue(self.maxsize)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"ingest-{name}", daemon=True)
+
+        self.items = 0
+        self.max_queued = 0
+        self.blocked_s = 0.0
+
+    def _put(self, item) -> bool:
+        """Queue item, waiting while the queue is full (False once the consumer is gone)"""
+        start = time.perf_counter()
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+            except queue.Full:
+                continue
+            self.blocked_s += time.perf_counter() - start
+            self.max_queued = max(self.max_queued, self._queue.qsize())
+            return True
+        return False
+
+    def _run(self):
+        iterator = None
+        try:
+            iterator = iter(self._iterable)
+            for item in iterator:
+                if not self._put(item):
+                    return
+                self.items += 1
+            self._put(_DONE)
+        except BaseException as e:
+            self._put(_Failed(e))
+        finally:
+            # Stops upstream stages / generators when the consumer went away
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+
+    def __iter__(self) -> Iterator[Any]:
+        self._thread.start()
+        try:
+            while True:
+                item = self._queue.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, _Failed):
+                    raise item.error
+                yield item
+        finally:
+            self._stop.set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "items": self.items,
+            "queue_size": self.maxsize,
+            "max_queued": self.max_queued,
+            # Time the stage waited for its consumer to make room
+            "blocked_s": round(self.blocked_s, 3)
+        }
+
+
+def batched(iterable: Iterable, size: int) -> Iterator[List]:
+    """Consecutive lists of `size` items (the last may be shorter)"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def peak_rss_mb() -> float:
+    """High-water resident set size of this process so far"""
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
@@ -0,0 +1,199 @@
+"""
+Metrics for MedInSight
+Process-local latency histograms and counters in the Prometheus text format
+"""
+
+import bisect
+import contextlib
+import contextvars
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# Seconds; spans a cache hit (~1 ms) up to the LLM timeout
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# (metric name, type, help, [(labels, value), ...]) produced at scrape time
+Family = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{key}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic count per label combination"""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels[name]) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(str(labels[name]) for name in self.labels), 0)
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield f"{self.name}{_format_labels(dict(zip(self.labels, key)))} {_format_value(value)}"
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram per label combination"""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        # label key -> [per-bucket counts (+Inf last), sum, count]
+        self._values: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[name]) for name in self.labels)
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][slot] += 1
+            state[1] += value
+            state[2] += 1
+
+    def count(self, **labels) -> int:
+        state = self._values.get(tuple(str(labels[name]) for name in self.labels))
+        return state[2] if state else 0
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            values = sorted((key, (list(state[0]), state[1], state[2])) for key, state in self._values.items())
+        for key, (counts, total, count) in values:
+            labels = dict(zip(self.labels, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket{_format_labels({**labels, 'le': _format_value(bound)})} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(labels)} {count}"
+
+
+class Registry:
+    """Metrics plus collectors that report other components' stats at scrape time"""
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors: List[Callable[[], List[Family]]] = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], List[Family]]):
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for collector in self.collectors:
+            try:
+                families = collector()
+            except Exception as e:
+                print(f"⚠️  Metrics collector failed: {e}")
+                continue
+            for name, kind, help, samples in families:
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.extend(f"{name}{_format_labels(labels)} {_format_value(value)}" for labels, value in samples)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "medinsight_stage_seconds",
+    "Latency of pipeline stages (embed, search, rerank, retrieve, prompt, generate)",
+    ("stage",)
+))
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "medinsight_request_seconds", "HTTP request latency until the response is complete", ("endpoint", "status")
+))
+LLM_TOKENS = REGISTRY.register(Counter(
+    "medinsight_llm_tokens_total", "Chat completion tokens reported by the provider", ("kind",)
+))
+ERRORS = REGISTRY.register(Counter(
+    "medinsight_errors_total", "Exceptions caught on the query path", ("stage",)
+))
+FALLBACKS = REGISTRY.register(Counter(
+    "medinsight_fallbacks_total", "Degraded answers or stages (no contexts, local embedding, ...)", ("reason",)
+))
+
+# Stage durations of the current request, for the Server-Timing header
+_request_timings: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar(
+    "request_timings", default=None
+)
+
+
+def begin_request() -> Tuple[Dict[str, float], contextvars.Token]:
+    """Collect stage timings of everything run in this context (and tasks it spawns)"""
+    timings = {}
+    return timings, _request_timings.set(timings)
+
+
+def end_request(token: contextvars.Token):
+    _request_timings.reset(token)
+
+
+def observe_stage(stage: str, seconds: float):
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+@contextlib.contextmanager
+def timed(stage: str):
+    """Record the duration of the block under stage (also when it raises)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+
+def record_usage(response):
+    """Count prompt / completion tokens from a chat completion's usage block"""
+    usage = response.get("usage") if hasattr(response, "get") else None
+    if usage:
+        LLM_TOKENS.inc(usage.get("prompt_tokens", 0), kind="prompt")
+        LLM_TOKENS.inc(usage.get("completion_tokens", 0), kind="completion")
+
+
+def server_timing(timings: Dict[str, float]) -> str:
+    """Server-Timing header value (durations in ms)"""
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items())
@@ -6,7 +6,9 @@ import os
 from typing import List, Dict
 from dotenv import load_dotenv
 
+from context_packer import ContextPacker
 from ingest import VectorStore
+from resources import get_openai_client
 
 # Load environment variables
 load_dotenv()
@@ -17,6 +19,7 @@ class RAGEngine:
         self.vector_store = VectorStore()
         self.vector_store.load()
         self.use_local_model = use_local_model or os.getenv("USE_LOCAL_MODEL", "false").lower() == "true"
+        self.context_packer = ContextPacker.from_env("gpt-3.5-turbo")
         
         if not self.use_local_model:
             try:
@@ -26,7 +29,7 @@ class RAGEngine:
                     print("⚠️  No OpenAI API key found. Falling back to local model.")
                     self.use_local_model = True
                 else:
-                    self.client = openai.OpenAI(api_key=self.openai_api_key)
+                    self.client = get_openai_client(self.openai_api_key)
             except ImportError:
                 print("⚠️  OpenAI package not available. Using local model.")
                 self.use_local_model = True
@@ -37,6 +40,10 @@ class RAGEngine:
     
     def generate_answer_openai(self, query: str, context: List[Dict]) -> Dict:
         """Generate answer using OpenAI GPT."""
+        # Merge neighbouring chunks and fit the prompt budget
+        if self.context_packer is not None:
+            context = self.context_packer.pack(context)
+        
         # Prepare context text
         context_text = "\n\n".join([
             f"Source: {doc['source']}\n{doc['text']}" 
@@ -3,14 +3,36 @@ RAG Pipeline - Retrieval and Generation Logic
 MedInSight - AI Textbook Medical Reasoning using RAG
 """
 
+import asyncio
 import os
-from typing import List, Dict, Any
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 from dotenv import load_dotenv
+import numpy as np
 import openai
 
+from answer_cache import AnswerCache, STALE
+from coalescer import RequestCoalescer
+from context_packer import ContextPacker
+from metrics import ERRORS, FALLBACKS, observe_stage, record_usage, timed
+from reranker import CrossEncoderReranker
+from resilience import CircuitOpenError, DeadlineExceeded, guard, remaining, timeout_for
+from resources import configure_openai, get_breaker
+from semantic_cache import SemanticAnswerCache
+from sparse_index import tokenize
+
 # Load environment variables
 load_dotenv()
 
+NO_ANSWER = "Information not available in dataset."
+# Ends every answer quoted from the contexts instead of generated (never cached)
+EXTRACTIVE_NOTE = "💡 Note: Quoted from the sources; the language model is unavailable right now."
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
 
 class RAGPipeline:
     """
@@ -18,6 +40,14 @@ class RAGPipeline:
     Uses FAISS for retrieval and GPT-4 for generation.
     """
     
+    # Shared by the sync and async generation paths
+    completion_params = {
+        "model": "gpt-4",    # Using GPT-4 as specified (gpt-5 not available yet)
+        "temperature": 0.1,  # Low temperature for factual accuracy
+        "max_tokens": 500,   # Keep answers concise
+        "timeout": 50        # Ensure response within 60 seconds total (cut to the request deadline)
+    }
+    
     def __init__(self, vector_store):
         """
         Initialize RAG pipeline.
@@ -31,50 +61,154 @@ class RAGPipeline:
         if not self.openai_api_key:
             raise ValueError("OPENAI_API_KEY not found in environment variables")
         
-        # Initialize OpenAI client
-        openai.api_key = self.openai_api_key
+        # Shared OpenAI settings and pooled keep-alive connections
+        configure_openai(self.openai_api_key)
+        
+        # Bounded pool for the CPU-bound parts of the async path
+        # (FAISS search, sentence-transformers encode)
+        self.executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("RAG_EXECUTOR_WORKERS", 4)),
+            thread_name_prefix="rag-worker"
+        )
+        
+        # Completions in flight per /query/batch request
+        self.batch_concurrency = int(os.getenv("RAG_BATCH_CONCURRENCY", 8))
+        
+        # Response cache (ANSWER_CACHE_* in .env); None when disabled
+        self.answer_cache = AnswerCache.from_env()
+        self._background_tasks = set()
+        
+        # Identical concurrent aquery() calls share one run (COALESCE_QUERIES in .env)
+        self.coalescer = RequestCoalescer.from_env()
+        
+        # Optional cross-encoder stage (RERANK_* in .env); None when disabled
+        self.reranker = CrossEncoderReranker.from_env()
+        
+        # Prompt context budget (CONTEXT_TOKEN_BUDGET in .env); None when unlimited
+        self.context_packer = ContextPacker.from_env(self.completion_params["model"])
+        
+        # Answers reused for paraphrased questions (SEMANTIC_CACHE_* in .env); None when disabled
+        self.semantic_cache = SemanticAnswerCache.from_env()
+        if self.semantic_cache is not None:
+            self.semantic_cache.reset(self._cache_scope())
+        
+        # Stops calling a failing or slow LLM (LLM_BREAKER_* in .env); None when disabled
+        self.llm_breaker = get_breaker("llm", slow_call_s=20)
+        # With less of the request deadline left, answer extractively without calling the LLM
+        self.generation_min_s = float(os.getenv("GENERATION_MIN_S", 2))
     
-    def retrieve(self, query: str, top_k: int = 5) -> List[str]:
+    def swap_vector_store(self, vector_store):
+        """
+        Serve new queries from vector_store. Queries already running keep
+        the store they started with (each takes one reference at its start
+        and uses it for every step), which is freed once they finish.
+        Answer cache keys include the index version, so entries of the old
+        store are never served for the new one; the semantic cache is
+        emptied.
+        
+        Returns:
+            The previous store
+        """
+        old = self.vector_store
+        if old is not None and old.embedding_dim == vector_store.embedding_dim:
+            # Same query embedding model: keep its loaded models and cached query vectors
+            vector_store.processor = vector_store.processor or old.processor
+            vector_store.embedding_cache = old.embedding_cache
+        self.vector_store = vector_store
+        if self.semantic_cache is not None:
+            self.semantic_cache.reset(self._cache_scope())
+        return old
+    
+    @staticmethod
+    def _extract_contexts(results: List[Any]) -> List[str]:
+        """Extract text snippets from vector store results"""
+        contexts = []
+        for result in results:
+            if isinstance(result, dict) and 'text' in result:
+                contexts.append(result['text'])
+            elif isinstance(result, str):
+                contexts.append(result)
+        return contexts
+    
+    def _fetch_k(self, top_k: int) -> int:
+        """Candidates to pull from the vector store (over-fetched for reranking)"""
+        return max(top_k, self.reranker.candidates) if self.reranker is not None else top_k
+    
+    def _rerank(self, queries: List[str], batch: List[List[Dict]], top_k: int) -> List[List[Dict]]:
+        """Rerank each result list; without a reranker (or on error) keep the first top_k"""
+        if self.reranker is None:
+            return batch
+        try:
+            return self.reranker.rerank_batch(queries, batch, top_k)
+        except Exception as e:
+            print(f"Error during reranking: {e}")
+            ERRORS.inc(stage="rerank")
+            FALLBACKS.inc(reason="rerank_error")
+            return [results[:top_k] for results in batch]
+    
+    def retrieve(self, query: str, top_k: int = 5, query_embedding: np.ndarray = None,
+                 store=None) -> List[str]:
         """
         Retrieve relevant context from vector store.
         
         Args:
             query: User's question
             top_k: Number of documents to retrieve
+            query_embedding: Precomputed embedding of query (optional)
+            store: Vector store to search (default: the current one)
             
         Returns:
             List of text snippets (contexts)
         """
+        store = store or self.vector_store
         try:
-            results = self.vector_store.search(query, k=top_k)
-            
-            # Extract text snippets
-            contexts = []
-            for result in results:
-                if isinstance(result, dict) and 'text' in result:
-                    contexts.append(result['text'])
-                elif isinstance(result, str):
-                    contexts.append(result)
-            
-            return contexts
+            with timed("retrieve"):
+                results = store.search(query, k=self._fetch_k(top_k), query_embedding=query_embedding)
+                if self.reranker is not None:
+                    with timed("rerank"):
+                        results = self._rerank([query], [results], top_k)[0]
+                return self._extract_contexts(results)
         except Exception as e:
             print(f"Error during retrieval: {e}")
+            ERRORS.inc(stage="retrieve")
             return []
     
-    def generate(self, query: str, contexts: List[str]) -> str:
+    async def aretrieve(self, query: str, top_k: int = 5, query_embedding: np.ndarray = None,
+                        store=None) -> List[str]:
         """
-        Generate answer using GPT-4 based on retrieved contexts.
-        Implements anti-hallucination by grounding answer strictly in contexts.
+        Async variant of retrieve() that never blocks the event loop.
         
         Args:
             query: User's question
-            contexts: Retrieved text snippets
+            top_k: Number of documents to retrieve
+            query_embedding: Precomputed embedding of query (optional)
+            store: Vector store to search (default: the current one)
             
         Returns:
-            Generated answer (concise and grounded)
+            List of text snippets (contexts)
         """
-        if not contexts:
-            return "Information not available in dataset."
+        store = store or self.vector_store
+        try:
+            with timed("retrieve"):
+                results = await store.asearch(query, k=self._fetch_k(top_k), executor=self.executor,
+                                              query_embedding=query_embedding)
+                if self.reranker is not None:
+                    loop = asyncio.get_running_loop()
+                    with timed("rerank"):
+                        results = (await loop.run_in_executor(self.executor, self._rerank,
+                                                              [query], [results], top_k))[0]
+                return self._extract_contexts(results)
+        except Exception as e:
+            print(f"Error during retrieval: {e}")
+            ERRORS.inc(stage="retrieve")
+            return []
+    
+    def _build_messages(self, query: str, contexts: List[str]) -> List[Dict[str, str]]:
+        """Build the grounded chat messages for the LLM"""
+        # Dedupe / merge neighbouring chunks and keep within the token budget
+        if self.context_packer is not None:
+            with timed("prompt"):
+                contexts = self.context_packer.pack(contexts)
         
         # Build context string
         context_text = "\n\n".join([
@@ -102,45 +236,472 @@ Based ONLY on the above contexts, provide a concise and accurate answer. If the
 
 Answer:"""
 
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+    
+    def generate(self, query: str, contexts: List[str]) -> str:
+        """
+        Generate answer using GPT-4 based on retrieved contexts.
+        Implements anti-hallucination by grounding answer strictly in contexts.
+        
+        Args:
+            query: User's question
+            contexts: Retrieved text snippets
+            
+        Returns:
+            Generated answer (concise and grounded)
+        """
+        if not contexts:
+            FALLBACKS.inc(reason="no_contexts")
+            return NO_ANSWER
+        
         try:
             # Call OpenAI API (GPT-4)
-            response = openai.ChatCompletion.create(
-                model="gpt-4",  # Using GPT-4 as specified (gpt-5 not available yet)
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.1,  # Low temperature for factual accuracy
-                max_tokens=500,   # Keep answers concise
-                timeout=50        # Ensure response within 60 seconds total
-            )
+            messages = self._build_messages(query, contexts)
+            with guard(self.llm_breaker, self._generation_timeout()) as timeout, timed("generate"):
+                response = openai.ChatCompletion.create(messages=messages, request_timeout=timeout,
+                                                        **self.completion_params)
+            record_usage(response)
             
             answer = response.choices[0].message.content.strip()
             return answer
             
         except Exception as e:
-            print(f"Error during generation: {e}")
-            return "Information not available in dataset."
+            return self._degraded_answer(query, contexts, e)
+    
+    async def agenerate(self, query: str, contexts: List[str]) -> str:
+        """
+        Async variant of generate() using the non-blocking OpenAI client.
+        
+        Args:
+            query: User's question
+            contexts: Retrieved text snippets
+            
+        Returns:
+            Generated answer (concise and grounded)
+        """
+        if not contexts:
+            FALLBACKS.inc(reason="no_contexts")
+            return NO_ANSWER
+        
+        try:
+            messages = self._build_messages(query, contexts)
+            with guard(self.llm_breaker, self._generation_timeout()) as timeout, timed("generate"):
+                response = await asyncio.wait_for(
+                    openai.ChatCompletion.acreate(messages=messages, request_timeout=timeout,
+                                                  **self.completion_params),
+                    timeout
+                )
+            record_usage(response)
+            
+            answer = response.choices[0].message.content.strip()
+            return answer
+            
+        except Exception as e:
+            return self._degraded_answer(query, contexts, e)
+    
+    def _generation_timeout(self) -> float:
+        """
+        The completion timeout cut to the request deadline. Raises
+        DeadlineExceeded when too little is left to generate an answer.
+        """
+        left = remaining()
+        if left is not None and left < self.generation_min_s:
+            raise DeadlineExceeded(f"{left:.2f}s left")
+        return timeout_for(self.completion_params["timeout"])
+    
+    def _degraded_answer(self, query: str, contexts: List[str], error: Exception) -> str:
+        """Extractive answer after generation failed or was skipped"""
+        if isinstance(error, CircuitOpenError):
+            reason = "llm_circuit_open"
+        elif isinstance(error, DeadlineExceeded):
+            reason = "deadline"
+        else:
+            print(f"Error during generation: {error!r}")
+            ERRORS.inc(stage="generate")
+            reason = "generation_timeout" if isinstance(error, TimeoutError) else "generation_error"
+        FALLBACKS.inc(reason=reason)
+        return self.extractive_answer(query, contexts)
+    
+    @staticmethod
+    def extractive_answer(query: str, contexts: List[str], max_sentences: int = 3) -> str:
+        """
+        Answer without the LLM: the sentences of the top contexts sharing the
+        most terms with the query, kept in their original order.
+        """
+        terms = set(tokenize(query))
+        sentences = [sentence.strip() for context in contexts[:3]
+                     for sentence in _SENTENCE_RE.split(context) if sentence.strip()]
+        if not sentences:
+            return NO_ANSWER
+        scores = [len(terms.intersection(tokenize(sentence))) for sentence in sentences]
+        best = sorted(range(len(sentences)), key=lambda i: -scores[i])[:max_sentences]
+        chosen = sorted(i for i in best if scores[i] > 0) or [0]
+        return " ".join(sentences[i] for i in chosen) + f"\n\n{EXTRACTIVE_NOTE}"
+    
+    @staticmethod
+    def _cacheable(answer: str) -> bool:
+        # Failed or degraded generation must not be pinned for the whole TTL
+        return answer != NO_ANSWER and not answer.endswith(EXTRACTIVE_NOTE)
+    
+    def _cache_scope(self, store=None) -> str:
+        """Index version of store (default: the current one) plus every setting that changes answers"""
+        version = (store or self.vector_store).version or ""
+        if self.reranker is not None:
+            version = f"{version}|rerank:{self.reranker.signature}"
+        if self.context_packer is not None:
+            version = f"{version}|context:{self.context_packer.budget}"
+        return version
+    
+    def _cache_key(self, question: str, top_k: int, store=None) -> str:
+        return AnswerCache.make_key(question, top_k, self.completion_params["model"], self._cache_scope(store))
+    
+    def _store_result(self, key: str, result: Dict[str, Any]):
+        if result["contexts"] and self._cacheable(result["answer"]):
+            self.answer_cache.store(key, result)
+    
+    async def _astore_result(self, key: str, result: Dict[str, Any]):
+        if result["contexts"] and self._cacheable(result["answer"]):
+            await self.answer_cache.astore(key, result, executor=self.executor)
+    
+    @staticmethod
+    def _copy_result(result: Dict[str, Any]) -> Dict[str, Any]:
+        return {"answer": result["answer"], "contexts": list(result["contexts"])}
+    
+    def _embed_for_cache(self, question: str, store) -> Optional[np.ndarray]:
+        """Query embedding for the semantic cache, reused for retrieval (None if disabled)"""
+        if self.semantic_cache is None:
+            return None
+        try:
+            with timed("embed"):
+                return store.embed_query(question)
+        except Exception as e:
+            print(f"Error embedding query for the semantic cache: {e}")
+            return None
+    
+    async def _aembed_for_cache(self, question: str, store) -> Optional[np.ndarray]:
+        if self.semantic_cache is None:
+            return None
+        try:
+            with timed("embed"):
+                return await store.aembed_query(question, executor=self.executor)
+        except Exception as e:
+            print(f"Error embedding query for the semantic cache: {e}")
+            return None
+    
+    def _semantic_lookup(self, embedding: Optional[np.ndarray], contexts: List[str], scope: str) -> Optional[str]:
+        """Stored answer of a paraphrase with the same contexts (None on a miss)"""
+        if embedding is None or not contexts:
+            return None
+        return self.semantic_cache.lookup(embedding, contexts, scope)
+    
+    def _semantic_store(self, embedding: Optional[np.ndarray], contexts: List[str], answer: str, scope: str):
+        if embedding is not None and contexts and self._cacheable(answer):
+            self.semantic_cache.store(embedding, contexts, answer, scope)
     
     def query(self, question: str, top_k: int = 5) -> Dict[str, Any]:
+        """
+        Complete RAG pipeline, served from the answer cache when possible.
+        
+        Args:
+            question: User's medical question
+            top_k: Number of contexts to retrieve
+            
+        Returns:
+            Dictionary with 'answer' and 'contexts' keys
+        """
+        # One store for every step, even if a new one is swapped in meanwhile
+        store = self.vector_store
+        if self.answer_cache is None:
+            return self._run_query(question, top_k, store)
+        
+        key = self._cache_key(question, top_k, store)
+        cached, state = self.answer_cache.lookup(key)
+        if cached is not None:
+            if state == STALE and self.answer_cache.begin_refresh(key):
+                self.executor.submit(self._refresh, key, question, top_k, store)
+            return self._copy_result(cached)
+        
+        result = self._run_query(question, top_k, store)
+        self._store_result(key, result)
+        return result
+    
+    def _refresh(self, key: str, question: str, top_k: int, store):
+        """Recompute a stale cache entry off the request path"""
+        try:
+            self._store_result(key, self._run_query(question, top_k, store))
+        except Exception as e:
+            print(f"Error refreshing cached answer: {e}")
+        finally:
+            self.answer_cache.end_refresh(key)
+    
+    def _run_query(self, question: str, top_k: int = 5, store=None) -> Dict[str, Any]:
         """
         Complete RAG pipeline: retrieve + generate.
         
         Args:
             question: User's medical question
             top_k: Number of contexts to retrieve
+            store: Vector store for every step (default: the current one)
             
         Returns:
             Dictionary with 'answer' and 'contexts' keys
         """
+        store = store or self.vector_store
+        
         # Step 1: Retrieve relevant contexts
-        contexts = self.retrieve(question, top_k=top_k)
+        scope = self._cache_scope(store)
+        embedding = self._embed_for_cache(question, store)
+        contexts = self.retrieve(question, top_k=top_k, query_embedding=embedding, store=store)
         
-        # Step 2: Generate answer grounded in contexts
-        answer = self.generate(question, contexts)
+        # Step 2: Generate answer grounded in contexts (unless a paraphrase was answered already)
+        answer = self._semantic_lookup(embedding, contexts, scope)
+        if answer is None:
+            answer = self.generate(question, contexts)
+            self._semantic_store(embedding, contexts, answer, scope)
         
         # Step 3: Return in required format
         return {
             "answer": answer,
             "contexts": contexts[:top_k]  # Ensure we return exactly top_k contexts
         }
+    
+    async def aquery(self, question: str, top_k: int = 5, coalesce: bool = True) -> Dict[str, Any]:
+        """
+        Complete RAG pipeline on the async path (used by the /query endpoint).
+        Fresh cache hits return immediately; stale hits are served while a
+        background task refreshes the entry. On a miss, concurrent calls for
+        the same normalized (question, top_k) share one retrieve + generate.
+        
+        Args:
+            question: User's medical question
+            top_k: Number of contexts to retrieve
+            coalesce: Share the run with concurrent identical queries. The
+                shared run keeps the first caller's deadline, so a request
+                with its own (shorter) budget passes False and runs alone
+            
+        Returns:
+            Dictionary with 'answer' and 'contexts' keys
+        """
+        # One store for every step, even if a new one is swapped in meanwhile
+        store = self.vector_store
+        key = None
+        if self.answer_cache is not None:
+            key = self._cache_key(question, top_k, store)
+            cached = await self._acached_result(key, question, top_k, store)
+            if cached is not None:
+                return cached
+        
+        if self.coalescer is None or not coalesce:
+            return await self._arun_and_store(key, question, top_k, store)
+        flight_key = RequestCoalescer.make_key(question, top_k, self._cache_scope(store))
+        result = await self.coalescer.run(flight_key, partial(self._arun_and_store, key, question, top_k, store))
+        # Every caller gets its own copy of the shared result
+        return self._copy_result(result)
+    
+    async def _arun_and_store(self, key: Optional[str], question: str, top_k: int, store) -> Dict[str, Any]:
+        result = await self._arun_query(question, top_k, store)
+        if key is not None:
+            await self._astore_result(key, result)
+        return result
+    
+    async def _acached_result(self, key: str, question: str, top_k: int, store):
+        """Cached result for key (None on a miss); stale hits schedule a background refresh"""
+        cached, state = await self.answer_cache.alookup(key, executor=self.executor)
+        if cached is None:
+            return None
+        if state == STALE and self.answer_cache.begin_refresh(key):
+            task = asyncio.create_task(self._arefresh(key, question, top_k, store))
+            self._background_tasks.add(task)
+            task.add_done_callback(self._background_tasks.discard)
+        return self._copy_result(cached)
+    
+    async def _arefresh(self, key: str, question: str, top_k: int, store):
+        try:
+            await self._astore_result(key, await self._arun_query(question, top_k, store))
+        except Exception as e:
+            print(f"Error refreshing cached answer: {e}")
+        finally:
+            self.answer_cache.end_refresh(key)
+    
+    async def _arun_query(self, question: str, top_k: int = 5, store=None) -> Dict[str, Any]:
+        """Async retrieve + generate on store (default: the current one), past the exact-match answer cache"""
+        store = store or self.vector_store
+        scope = self._cache_scope(store)
+        embedding = await self._aembed_for_cache(question, store)
+        contexts = await self.aretrieve(question, top_k=top_k, query_embedding=embedding, store=store)
+        answer = self._semantic_lookup(embedding, contexts, scope)
+        if answer is None:
+            answer = await self.agenerate(question, contexts)
+            self._semantic_store(embedding, contexts, answer, scope)
+        
+        return {
+            "answer": answer,
+            "contexts": contexts[:top_k]
+        }
+    
+    async def aquery_batch(self, questions: List[str], top_k: int = 5) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+        """
+        Answer many questions, yielding (position, result) as each one finishes.
+        
+        Cached answers are yielded first. The remaining questions share one
+        batched embedding call and one multi-row FAISS search; generation
+        then runs with at most RAG_BATCH_CONCURRENCY completions in flight,
+        skipped for questions the semantic cache can answer.
+        
+        Args:
+            questions: User questions
+            top_k: Number of contexts to retrieve per question
+        """
+        # One store for the whole batch, even if a new one is swapped in meanwhile
+        store = self.vector_store
+        pending = []
+        for i, question in enumerate(questions):
+            key = self._cache_key(question, top_k, store) if self.answer_cache is not None else None
+            cached = await self._acached_result(key, question, top_k, store) if key else None
+            if cached is not None:
+                yield i, cached
+            else:
+                pending.append((i, question, key))
+        if not pending:
+            return
+        
+        scope = self._cache_scope(store)
+        queries = [question for _, question, _ in pending]
+        embeddings = None
+        if self.semantic_cache is not None:
+            try:
+                with timed("embed"):
+                    embeddings = await store.aembed_queries(queries, executor=self.executor)
+            except Exception as e:
+                print(f"Error embedding queries for the semantic cache: {e}")
+        
+        try:
+            with timed("retrieve"):
+                results = await store.asearch_batch(queries, k=self._fetch_k(top_k), executor=self.executor,
+                                                    query_embeddings=embeddings)
+                if self.reranker is not None:
+                    loop = asyncio.get_running_loop()
+                    with timed("rerank"):
+                        results = await loop.run_in_executor(self.executor, self._rerank, queries, results, top_k)
+            all_contexts = [self._extract_contexts(result) for result in results]
+        except Exception as e:
+            print(f"Error during batch retrieval: {e}")
+            ERRORS.inc(stage="retrieve")
+            all_contexts = [[] for _ in pending]
+        
+        semaphore = asyncio.Semaphore(self.batch_concurrency)
+        
+        async def answer(i: int, question: str, key: str, contexts: List[str], embedding: Optional[np.ndarray]):
+            text = self._semantic_lookup(embedding, contexts, scope)
+            if text is None:
+                async with semaphore:
+                    text = await self.agenerate(question, contexts)
+                self._semantic_store(embedding, contexts, text, scope)
+            result = {"answer": text, "contexts": contexts[:top_k]}
+            if key is not None:
+                await self._astore_result(key, result)
+            return i, result
+        
+        rows = embeddings if embeddings is not None else [None] * len(pending)
+        tasks = [asyncio.create_task(answer(i, question, key, contexts, embedding))
+                 for (i, question, key), contexts, embedding in zip(pending, all_contexts, rows)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # Client went away: don't keep generating answers nobody will read
+            for task in tasks:
+                task.cancel()
+    
+    async def _astream_completion(self, query: str, contexts: List[str]) -> AsyncIterator[str]:
+        """
+        Yield answer text pieces as the LLM produces them. The breaker judges
+        the call by how long the stream takes to open.
+        """
+        with guard(self.llm_breaker, self._generation_timeout()) as timeout:
+            response = await asyncio.wait_for(
+                openai.ChatCompletion.acreate(
+                    messages=self._build_messages(query, contexts),
+                    stream=True,
+                    request_timeout=timeout,
+                    **self.completion_params
+                ),
+                timeout
+            )
+        async for chunk in response:
+            if not chunk["choices"]:
+                continue
+            text = chunk["choices"][0].get("delta", {}).get("content")
+            if text:
+                yield text
+    
+    async def astream_query(self, question: str, top_k: int = 5) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Complete RAG pipeline as a stream of (event, payload) pairs:
+        
+        - ("contexts", {"contexts": [...]}) as soon as retrieval finishes
+        - ("token", {"text": ...}) for each piece of the answer
+        - ("done", {"answer": ...}) with the final answer
+        
+        Cached answers (exact or semantic) are replayed as a single token.
+        Completed answers are stored in the caches like query() results.
+        
+        Args:
+            question: User's medical question
+            top_k: Number of contexts to retrieve
+        """
+        # One store for every step, even if a new one is swapped in meanwhile
+        store = self.vector_store
+        key = self._cache_key(question, top_k, store) if self.answer_cache is not None else None
+        cached = await self._acached_result(key, question, top_k, store) if key else None
+        if cached is not None:
+            yield "contexts", {"contexts": cached["contexts"]}
+            yield "token", {"text": cached["answer"]}
+            yield "done", {"answer": cached["answer"]}
+            return
+        
+        scope = self._cache_scope(store)
+        embedding = await self._aembed_for_cache(question, store)
+        contexts = (await self.aretrieve(question, top_k=top_k, query_embedding=embedding, store=store))[:top_k]
+        yield "contexts", {"contexts": contexts}
+        if not contexts:
+            FALLBACKS.inc(reason="no_contexts")
+            yield "token", {"text": NO_ANSWER}
+            yield "done", {"answer": NO_ANSWER}
+            return
+        
+        cached_answer = self._semantic_lookup(embedding, contexts, scope)
+        if cached_answer is not None:
+            if key is not None:
+                await self._astore_result(key, {"answer": cached_answer, "contexts": contexts})
+            yield "token", {"text": cached_answer}
+            yield "done", {"answer": cached_answer}
+            return
+        
+        parts = []
+        start = time.perf_counter()
+        try:
+            async for text in self._astream_completion(question, contexts):
+                if not parts:
+                    observe_stage("first_token", time.perf_counter() - start)
+                parts.append(text)
+                yield "token", {"text": text}
+            observe_stage("generate", time.perf_counter() - start)
+            answer = "".join(parts).strip() or NO_ANSWER
+            if key is not None:
+                await self._astore_result(key, {"answer": answer, "contexts": contexts})
+            self._semantic_store(embedding, contexts, answer, scope)
+        except Exception as e:
+            # Keep what was already sent; only an empty answer becomes extractive
+            answer = "".join(parts).strip()
+            if answer:
+                print(f"Error during streamed generation: {e!r}")
+                ERRORS.inc(stage="generate")
+            else:
+                answer = self._degraded_answer(question, contexts, e)
+                yield "token", {"text": answer}
+        
+        yield "done", {"answer": answer}
@@ -0,0 +1,92 @@
+"""
+Cross-Encoder Reranker for MedInSight
+Rescores over-fetched retrieval candidates locally and keeps only the strong ones
+"""
+
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from resources import get_cross_encoder
+
+DEFAULT_RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+
+class CrossEncoderReranker:
+    """
+    Scores (query, chunk) pairs with a small sentence-transformers
+    CrossEncoder on CPU, in batches.
+
+    The pipeline over-fetches `candidates` hits, reranks them and keeps at
+    most top_k whose score reaches `min_score` (the model's raw logit; for
+    the MS MARCO models 0 is roughly "relevant"). At least `min_keep` hits
+    survive so a weak best match still reaches the grounded prompt.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_RERANK_MODEL, candidates: int = 50,
+                 batch_size: int = 32, min_score: float = 0.0, min_keep: int = 1,
+                 max_length: int = 512, model=None):
+        self.model_name = model_name
+        self.candidates = candidates
+        self.batch_size = batch_size
+        self.min_score = min_score
+        self.min_keep = min_keep
+        self.max_length = max_length
+        self._model = model
+
+    @classmethod
+    def from_env(cls) -> Optional["CrossEncoderReranker"]:
+        """Build the reranker from RERANK_* environment variables (None if disabled)"""
+        if os.getenv("RERANK_ENABLED", "false").lower() != "true":
+            return None
+        return cls(
+            model_name=os.getenv("RERANK_MODEL", DEFAULT_RERANK_MODEL),
+            candidates=int(os.getenv("RERANK_CANDIDATES", 50)),
+            batch_size=int(os.getenv("RERANK_BATCH_SIZE", 32)),
+            min_score=float(os.getenv("RERANK_MIN_SCORE", 0.0)),
+            min_keep=int(os.getenv("RERANK_MIN_KEEP", 1)),
+            max_length=int(os.getenv("RERANK_MAX_LENGTH", 512))
+        )
+
+    @property
+    def model(self):
+        """The CrossEncoder, loaded on first use and shared by the process"""
+        if self._model is None:
+            self._model = get_cross_encoder(self.model_name, self.max_length)
+        return self._model
+
+    @property
+    def signature(self) -> str:
+        """Settings that change which contexts are kept (part of answer cache keys)"""
+        return f"{self.model_name}:{self.min_score}:{self.min_keep}"
+
+    def _select(self, results: List[Dict], scores: np.ndarray, top_k: int) -> List[Dict]:
+        kept = []
+        for i in np.argsort(-scores, kind="stable")[:top_k]:
+            if scores[i] < self.min_score and len(kept) >= self.min_keep:
+                break
+            result = dict(results[i])
+            result["rerank_score"] = float(scores[i])
+            kept.append(result)
+        return kept
+
+    def rerank(self, query: str, results: List[Dict], top_k: int) -> List[Dict]:
+        """Best-first results for one query, cut at top_k and min_score"""
+        return self.rerank_batch([query], [results], top_k)[0]
+
+    def rerank_batch(self, queries: List[str], batch: List[List[Dict]], top_k: int) -> List[List[Dict]]:
+        """Rerank several result lists with a single model.predict call"""
+        pairs = [(query, result["text"]) for query, results in zip(queries, batch) for result in results]
+        if not pairs:
+            return [[] for _ in batch]
+        scores = np.asarray(
+            self.model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False),
+            dtype="float32"
+        ).reshape(-1)
+
+        reranked, start = [], 0
+        for results in batch:
+            reranked.append(self._select(results, scores[start:start + len(results)], top_k))
+            start += len(results)
+        return reranked
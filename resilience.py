@@ -0,0 +1,218 @@
+"""
+Resilience for MedInSight
+Per-request deadline budgets and circuit breakers around the OpenAI calls
+"""
+
+import contextlib
+import contextvars
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Absolute time.monotonic() by which the current request must answer
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("request_deadline", default=None)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose breaker is open"""
+
+
+class DeadlineExceeded(Exception):
+    """Raised instead of calling a provider when the request budget is spent"""
+
+
+def start_deadline(seconds: float) -> contextvars.Token:
+    """Give everything run in this context (and tasks it spawns) `seconds` to finish"""
+    return _deadline.set(time.monotonic() + seconds)
+
+
+def end_deadline(token: contextvars.Token):
+    _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current request's budget (None without a deadline)"""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def timeout_for(limit: float, floor: float = 0.05) -> float:
+    """
+    Timeout for one provider call: its own limit, cut to what is left of the
+    request budget. Raises DeadlineExceeded when less than floor is left.
+    """
+    left = remaining()
+    if left is None:
+        return limit
+    if left < floor:
+        raise DeadlineExceeded(f"{left:.3f}s left")
+    return min(limit, left)
+
+
+def guard(breaker: Optional["CircuitBreaker"], timeout: float = None):
+    """breaker.guard(timeout), or a no-op yielding timeout when the breaker is disabled"""
+    return breaker.guard(timeout) if breaker is not None else contextlib.nullcontext(timeout)
+
+
+class CircuitBreaker:
+    """
+    Stops calling a provider that keeps failing.
+
+    `failures` consecutive failed calls (errors, or calls slower than
+    `slow_call_s`) open the breaker: calls are rejected for `reset_s`
+    seconds, after which one probe call is let through (half-open). The
+    probe closing or reopening the breaker decides what happens next.
+
+    A call that timed out on a timeout shorter than slow_call_s was cut
+    short by the request deadline, not by the provider, and is not counted.
+    The probe is given at most slow_call_s: any longer already means failure.
+    Calls that end after the breaker opened or closed again (started before
+    it did) are tallied but do not change its state.
+    """
+
+    def __init__(self, name: str, failures: int = 5, slow_call_s: float = 20, reset_s: float = 30):
+        self.name = name
+        self.failure_threshold = failures
+        self.slow_call_s = slow_call_s
+        self.reset_s = reset_s
+        self._state = CLOSED
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._probing = False
+        # Bumped on every open / close; outcomes of older calls are stale
+        self._epoch = 0
+        self._lock = threading.Lock()
+
+        self.successes = 0
+        self.failures = 0
+        self.slow_calls = 0
+        self.rejected = 0
+        self.opened = 0
+
+    @classmethod
+    def from_env(cls, name: str, slow_call_s: float = 20) -> Optional["CircuitBreaker"]:
+        """
+        Build the breaker from <NAME>_BREAKER_* environment variables
+        (None if <NAME>_BREAKER_FAILURES=0)
+        """
+        prefix = f"{name.upper()}_BREAKER"
+        failures = int(os.getenv(f"{prefix}_FAILURES", 5))
+        if failures <= 0:
+            return None
+        return cls(
+            name,
+            failures=failures,
+            slow_call_s=float(os.getenv(f"{prefix}_SLOW_CALL_S", slow_call_s)),
+            reset_s=float(os.getenv(f"{prefix}_RESET_S", 30))
+        )
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_s:
+                return HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now (claims the probe when half-open)"""
+        return self._admit()[0] is not None
+
+    def _admit(self) -> Tuple[Optional[str], int]:
+        """State the admitted call runs in (None when rejected) and the current epoch"""
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_s:
+                self._state = HALF_OPEN
+                self._probing = False
+            if self._state == CLOSED:
+                return CLOSED, self._epoch
+            if self._state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return HALF_OPEN, self._epoch
+            self.rejected += 1
+            return None, self._epoch
+
+    def record_success(self, seconds: float = 0.0, epoch: int = None):
+        if seconds > self.slow_call_s:
+            with self._lock:
+                self.slow_calls += 1
+            self.record_failure(epoch)
+            return
+        with self._lock:
+            self.successes += 1
+            if epoch is not None and epoch != self._epoch:
+                return
+            self._consecutive = 0
+            self._probing = False
+            if self._state != CLOSED:
+                print(f"✅ {self.name} circuit closed")
+                self._epoch += 1
+            self._state = CLOSED
+
+    def record_failure(self, epoch: int = None):
+        with self._lock:
+            self.failures += 1
+            if epoch is not None and epoch != self._epoch:
+                return
+            self._consecutive += 1
+            self._probing = False
+            if self._state == HALF_OPEN or (self._state == CLOSED and self._consecutive >= self.failure_threshold):
+                if self._state == CLOSED:
+                    print(f"⚠️  {self.name} circuit open after {self._consecutive} failures; "
+                          f"retrying in {self.reset_s:.0f}s")
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._epoch += 1
+                self.opened += 1
+
+    def release(self, epoch: int = None):
+        """Give the half-open probe back without a verdict (call cancelled or cut short)"""
+        with self._lock:
+            if epoch is None or epoch == self._epoch:
+                self._probing = False
+
+    @contextlib.contextmanager
+    def guard(self, timeout: float = None) -> Iterator[Optional[float]]:
+        """
+        Run the block as one call: rejected when open, its outcome recorded.
+        Yields the timeout the block should apply (shortened for the probe).
+
+        Args:
+            timeout: Timeout the block would apply to the call, if any
+        """
+        state, epoch = self._admit()
+        if state is None:
+            raise CircuitOpenError(f"{self.name} circuit open")
+        if state == HALF_OPEN:
+            timeout = self.slow_call_s if timeout is None else min(timeout, self.slow_call_s)
+        start = time.monotonic()
+        try:
+            yield timeout
+        except Exception:
+            elapsed = time.monotonic() - start
+            if timeout is not None and timeout < self.slow_call_s and elapsed >= 0.9 * timeout:
+                self.release(epoch)
+            else:
+                self.record_failure(epoch)
+            raise
+        except BaseException:
+            self.release(epoch)
+            raise
+        self.record_success(time.monotonic() - start, epoch)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "successes": self.successes,
+            "failures": self.failures,
+            "slow_calls": self.slow_calls,
+            "rejected": self.rejected,
+            "opened": self.opened,
+            "failure_threshold": self.failure_threshold,
+            "slow_call_s": self.slow_call_s,
+            "reset_s": self.reset_s
+        }
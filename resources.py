@@ -0,0 +1,163 @@
+"""
+Shared Resources for MedInSight
+Process-wide registry of embedding models and LLM clients, plus start-up warm-up
+"""
+
+import asyncio
+import contextlib
+import os
+import threading
+import time
+from functools import partial
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+import openai
+
+from resilience import CircuitBreaker
+
+_lock = threading.RLock()
+_resources: Dict[Any, Any] = {}
+
+
+def _get(key, factory: Callable[[], Any]):
+    """The resource under key, created by factory on first use (once per process)"""
+    try:
+        return _resources[key]
+    except KeyError:
+        pass
+    with _lock:
+        if key not in _resources:
+            _resources[key] = factory()
+        return _resources[key]
+
+
+def get_sentence_transformer(model_name: str):
+    """sentence-transformers embedding model, loaded once and shared"""
+    def load():
+        from sentence_transformers import SentenceTransformer
+        print(f"📦 Loading embedding model {model_name}...")
+        return SentenceTransformer(model_name)
+    return _get(("sentence_transformer", model_name), load)
+
+
+def get_cross_encoder(model_name: str, max_length: int = 512):
+    """sentence-transformers CrossEncoder on CPU, loaded once and shared"""
+    def load():
+        from sentence_transformers import CrossEncoder
+        print(f"📦 Loading cross-encoder {model_name}...")
+        return CrossEncoder(model_name, max_length=max_length, device="cpu")
+    return _get(("cross_encoder", model_name, max_length), load)
+
+
+def configure_openai(api_key: Optional[str] = None):
+    """
+    Set the OpenAI key and a pooled keep-alive requests session for the
+    sync client (once per process; OPENAI_POOL_SIZE connections).
+    """
+    def configure():
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        pool_size = int(os.getenv("OPENAI_POOL_SIZE", 32))
+        session = requests.Session()
+        session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=2))
+        openai.requestssession = session
+        return session
+
+    key = api_key or os.getenv("OPENAI_API_KEY")
+    if key:
+        openai.api_key = key
+    _get("openai_requests_session", configure)
+
+
+def get_openai_client(api_key: Optional[str] = None):
+    """openai>=1.0 client (keeps its own connection pool), created once"""
+    return _get("openai_client", lambda: openai.OpenAI(api_key=api_key or os.getenv("OPENAI_API_KEY")))
+
+
+def get_breaker(name: str, slow_call_s: float = 20) -> Optional[CircuitBreaker]:
+    """Circuit breaker of one provider (<NAME>_BREAKER_* in .env), shared by every caller; None when disabled"""
+    return _get(("breaker", name), lambda: CircuitBreaker.from_env(name, slow_call_s))
+
+
+async def open_aiohttp_session():
+    """
+    Shared aiohttp session for async OpenAI calls. Without one, openai 0.28
+    opens (and tears down) a new session, and TLS connection, per request.
+    Bound to the running event loop; close it with close_aiohttp_session().
+    """
+    import aiohttp
+
+    session = _resources.get("aiohttp_session")
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=int(os.getenv("OPENAI_POOL_SIZE", 32)),
+            keepalive_timeout=float(os.getenv("OPENAI_KEEPALIVE_S", 60))
+        )
+        session = aiohttp.ClientSession(connector=connector)
+        _resources["aiohttp_session"] = session
+    return session
+
+
+async def close_aiohttp_session():
+    session = _resources.pop("aiohttp_session", None)
+    if session is not None and not session.closed:
+        await session.close()
+
+
+@contextlib.contextmanager
+def use_aiohttp_session(session):
+    """Route openai async calls in this context (and tasks it spawns) through session"""
+    token = openai.aiosession.set(session)
+    try:
+        yield session
+    finally:
+        openai.aiosession.reset(token)
+
+
+def _step(timings: Dict[str, float], name: str, fn: Callable[[], Any]):
+    start = time.perf_counter()
+    try:
+        fn()
+    except Exception as e:
+        print(f"⚠️  Warm-up step '{name}' failed: {e}")
+    timings[name] = round(time.perf_counter() - start, 3)
+
+
+def warm_up_vector_store(vector_store) -> Dict[str, float]:
+    """Touch the query embedding model (when local), the FAISS index and the BM25 index"""
+    timings = {}
+    if vector_store is None or vector_store.index is None:
+        return timings
+    if not vector_store._uses_openai():
+        _step(timings, "embedding_model", lambda: vector_store._encode_fallback("warm-up"))
+    dummy = np.zeros((1, vector_store.embedding_dim), dtype="float32")
+    _step(timings, "faiss_search", lambda: vector_store.search_by_embedding(dummy, k=1))
+    if vector_store.sparse_index is not None:
+        _step(timings, "bm25_search", lambda: vector_store.sparse_index.search("warm-up", 1))
+    return timings
+
+
+def warm_up(pipeline) -> Dict[str, float]:
+    """
+    Load everything the first query would otherwise wait for: the query
+    embedding model (when the local model serves queries), a FAISS search,
+    the BM25 index, the reranker and the prompt tokenizer.
+
+    Returns:
+        Seconds spent per step
+    """
+    timings = warm_up_vector_store(pipeline.vector_store)
+    step = partial(_step, timings)
+    if getattr(pipeline, "reranker", None) is not None:
+        step("reranker", lambda: pipeline.reranker.rerank("warm-up", [{"text": "warm-up"}], 1))
+    if getattr(pipeline, "context_packer", None) is not None:
+        step("tokenizer", lambda: pipeline.context_packer.count_tokens("warm-up"))
+    return timings
+
+
+async def awarm_up(pipeline) -> Dict[str, float]:
+    """warm_up() on a worker thread, so the event loop keeps serving /health"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, warm_up, pipeline)
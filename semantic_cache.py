@@ -0,0 +1,141 @@
+"""
+Semantic Answer Cache for MedInSight
+Reuses answers of earlier questions that are worded differently but mean the same
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class SemanticAnswerCache:
+    """
+    LRU cache of answers looked up by query embedding.
+
+    Every entry keeps the normalized embedding of the question it answered
+    and a hash of the contexts the answer was generated from. A lookup hits
+    when an entry with the same context set has a cosine similarity of at
+    least `threshold` to the new question: same contexts and (nearly) the
+    same question make the same prompt.
+
+    Embeddings live in one preallocated (max_entries, dim) matrix; entries
+    are grouped by context hash, so a lookup only compares against the few
+    questions that retrieved exactly these contexts.
+
+    Entries belong to a scope (index version, model, prompt settings); set
+    a new one with reset() and lookups / stores for any other scope miss.
+    """
+
+    def __init__(self, max_entries: int = 1024, threshold: float = 0.9):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.scope = None
+        self._matrix: Optional[np.ndarray] = None
+        # slot -> (context key, answer), in LRU order
+        self._entries: "OrderedDict[int, Tuple[str, str]]" = OrderedDict()
+        self._groups: Dict[str, List[int]] = {}
+        self._free: List[int] = []
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["SemanticAnswerCache"]:
+        """Build the cache from SEMANTIC_CACHE_* environment variables (None if disabled)"""
+        max_entries = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", 0))
+        if max_entries <= 0:
+            return None
+        return cls(max_entries, threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.9)))
+
+    @staticmethod
+    def context_key(contexts: List[str]) -> str:
+        """Order-insensitive hash of a retrieved context set"""
+        digest = hashlib.sha256()
+        for text in sorted(contexts):
+            digest.update(text.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    @staticmethod
+    def _normalize(embedding: np.ndarray) -> np.ndarray:
+        vector = np.asarray(embedding, dtype="float32").reshape(-1)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def reset(self, scope: str):
+        """Drop every entry and accept lookups / stores for scope only"""
+        with self._lock:
+            if self._entries:
+                self.invalidations += 1
+            self.scope = scope
+            self._matrix = None
+            self._entries.clear()
+            self._groups.clear()
+            self._free = []
+
+    def _usable(self, scope: str, vector: np.ndarray) -> bool:
+        """Lock held"""
+        return scope == self.scope and (self._matrix is None or self._matrix.shape[1] == vector.shape[0])
+
+    def lookup(self, embedding: np.ndarray, contexts: List[str], scope: str) -> Optional[str]:
+        """Answer of the closest cached question with the same contexts (None on a miss)"""
+        vector = self._normalize(embedding)
+        key = self.context_key(contexts)
+        with self._lock:
+            slots = self._groups.get(key) if self._usable(scope, vector) else None
+            if slots:
+                similarities = self._matrix[slots] @ vector
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    slot = slots[best]
+                    self._entries.move_to_end(slot)
+                    self.hits += 1
+                    return self._entries[slot][1]
+            self.misses += 1
+            return None
+
+    def store(self, embedding: np.ndarray, contexts: List[str], answer: str, scope: str):
+        vector = self._normalize(embedding)
+        key = self.context_key(contexts)
+        with self._lock:
+            if not self._usable(scope, vector):
+                return
+            if self._matrix is None:
+                self._matrix = np.zeros((self.max_entries, vector.shape[0]), dtype="float32")
+                self._free = list(range(self.max_entries - 1, -1, -1))
+            if not self._free:
+                slot, (old_key, _) = self._entries.popitem(last=False)
+                group = self._groups[old_key]
+                group.remove(slot)
+                if not group:
+                    del self._groups[old_key]
+                self._free.append(slot)
+                self.evictions += 1
+            slot = self._free.pop()
+            self._matrix[slot] = vector
+            self._entries[slot] = (key, answer)
+            self._groups.setdefault(key, []).append(slot)
+
+    def clear(self):
+        self.reset(self.scope)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "memory_mb": round(self._matrix.nbytes / (1024 * 1024), 2) if self._matrix is not None else 0.0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
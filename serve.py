@@ -0,0 +1,146 @@
+"""
+Multi-process Server for MedInSight
+Preforking launcher: the vector store is loaded once, then uvicorn workers are
+forked onto one shared listening socket
+"""
+
+import asyncio
+import multiprocessing
+import os
+import signal
+import time
+from typing import Callable, List, Optional, Tuple
+
+import uvicorn
+
+# Workers must inherit the preloaded store and patched modules, so always fork
+_fork = multiprocessing.get_context("fork")
+
+
+def _worker(config: uvicorn.Config, sockets, omp_threads: int, ready):
+    """Entry point of a forked worker: one uvicorn server on the inherited socket"""
+    import faiss
+
+    # Each worker searches single-threaded by default; the processes provide the parallelism
+    faiss.omp_set_num_threads(omp_threads)
+    server = uvicorn.Server(config)
+
+    async def serve():
+        task = asyncio.create_task(server.serve(sockets=sockets))
+        while not server.started and not task.done():
+            await asyncio.sleep(0.01)
+        ready.set()
+        await task
+
+    asyncio.run(serve())
+
+
+class PreforkServer:
+    """
+    Runs `workers` uvicorn processes that share the vector store loaded by
+    `preload` in this (master) process. Memory-mapped stores share page
+    cache; in-memory stores share their pages copy-on-write.
+
+    - limit_concurrency: requests in flight per worker; beyond it the
+      worker answers 503 instead of queueing without bound
+    - SIGHUP, or a change of the files in `watch_paths`, triggers a graceful
+      reload: preload runs again, a new generation of workers starts, and
+      only once it accepts connections are the old workers sent SIGTERM
+      (they finish in-flight requests within graceful_timeout)
+    - workers that die unexpectedly are replaced
+    """
+
+    def __init__(self, app, preload: Callable[[], None], workers: int = 2, host: str = "0.0.0.0",
+                 port: int = 8000, limit_concurrency: Optional[int] = None, graceful_timeout: float = 30,
+                 watch_paths: List[str] = (), watch_interval: float = 0, omp_threads: int = None,
+                 log_level: str = "info"):
+        self.preload = preload
+        self.workers = workers
+        self.config = uvicorn.Config(
+            app, host=host, port=port, limit_concurrency=limit_concurrency,
+            timeout_graceful_shutdown=graceful_timeout, log_level=log_level
+        )
+        self.graceful_timeout = graceful_timeout
+        self.watch_paths = list(watch_paths)
+        self.watch_interval = watch_interval
+        self.omp_threads = omp_threads or max(1, (os.cpu_count() or 1) // workers)
+        self.processes: List[Tuple[multiprocessing.Process, object]] = []
+        self.generation = 0
+        self._reload = False
+        self._stop = False
+
+    def _stamps(self):
+        stamps = []
+        for path in self.watch_paths:
+            try:
+                stat = os.stat(path)
+                stamps.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                stamps.append(None)
+        return stamps
+
+    def _spawn(self, sockets) -> Tuple[multiprocessing.Process, object]:
+        ready = _fork.Event()
+        process = _fork.Process(target=_worker, args=(self.config, sockets, self.omp_threads, ready),
+                                name=f"medinsight-worker-{self.generation}", daemon=False)
+        process.start()
+        return process, ready
+
+    def _start_generation(self, sockets) -> List[Tuple[multiprocessing.Process, object]]:
+        self.generation += 1
+        self.preload()
+        processes = [self._spawn(sockets) for _ in range(self.workers)]
+        deadline = time.monotonic() + 120
+        for process, ready in processes:
+            while not ready.wait(0.1):
+                if not process.is_alive() or time.monotonic() > deadline:
+                    break
+        print(f"👷 Generation {self.generation}: {self.workers} workers "
+              f"(pids {', '.join(str(p.pid) for p, _ in processes)})")
+        return processes
+
+    def _stop_processes(self, processes, timeout: float):
+        for process, _ in processes:
+            if process.is_alive():
+                process.terminate()  # SIGTERM: uvicorn drains in-flight requests
+        deadline = time.monotonic() + timeout
+        for process, _ in processes:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.kill()
+                process.join()
+
+    def run(self):
+        sockets = [self.config.bind_socket()]
+        signal.signal(signal.SIGHUP, lambda *_: setattr(self, "_reload", True))
+        signal.signal(signal.SIGTERM, lambda *_: setattr(self, "_stop", True))
+        signal.signal(signal.SIGINT, lambda *_: setattr(self, "_stop", True))
+
+        print(f"🌐 Serving on http://{self.config.host}:{self.config.port} with {self.workers} workers "
+              f"(limit_concurrency={self.config.limit_concurrency}, faiss threads/worker={self.omp_threads})")
+        self.processes = self._start_generation(sockets)
+        stamps, last_check = self._stamps(), time.monotonic()
+        try:
+            while not self._stop:
+                time.sleep(0.2)
+                if self.watch_interval and time.monotonic() - last_check >= self.watch_interval:
+                    last_check = time.monotonic()
+                    current = self._stamps()
+                    if current != stamps and all(current):
+                        print("🔄 New vector store detected")
+                        stamps, self._reload = current, True
+                if self._reload:
+                    self._reload = False
+                    old = self.processes
+                    self.processes = self._start_generation(sockets)
+                    self._stop_processes(old, self.graceful_timeout)
+                    continue
+                for i, (process, _) in enumerate(self.processes):
+                    if not process.is_alive():
+                        print(f"⚠️  Worker {process.pid} exited ({process.exitcode}); restarting")
+                        self.processes[i] = self._spawn(sockets)
+        finally:
+            print("🛑 Stopping workers...")
+            self._stop_processes(self.processes, self.graceful_timeout)
+            for sock in sockets:
+                sock.close()
@@ -0,0 +1,199 @@
+"""
+Sparse Lexical Index for MedInSight
+In-process BM25 over chunk texts, stored as a compact inverted index
+"""
+
+import math
+import os
+import re
+import struct
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+SPARSE_MAGIC = b"MEDBM25\0"
+SPARSE_VERSION = 1
+
+# magic, format version, reserved, documents, terms, postings, term bytes, k1, b, avgdl
+_HEADER = struct.Struct("<8sIIQQQQddd")
+
+# Keeps codes and symbols whole ("e11.9", "icd-10", "brca1", "hba1c") and
+# also indexes their parts, so "ICD 10" still matches "ICD-10"
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[.\-/+][a-z0-9]+)*")
+_PART_RE = re.compile(r"[.\-/+]")
+
+STOPWORDS = frozenset("""
+a an and are as at be been but by can could do does for from had has have how if in into is it its
+may might not of on or our should so such than that the their them then there these they this those
+to was were what when where which while who whom why will with would you your
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased terms without stopwords; compound codes add their parts"""
+    terms = []
+    for token in _TOKEN_RE.findall(text.casefold()):
+        if token in STOPWORDS:
+            continue
+        terms.append(token)
+        if _PART_RE.search(token):
+            terms.extend(part for part in _PART_RE.split(token) if part and part not in STOPWORDS)
+    return terms
+
+
+def _pad(n: int) -> int:
+    return -n % 8
+
+
+class BM25Index:
+    """
+    Okapi BM25 over documents numbered like the FAISS ids.
+
+    Postings are stored CSR-style: for term t, doc_ids / tfs in
+    [term_offsets[t], term_offsets[t + 1]). Documents with length 0 (removed
+    metadata rows) never match. Saved in a versioned binary format that
+    load(mmap=True) views in place.
+    """
+
+    def __init__(self, terms: List[str], term_offsets: np.ndarray, doc_ids: np.ndarray,
+                 tfs: np.ndarray, doc_lengths: np.ndarray, k1: float = 1.2, b: float = 0.75,
+                 avgdl: float = None):
+        self.terms = terms
+        self.vocabulary = {term: i for i, term in enumerate(terms)}
+        self.term_offsets = term_offsets
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        live = doc_lengths[doc_lengths > 0]
+        self.avgdl = avgdl if avgdl is not None else (float(live.mean()) if len(live) else 1.0)
+        self.n_docs = int(len(live))
+        # Per-document length normalisation, computed once
+        self._norm = (k1 * (1 - b + b * doc_lengths / self.avgdl)).astype("float32")
+
+    @classmethod
+    def build(cls, texts: Iterable[Optional[str]], k1: float = None, b: float = None) -> "BM25Index":
+        """Index texts in order (None or "" for rows that must never match)"""
+        k1 = float(os.getenv("BM25_K1", 1.2)) if k1 is None else k1
+        b = float(os.getenv("BM25_B", 0.75)) if b is None else b
+
+        vocabulary: Dict[str, int] = {}
+        # Typed arrays: 4 bytes a posting each instead of a list slot plus an int object
+        posting_terms, posting_docs, posting_tfs, lengths = array("i"), array("i"), array("I"), array("i")
+        for doc_id, text in enumerate(texts):
+            counts: Dict[int, int] = {}
+            terms = tokenize(text) if text else []
+            for term in terms:
+                term_id = vocabulary.setdefault(term, len(vocabulary))
+                counts[term_id] = counts.get(term_id, 0) + 1
+            lengths.append(len(terms))
+            posting_terms.extend(counts)
+            posting_docs.extend([doc_id] * len(counts))
+            posting_tfs.extend(counts.values())
+
+        # Group postings by term, with terms in sorted order
+        terms = sorted(vocabulary)
+        rank = np.empty(len(terms), dtype="int64")
+        rank[[vocabulary[term] for term in terms]] = np.arange(len(terms))
+        term_of_posting = rank[np.asarray(posting_terms)]
+        del posting_terms
+        order = np.argsort(term_of_posting, kind="stable")
+        term_offsets = np.zeros(len(terms) + 1, dtype="<u8")
+        np.cumsum(np.bincount(term_of_posting, minlength=len(terms)), out=term_offsets[1:])
+
+        return cls(
+            terms, term_offsets,
+            np.asarray(posting_docs, dtype="<i4")[order],
+            np.minimum(np.asarray(posting_tfs), 65535).astype("<u2")[order],
+            np.asarray(lengths, dtype="<i4"), k1, b
+        )
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def search(self, query: str, k: int = 50) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k documents for a query.
+
+        Returns:
+            (doc_ids, scores), best first; empty if no query term is indexed
+        """
+        term_ids = [self.vocabulary[term] for term in set(tokenize(query)) if term in self.vocabulary]
+        if not term_ids:
+            return np.empty(0, dtype="int64"), np.empty(0, dtype="float32")
+
+        doc_parts, score_parts = [], []
+        for term_id in term_ids:
+            start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+            docs = self.doc_ids[start:end]
+            tfs = self.tfs[start:end].astype("float32")
+            df = end - start
+            idf = math.log(1 + (self.n_docs - df + 0.5) / (df + 0.5))
+            doc_parts.append(docs)
+            score_parts.append(idf * tfs * (self.k1 + 1) / (tfs + self._norm[docs]))
+
+        docs, inverse = np.unique(np.concatenate(doc_parts), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(score_parts)).astype("float32")
+        if len(docs) > k:
+            top = np.argpartition(-scores, k)[:k]
+            docs, scores = docs[top], scores[top]
+        order = np.argsort(-scores, kind="stable")
+        return docs[order].astype("int64"), scores[order]
+
+    def save(self, path: str):
+        """Write the versioned binary format (atomically, via a temp file)"""
+        names = [term.encode("utf-8") for term in self.terms]
+        name_offsets = np.zeros(len(names) + 1, dtype="<u8")
+        np.cumsum([len(name) for name in names], out=name_offsets[1:])
+        name_data = b"".join(names)
+
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_HEADER.pack(SPARSE_MAGIC, SPARSE_VERSION, 0, len(self), len(names), len(self.doc_ids),
+                                 len(name_data), self.k1, self.b, self.avgdl))
+            for section in (name_offsets.tobytes(), name_data, self.term_offsets.astype("<u8").tobytes(),
+                            self.doc_ids.astype("<i4").tobytes(), self.tfs.astype("<u2").tobytes(),
+                            self.doc_lengths.astype("<i4").tobytes()):
+                f.write(section)
+                f.write(b"\0" * _pad(len(section)))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = False) -> "BM25Index":
+        """Read a file written by save() (mmap=True maps it read-only)"""
+        buffer = np.memmap(path, dtype="u1", mode="r") if mmap else np.fromfile(path, dtype="u1")
+        magic, version, _, n_docs, n_terms, n_postings, name_bytes, k1, b, avgdl = _HEADER.unpack(
+            buffer[:_HEADER.size].tobytes()
+        )
+        if magic != SPARSE_MAGIC:
+            raise ValueError(f"{path} is not a BM25 index")
+        if version != SPARSE_VERSION:
+            raise ValueError(f"{path} has BM25 format version {version}, expected {SPARSE_VERSION}")
+
+        position = _HEADER.size
+
+        def section(n_bytes: int, dtype: str) -> np.ndarray:
+            nonlocal position
+            view = buffer[position:position + n_bytes].view(dtype)
+            position += n_bytes + _pad(n_bytes)
+            return view
+
+        name_offsets = section(8 * (n_terms + 1), "<u8")
+        name_data = section(name_bytes, "u1").tobytes()
+        terms = [name_data[name_offsets[i]:name_offsets[i + 1]].decode("utf-8") for i in range(n_terms)]
+        term_offsets = section(8 * (n_terms + 1), "<u8")
+        doc_ids = section(4 * n_postings, "<i4")
+        tfs = section(2 * n_postings, "<u2")
+        doc_lengths = section(4 * n_docs, "<i4")
+        return cls(terms, term_offsets, doc_ids, tfs, doc_lengths, k1, b, avgdl)
+
+
+def reciprocal_rank_fusion(rankings: List[Iterable[int]], k: int = 60) -> List[Tuple[int, float]]:
+    """Fuse ranked id lists: score(d) = sum over lists of 1 / (k + rank), rank from 1"""
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: -item[1])